@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+00_ingest_sinan.py
+==================
+Ingest many raw SINAN files (one per UF, year and disease: chikungunya
+A92.0, dengue A90, zika A92.8) into one dataset partitioned by
+NU_ANO/SG_UF_NOT/ID_AGRAVO, parsing the files concurrently.
+
+The dataset feeds 01_data_preprocessing.py (``--sinan`` with the dataset
+directory, ``--year``/``--uf``/``--agravo`` to select partitions). It is
+not part of run_all.py, which runs on the single extract in data/raw/.
+
+Usage:
+    python 00_ingest_sinan.py '../data/raw/sinan/*.dbc' [--jobs 0] [--chunksize N]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import glob
+import time
+from arbolib.ingest import AGRAVOS, DATA_PARTITIONED, PARTITION_COLS, ingest
+import warnings
+warnings.filterwarnings('ignore')
+
+
+def ingest_files(pattern, root=DATA_PARTITIONED, chunksize=None, jobs=0):
+    """Ingest every file matching ``pattern`` and print a summary."""
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise SystemExit(f"No files match {pattern}")
+    
+    print(f"Ingesting {len(paths)} files into {root}")
+    print(f"Partitions: {'/'.join(PARTITION_COLS)}\n")
+    
+    start = time.perf_counter()
+    rows = 0
+    size = 0
+    partitions = set()
+    for stats in ingest(paths, root, chunksize=chunksize, jobs=jobs):
+        rows += stats['rows']
+        size += stats['bytes']
+        partitions |= stats['partitions']
+        print(f"  {stats['file']:<32} {stats['rows']:>10,} rows  "
+              f"{len(stats['partitions']):>4} partitions  {stats['seconds']:7.2f}s")
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n  Total: {rows:,} rows, {len(partitions)} partitions "
+          f"({elapsed:.2f}s, {rows / elapsed:,.0f} rows/s, {size / 1e6 / elapsed:.1f} MB/s)")
+    for agravo in sorted({key[2] for key in partitions}, key=str):
+        years = sorted({key[0] for key in partitions if key[2] == agravo}, key=str)
+        ufs = {key[1] for key in partitions if key[2] == agravo}
+        print(f"    - {agravo} ({AGRAVOS.get(agravo, 'other')}): "
+              f"years {', '.join(map(str, years))}; {len(ufs)} UFs")
+
+
+def main():
+    """Run the ingestion stage."""
+    parser = argparse.ArgumentParser(description="Ingest raw SINAN files into a partitioned dataset.")
+    parser.add_argument('pattern',
+                        help="glob of raw SINAN files (CSV, .dbc or .dbf); quote it")
+    parser.add_argument('--out', default=DATA_PARTITIONED,
+                        help=f"dataset directory (default: {DATA_PARTITIONED})")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="read each file in chunks of this many rows")
+    parser.add_argument('--jobs', type=int, default=0,
+                        help="worker processes (0 = all CPUs)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("SINAN INGESTION")
+    print("Partitioned by year, UF and disease")
+    print("=" * 60)
+    print()
+    
+    ingest_files(args.pattern, args.out, args.chunksize, args.jobs)
+    
+    print("\n✓ Ingestion complete!")
+
+
+if __name__ == "__main__":
+    main()
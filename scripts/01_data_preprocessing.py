@@ -8,19 +8,36 @@ Data preprocessing and cleaning for Chikungunya surveillance study.
 This script:
 1. Loads raw RT-PCR and SINAN datasets
 2. Standardizes variable names and formats
-3. Creates derived variables
-4. Exports processed datasets
+3. Creates derived variables (including the packed symptom signature)
+4. Exports processed datasets to the typed columnar store (optionally CSV)
+5. With --incremental, updates the SINAN store with only the rows typed
+   since the previous run
 
 Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import os
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from arbolib.diagnosis import categorize_diagnoses
+from arbolib.incremental import (KEY, DeltaScan, load_watermark, save_watermark,
+                                 stratum_counts, update_counts, upsert)
+from arbolib.signatures import SIGNATURE, pack, popcount
+from arbolib.sinan import bytes_per_row, decode_age, read_sinan
+from arbolib.store import DatasetWriter, dataset_path, load_dataset, write_dataset
+from arbolib.strata import STRATA_KEYS
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import resource  # peak RSS reporting (POSIX only)
+except ImportError:
+    resource = None
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -28,6 +45,26 @@ warnings.filterwarnings('ignore')
 DATA_RAW = '../data/raw/'
 DATA_PROCESSED = '../data/processed/'
 
+SINAN_FILE = 'SINAN_chikungunya_2023.csv'
+
+SINAN_SYMPTOM_COLS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO',
+                      'NAUSEA', 'DOR_COSTAS', 'CONJUNTVIT', 'ARTRITE',
+                      'ARTRALGIA', 'PETEQUIA_N', 'DOR_RETRO']
+
+# Columns kept when streaming national extracts (the full file has 136)
+SINAN_USECOLS = ['NU_NOTIFIC', 'ID_AGRAVO', 'DT_NOTIFIC', 'SEM_NOT', 'NU_ANO',
+                 'SG_UF_NOT', 'ID_MUNICIP', 'ID_REGIONA', 'ID_UNIDADE', 'DT_SIN_PRI',
+                 'SEM_PRI', 'NU_IDADE_N', 'CS_SEXO', 'CS_GESTANT', 'CS_RACA',
+                 'DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL', 'HIPERTENSA',
+                 'ACIDO_PEPT', 'AUTO_IMUNE', 'HOSPITALIZ', 'DT_INTERNA',
+                 'CLASSI_FIN', 'CRITERIO', 'EVOLUCAO', 'DT_OBITO',
+                 'DT_ENCERRA', 'NU_LOTE_I', 'DT_DIGITA'] + SINAN_SYMPTOM_COLS
+
+# Columns carried from each source into the merged analysis dataset
+MERGE_COLS = ['idade', 'sexo', 'age_group', 'hospitalized',
+              'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+              'EXANTEMA', 'NAUSEA', 'VOMITO', SIGNATURE]
+
 # =============================================================================
 # LOAD DATA
 # =============================================================================
@@ -68,6 +105,7 @@ def load_rtpcr_data():
     # Diagnostic accuracy
     df['diagnostic_correct'] = df['HIPOTESE_DIAGNOSTICA'].str.contains(
         'CHIK', case=False, na=False).astype(int)
+    df['dx_category'] = categorize_diagnoses(df['HIPOTESE_DIAGNOSTICA'])
     
     # Age groups
     df['age_group'] = pd.cut(df['idade'], 
@@ -75,22 +113,16 @@ def load_rtpcr_data():
                              labels=['<18', '18-39', '40-59', '≥60'],
                              right=False)
     
-    # Symptom count
-    df['symptom_count'] = df[symptom_cols].sum(axis=1)
+    # Symptom signature (one bit per symptom) and symptom count
+    df[SIGNATURE] = pack(df, symptom_cols)
+    df['symptom_count'] = popcount(df[SIGNATURE]).astype(int)
     
     print(f"  Loaded {len(df)} RT-PCR+ cases")
     return df
 
 
-def load_sinan_data():
-    """Load and preprocess SINAN surveillance data."""
-    print("Loading SINAN data...")
-    
-    df = pd.read_csv(f'{DATA_RAW}SINAN_chikungunya_2023.csv', sep=';')
-    
-    # Filter confirmed Chikungunya cases
-    df = df[df['CLASSI_FIN'] == 'Chikungunya'].copy()
-    
+def process_sinan_frame(df):
+    """Derive analysis variables for confirmed SINAN cases."""
     # Create subgroups
     df['sinan_group'] = np.where(
         df['CRITERIO'] == 'Laboratório', 
@@ -98,26 +130,19 @@ def load_sinan_data():
         'Clinical-epidemiological'
     )
     
-    # Standardize age (SINAN uses 4XXX format for years)
-    df['idade'] = df['NU_IDADE_N'].apply(
-        lambda x: x - 4000 if pd.notna(x) and x >= 4000 else x
-    )
+    # Standardize age (SINAN codes the unit in the thousands digit:
+    # 1XXX hours, 2XXX days, 3XXX months, 4XXX years)
+    df['idade'] = decode_age(df['NU_IDADE_N'])
     
     # Standardize sex
     df['sexo'] = df['CS_SEXO'].map({'Masculino': 'M', 'Feminino': 'F'})
     
-    # Standardize symptoms (Sim/Não to 1/0)
-    symptom_mapping = {'Sim': 1, 'Não': 0}
-    symptom_cols_sinan = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO',
-                          'NAUSEA', 'DOR_COSTAS', 'CONJUNTVIT', 'ARTRITE', 
-                          'ARTRALGIA', 'PETEQUIA_N', 'DOR_RETRO']
-    
-    for col in symptom_cols_sinan:
-        if col in df.columns:
-            df[col] = df[col].map(symptom_mapping).fillna(0).astype(int)
+    # Symptoms are already 0/1 flags (decoded by the SINAN schema)
+    df[SIGNATURE] = pack(df, [c for c in SINAN_SYMPTOM_COLS if c in df.columns])
+    df['symptom_count'] = popcount(df[SIGNATURE]).astype(int)
     
-    # Hospitalization
-    df['hospitalized'] = (df['HOSPITALIZ'] == 'Sim').astype(int)
+    # Hospitalization (HOSPITALIZ is coded 1 = yes, 2 = no)
+    df['hospitalized'] = df['HOSPITALIZ']
     
     # Age groups
     df['age_group'] = pd.cut(df['idade'], 
@@ -125,6 +150,162 @@ def load_sinan_data():
                              labels=['<18', '18-39', '40-59', '≥60'],
                              right=False)
     
+    return df
+
+
+def no_sinan_rows(path, filters):
+    """The SystemExit raised when ``path`` (or its partitions matching
+    ``filters``) holds no SINAN rows."""
+    return SystemExit(f"No partitions of {path} match {filters}" if filters
+                      else f"No SINAN rows in {path}")
+
+
+def report_sinan_memory(path, usecols=None, nrows=50_000, filters=None):
+    """Print the in-memory size per row of the first ``nrows`` SINAN rows,
+    parsed with pandas' default dtypes and with the typed schema (only the
+    typed size for a .dbc/.dbf file or a partitioned dataset, which have no
+    untyped parse).
+    
+    The rows are parsed again for the report, so it only runs with
+    ``--memory-report``.
+    """
+    typed = next(read_sinan(path, usecols=usecols, chunksize=nrows, filters=filters), None)
+    if typed is None:
+        raise no_sinan_rows(path, filters)
+    after = bytes_per_row(typed)
+    if os.path.isdir(path) or str(path).lower().endswith(('.dbc', '.dbf')):
+        print(f"  Memory ({typed.shape[1]} columns): {after:,.0f} bytes/row typed")
+        return
+    wanted = set(usecols) if usecols is not None else None
+    untyped = pd.read_csv(path, sep=';', nrows=nrows,
+                          usecols=(lambda c: c in wanted) if wanted else None)
+    before = bytes_per_row(untyped)
+    print(f"  Memory ({untyped.shape[1]} columns): {before:,.0f} bytes/row untyped, "
+          f"{after:,.0f} bytes/row typed ({before / after:.1f}x smaller)")
+
+
+def load_sinan_data(chunksize=None, usecols=None, criterio=None, path=None, filters=None,
+                    scan=None, memory_report=False):
+    """Load and preprocess SINAN surveillance data.
+    
+    ``path`` is the CSV extract (default), a DATASUS .dbc/.dbf file or a
+    partitioned dataset written by ``00_ingest_sinan.py``, of which only the
+    partitions matching ``filters`` are read.
+    With ``chunksize`` the extract is streamed through
+    ``iter_sinan_chunks`` and only the processed confirmed cases are
+    concatenated, so the raw file is never held in memory at once.
+    A ``DeltaScan`` (``scan``) sees every raw row and adds the record key.
+    With ``memory_report`` the bytes/row of the extract are printed first.
+    """
+    print("Loading SINAN data...")
+    path = path or f'{DATA_RAW}{SINAN_FILE}'
+    
+    if memory_report:
+        report_sinan_memory(path, usecols, filters=filters)
+    
+    if chunksize:
+        df = pd.concat(iter_sinan_chunks(path, chunksize=chunksize, usecols=usecols,
+                                         criterio=criterio, filters=filters, scan=scan),
+                       ignore_index=True)
+    else:
+        df = read_sinan(path, usecols=usecols, filters=filters)
+        if not len(df):
+            raise no_sinan_rows(path, filters)
+        if scan is not None:
+            scan(df)
+        
+        # Filter confirmed Chikungunya cases
+        df = df[df['CLASSI_FIN'] == 'Chikungunya'].copy()
+        if criterio is not None:
+            df = df[df['CRITERIO'].isin(criterio)].copy()
+        
+        df = process_sinan_frame(df)
+    
+    print(f"  Loaded {len(df)} SINAN confirmed cases")
+    print(f"    - Laboratory confirmed: {(df['sinan_group'] == 'Laboratory').sum()}")
+    print(f"    - Clinical-epidemiological: {(df['sinan_group'] == 'Clinical-epidemiological').sum()}")
+    
+    return df
+
+
+def iter_sinan_chunks(path=None, chunksize=100_000, usecols=SINAN_USECOLS,
+                      criterio=None, stats=None, filters=None, scan=None):
+    """Stream a SINAN extract, yielding processed chunks of confirmed cases.
+    
+    Columns are parsed with the typed SINAN schema
+    (``arbolib.sinan.read_sinan``, CSV or .dbc/.dbf). The column projection
+    is applied by the parser and the
+    CLASSI_FIN/CRITERIO filter runs on each raw chunk before any derived
+    variable is built, so peak memory depends on ``chunksize`` and not on
+    the size of the file. Columns missing from an extract are ignored.
+    
+    ``filters`` selects partitions when ``path`` is a partitioned dataset.
+    With a ``DeltaScan`` (``scan``) every raw chunk gets its record keys
+    and only the rows past the watermark are kept.
+    If a ``stats`` dict is given it is updated with rows read, rows kept,
+    chunk count and elapsed seconds.
+    """
+    path = path or f'{DATA_RAW}{SINAN_FILE}'
+    if stats is None:
+        stats = {}
+    stats.update(rows_read=0, rows_kept=0, chunks=0, seconds=0.0)
+    
+    start = time.perf_counter()
+    reader = read_sinan(path, usecols=usecols, chunksize=chunksize, filters=filters)
+    
+    for chunk in reader:
+        stats['rows_read'] += len(chunk)
+        stats['chunks'] += 1
+        
+        keep = chunk['CLASSI_FIN'] == 'Chikungunya'
+        if scan is not None:
+            keep &= scan(chunk)
+        if criterio is not None:
+            keep &= chunk['CRITERIO'].isin(criterio)
+        chunk = chunk[keep]
+        
+        if len(chunk):
+            stats['rows_kept'] += len(chunk)
+            yield process_sinan_frame(chunk.copy())
+        
+        stats['seconds'] = time.perf_counter() - start
+    
+    if not stats['rows_read']:
+        raise no_sinan_rows(path, filters)
+
+
+def stream_sinan_data(chunksize, criterio=None, csv=False, path=None, filters=None,
+                      scan=None, memory_report=False):
+    """Stream SINAN into the processed store chunk by chunk.
+    
+    Each processed chunk is appended to the store as soon as it is ready;
+    only the harmonized columns needed by ``create_merged_dataset`` are
+    kept in memory and returned. With ``memory_report`` the bytes/row of
+    the extract are printed first.
+    """
+    print(f"Streaming SINAN data (chunksize={chunksize:,})...")
+    path = path or f'{DATA_RAW}{SINAN_FILE}'
+    if memory_report:
+        report_sinan_memory(path, SINAN_USECOLS, filters=filters)
+    
+    stats = {}
+    kept = []
+    columns = MERGE_COLS + STRATA_KEYS + ['ID_UNIDADE', 'sinan_group']
+    
+    with DatasetWriter('sinan', data_dir=DATA_PROCESSED, csv=csv) as writer:
+        for chunk in iter_sinan_chunks(path, chunksize=chunksize, criterio=criterio,
+                                       stats=stats, filters=filters, scan=scan):
+            writer.write(chunk)
+            kept.append(chunk[columns])
+    
+    df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=columns)
+    
+    rate = stats['rows_read'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"  Read {stats['rows_read']:,} rows in {stats['chunks']} chunks "
+          f"({stats['seconds']:.2f}s, {rate:,.0f} rows/s)")
+    if resource is not None:
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"  Peak RSS: {peak_mb:.0f} MB")
     print(f"  Loaded {len(df)} SINAN confirmed cases")
     print(f"    - Laboratory confirmed: {(df['sinan_group'] == 'Laboratory').sum()}")
     print(f"    - Clinical-epidemiological: {(df['sinan_group'] == 'Clinical-epidemiological').sum()}")
@@ -137,17 +318,13 @@ def create_merged_dataset(rtpcr_df, sinan_df):
     print("Creating merged analysis dataset...")
     
     # Standardize RT-PCR
-    rtpcr_std = rtpcr_df[['id', 'idade', 'sexo', 'age_group', 'hospitalized',
-                          'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 
-                          'EXANTEMA', 'NAUSEA', 'VOMITO']].copy()
+    rtpcr_std = rtpcr_df[['id'] + MERGE_COLS + ['bairro']].copy()
     rtpcr_std['source'] = 'RT-PCR+'
     rtpcr_std['subgroup'] = 'RT-PCR Confirmed'
     
     # Standardize SINAN Lab
     sinan_lab = sinan_df[sinan_df['sinan_group'] == 'Laboratory'].copy()
-    sinan_lab_std = sinan_lab[['idade', 'sexo', 'age_group', 'hospitalized',
-                               'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
-                               'EXANTEMA', 'NAUSEA', 'VOMITO']].copy()
+    sinan_lab_std = sinan_lab[MERGE_COLS + STRATA_KEYS + ['ID_UNIDADE']].copy()
     # Create ID only if not already present
     if 'id' not in sinan_lab_std.columns:
         sinan_lab_std['id'] = range(1000, 1000 + len(sinan_lab_std))
@@ -156,9 +333,7 @@ def create_merged_dataset(rtpcr_df, sinan_df):
     
     # Standardize SINAN Clinical
     sinan_clin = sinan_df[sinan_df['sinan_group'] == 'Clinical-epidemiological'].copy()
-    sinan_clin_std = sinan_clin[['idade', 'sexo', 'age_group', 'hospitalized',
-                                  'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
-                                  'EXANTEMA', 'NAUSEA', 'VOMITO']].copy()
+    sinan_clin_std = sinan_clin[MERGE_COLS + STRATA_KEYS + ['ID_UNIDADE']].copy()
     # Create ID only if not already present
     if 'id' not in sinan_clin_std.columns:
         sinan_clin_std['id'] = range(5000, 5000 + len(sinan_clin_std))
@@ -169,35 +344,149 @@ def create_merged_dataset(rtpcr_df, sinan_df):
     merged = pd.concat([rtpcr_std, sinan_lab_std, sinan_clin_std], 
                        ignore_index=True)
     
+    # SINAN geography/time codes for stratified runs and the clusters used
+    # by the cluster bootstrap (bairro for RT-PCR, ID_UNIDADE for SINAN)
+    merged[STRATA_KEYS + ['ID_UNIDADE']] = merged[STRATA_KEYS + ['ID_UNIDADE']].astype('Int64')
+    
     print(f"  Created merged dataset with {len(merged)} records")
     return merged
 
 
+def update_sinan_data(watermark, chunksize, csv=False, path=None, filters=None):
+    """Bring the processed SINAN store up to date with only the rows past
+    ``watermark`` (``arbolib.incremental``).
+    
+    The extract is scanned in chunks; rows typed since the last run (or in
+    new NU_LOTE_I batches, or not in the previous scan) are processed and
+    upserted into the store by record key, the stratum counts are updated
+    by difference, and the watermark and scanned keys advance. Each delta
+    is logged with its row counts and time.
+    """
+    print(f"Updating SINAN data (rows typed from {watermark['DT_DIGITA']}, "
+          f"{len(watermark['NU_LOTE_I'])} NU_LOTE_I batches seen)...")
+    start = time.perf_counter()
+    
+    # The delta is read with the stored columns, so new rows look like the old
+    store = load_dataset('sinan', data_dir=DATA_PROCESSED)
+    known = load_dataset('sinan_keys', data_dir=DATA_PROCESSED)[KEY]
+    scan = DeltaScan(watermark, known_keys=known)
+    stats = {}
+    delta = list(iter_sinan_chunks(path, chunksize=chunksize, usecols=list(store.columns),
+                                   stats=stats, filters=filters, scan=scan))
+    delta = pd.concat(delta, ignore_index=True) if delta else store.iloc[:0]
+    
+    df, removed, counts = upsert(store, delta, scan)
+    write_dataset(df, 'sinan', data_dir=DATA_PROCESSED, csv=csv)
+    write_dataset(update_counts(load_dataset('sinan_counts', data_dir=DATA_PROCESSED),
+                                removed, delta, SINAN_SYMPTOM_COLS),
+                  'sinan_counts', data_dir=DATA_PROCESSED)
+    write_dataset(pd.DataFrame({KEY: scan.keys}), 'sinan_keys', data_dir=DATA_PROCESSED)
+    
+    seconds = time.perf_counter() - start
+    save_watermark(scan.watermark({
+        'run': 'delta', 'date': datetime.now().isoformat(timespec='seconds'),
+        'from_DT_DIGITA': watermark['DT_DIGITA'], 'rows_read': scan.rows,
+        'delta_rows': scan.delta_rows, **counts, 'seconds': round(seconds, 3),
+    }), DATA_PROCESSED)
+    
+    print(f"  Read {scan.rows:,} rows in {stats['chunks']} chunks; "
+          f"{scan.delta_rows:,} past the watermark or new")
+    print(f"  Upserted {counts['inserted']} new, {counts['updated']} updated and "
+          f"{counts['removed']} removed cases ({seconds:.2f}s)")
+    print(f"  Loaded {len(df)} SINAN confirmed cases")
+    print(f"    - Laboratory confirmed: {(df['sinan_group'] == 'Laboratory').sum()}")
+    print(f"    - Clinical-epidemiological: {(df['sinan_group'] == 'Clinical-epidemiological').sum()}")
+    
+    return df
+
+
 # =============================================================================
 # MAIN
 # =============================================================================
 
-if __name__ == "__main__":
+def main():
+    """Run the preprocessing stage."""
+    parser = argparse.ArgumentParser(description="Preprocess RT-PCR and SINAN datasets.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the SINAN extract in chunks of this many rows "
+                             "(for national-scale DATASUS files)")
+    parser.add_argument('--csv', action='store_true',
+                        help="also export the processed datasets as CSV")
+    parser.add_argument('--sinan', default=None, metavar='PATH',
+                        help="SINAN extract to read: CSV, DATASUS .dbc/.dbf or a dataset "
+                             f"directory from 00_ingest_sinan.py (default: {DATA_RAW}{SINAN_FILE})")
+    parser.add_argument('--year', type=int, nargs='+', default=None,
+                        help="NU_ANO partitions to read from a dataset directory")
+    parser.add_argument('--uf', nargs='+', default=None,
+                        help="SG_UF_NOT partitions (UF names) to read from a dataset directory")
+    parser.add_argument('--agravo', nargs='+', default=None,
+                        help="ID_AGRAVO partitions (e.g. A92.0) to read from a dataset directory")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process the SINAN rows typed since the last run "
+                             "(DT_DIGITA/NU_LOTE_I watermark) and upsert them into the store")
+    parser.add_argument('--memory-report', action='store_true',
+                        help="print the in-memory bytes/row of the SINAN extract, untyped "
+                             "and typed (parses its first 50,000 rows again)")
+    args = parser.parse_args()
+    filters = {column: values for column, values in
+               [('NU_ANO', args.year), ('SG_UF_NOT', args.uf), ('ID_AGRAVO', args.agravo)]
+               if values}
+    
     print("=" * 60)
     print("DATA PREPROCESSING")
     print("Chikungunya Surveillance Study - Foz do Iguaçu, 2023")
     print("=" * 60)
     print()
     
+    # A delta run needs the watermark, store and scanned keys of a previous run
+    watermark = None
+    if args.incremental:
+        watermark = load_watermark(DATA_PROCESSED)
+        if watermark is None or not all(os.path.exists(dataset_path(name, data_dir=DATA_PROCESSED))
+                                        for name in ['sinan', 'sinan_keys']):
+            print("No previous SINAN run to update: loading the full extract\n")
+            watermark = None
+    
     # Load data
     rtpcr_df = load_rtpcr_data()
-    sinan_df = load_sinan_data()
+    start = time.perf_counter()
+    scan = DeltaScan()
+    if watermark is not None:
+        sinan_df = update_sinan_data(watermark, args.chunksize or 100_000, csv=args.csv,
+                                     path=args.sinan, filters=filters)
+    elif args.chunksize:
+        sinan_df = stream_sinan_data(args.chunksize, csv=args.csv, path=args.sinan,
+                                     filters=filters, scan=scan,
+                                     memory_report=args.memory_report)
+    else:
+        sinan_df = load_sinan_data(path=args.sinan, filters=filters, scan=scan,
+                                   memory_report=args.memory_report)
     
     # Create merged dataset
     merged_df = create_merged_dataset(rtpcr_df, sinan_df)
     
     # Export processed data
     print("\nExporting processed datasets...")
-    rtpcr_df.to_csv(f'{DATA_PROCESSED}rtpcr_processed.csv', index=False)
-    sinan_df.to_csv(f'{DATA_PROCESSED}sinan_processed.csv', index=False)
-    merged_df.to_csv(f'{DATA_PROCESSED}merged_analysis_dataset.csv', index=False)
+    write_dataset(rtpcr_df, 'rtpcr', data_dir=DATA_PROCESSED, csv=args.csv)
+    if watermark is None:
+        if not args.chunksize:
+            write_dataset(sinan_df, 'sinan', data_dir=DATA_PROCESSED, csv=args.csv)
+        # Starting point of later --incremental runs
+        write_dataset(stratum_counts(sinan_df, SINAN_SYMPTOM_COLS).reset_index(),
+                      'sinan_counts', data_dir=DATA_PROCESSED)
+        write_dataset(pd.DataFrame({KEY: scan.keys}), 'sinan_keys', data_dir=DATA_PROCESSED)
+        save_watermark(scan.watermark({
+            'run': 'full', 'date': datetime.now().isoformat(timespec='seconds'),
+            'rows_read': scan.rows, 'cases': len(sinan_df),
+            'seconds': round(time.perf_counter() - start, 3),
+        }), DATA_PROCESSED)
+    write_dataset(merged_df, 'merged', data_dir=DATA_PROCESSED, csv=args.csv)
     
     print("\n✓ Preprocessing complete!")
     print(f"  - RT-PCR processed: {len(rtpcr_df)} cases")
     print(f"  - SINAN processed: {len(sinan_df)} cases")
     print(f"  - Merged dataset: {len(merged_df)} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,27 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import time
 import pandas as pd
 import numpy as np
 from scipy import stats
+from arbolib.signatures import SIGNATURE
+from arbolib.store import dataset_path, load_dataset, write_dataset
+from arbolib.strata import descriptive_by_stratum, parse_strata
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
+# Columns read from the processed store
+COLUMNS = ['idade', 'sexo', 'age_group', 'hospitalized', 'sinan_group',
+           'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+           'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+            'EXANTEMA', 'NAUSEA', 'VOMITO']
+
 def calculate_descriptive_stats(df, group_name):
     """Calculate descriptive statistics for a dataset."""
     print(f"\n{'='*60}")
@@ -86,15 +99,45 @@ def compare_groups_chi2(df, var, group_var='subgroup'):
     return chi2, p
 
 
-if __name__ == "__main__":
+def stratified_descriptives(strata):
+    """Write the descriptive table per stratum and subgroup."""
+    print(f"\nStratified descriptives by {', '.join(strata)}...")
+    
+    merged_df = load_dataset('merged', data_dir=DATA_PROCESSED,
+                             columns=['idade', 'sexo', 'age_group', 'hospitalized',
+                                      'subgroup', SIGNATURE] + strata)
+    
+    start = time.perf_counter()
+    table = descriptive_by_stratum(merged_df, strata, symptoms=SYMPTOMS)
+    elapsed = time.perf_counter() - start
+    
+    write_dataset(table, 'descriptive_strata', data_dir=DATA_PROCESSED, csv=True)
+    n_strata = len(table[strata].drop_duplicates())
+    print(f"  {n_strata:,} strata, {len(table):,} rows ({elapsed:.2f}s)")
+    print(f"  ✓ Saved: {dataset_path('descriptive_strata', 'csv', DATA_PROCESSED)}")
+
+
+def main():
+    """Run the descriptive analysis stage."""
+    parser = argparse.ArgumentParser(description="Descriptive statistics by group.")
+    parser.add_argument('--strata', type=parse_strata, default=None,
+                        help="comma-separated SINAN keys (e.g. ID_MUNICIP,SEM_PRI); "
+                             "writes a tidy table per stratum instead of the report")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("DESCRIPTIVE ANALYSIS")
     print("Chikungunya Surveillance Study - Foz do Iguaçu, 2023")
     print("=" * 60)
     
+    if args.strata:
+        stratified_descriptives(args.strata)
+        print("\n✓ Descriptive analysis complete!")
+        return
+    
     # Load processed data
-    rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
-    sinan_df = pd.read_csv(f'{DATA_PROCESSED}sinan_processed.csv')
+    rtpcr_df = load_dataset('rtpcr', columns=COLUMNS, data_dir=DATA_PROCESSED)
+    sinan_df = load_dataset('sinan', columns=COLUMNS, data_dir=DATA_PROCESSED)
     
     # RT-PCR descriptives
     rtpcr_stats = calculate_descriptive_stats(rtpcr_df, "RT-PCR Confirmed Cases")
@@ -117,3 +160,7 @@ if __name__ == "__main__":
     print(f"{'Female (%)':<25} {rtpcr_stats['female_pct']:.1f}%{'':>10} {sinan_lab_stats['female_pct']:.1f}%{'':>10} {sinan_clin_stats['female_pct']:.1f}%")
     
     print("\n✓ Descriptive analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,49 +14,42 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
-import pandas as pd
+import argparse
 import numpy as np
-from scipy import stats
 import statsmodels.api as sm
 from statsmodels.stats.proportion import proportion_confint
+from arbolib import bootstrap
+from arbolib.contingency import odds_ratios
+from arbolib.diagnosis import DX_CATEGORIES, categorize_diagnoses
+from arbolib.logit import Logit
+from arbolib.store import load_dataset
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
-def analyze_diagnostic_hypotheses(df):
-    """Analyze distribution of initial diagnostic hypotheses."""
+def analyze_diagnostic_hypotheses(df, boot=None):
+    """Analyze distribution of initial diagnostic hypotheses.
+    
+    ``boot`` holds the bootstrap options (see ``arbolib.bootstrap.options``);
+    when given, bootstrap CIs are reported next to the Wilson intervals.
+    """
     print("\n" + "=" * 60)
     print("INITIAL DIAGNOSTIC HYPOTHESES")
     print("=" * 60)
     
     n = len(df)
     
-    # Categorize diagnoses
-    def categorize_diagnosis(dx):
-        if pd.isna(dx):
-            return 'Other'
-        dx = str(dx).upper()
-        if 'CHIKUNGUNYA' in dx and 'DENGUE' not in dx:
-            return 'Chikungunya only'
-        elif 'DENGUE' in dx and 'CHIKUNGUNYA' not in dx:
-            return 'Dengue only'
-        elif 'DENGUE' in dx and 'CHIKUNGUNYA' in dx:
-            return 'Dengue or Chikungunya'
-        elif 'DENGUE OU CHIK' in dx:
-            return 'Dengue or Chikungunya'
-        else:
-            return 'Other'
-    
-    df['dx_category'] = df['HIPOTESE_DIAGNOSTICA'].apply(categorize_diagnosis)
+    # Categorize diagnoses (done during preprocessing)
+    if 'dx_category' not in df.columns:
+        df['dx_category'] = categorize_diagnoses(df['HIPOTESE_DIAGNOSTICA'])
     
     print(f"\nDistribution of Initial Diagnoses (n={n}):")
     print("-" * 45)
     
-    categories = ['Dengue only', 'Dengue or Chikungunya', 'Chikungunya only', 'Other']
     results = {}
     
-    for cat in categories:
+    for cat in DX_CATEGORIES:
         count = (df['dx_category'] == cat).sum()
         pct = count / n * 100
         ci_low, ci_high = proportion_confint(count, n, method='wilson')
@@ -79,6 +72,20 @@ def analyze_diagnostic_hypotheses(df):
     print(f"\nChikungunya as sole diagnosis:")
     print(f"  Correct: {chik_only}/{n} ({chik_accuracy:.1f}%) [95% CI: {ci_low_c*100:.1f}-{ci_high_c*100:.1f}%]")
     
+    if boot:
+        clusters = df[boot['cluster']] if boot['cluster'] else None
+        label = f", resampling {boot['cluster']}" if boot['cluster'] else ''
+        print(f"\nBootstrap 95% CI ({boot['n_boot']:,} replicates{label}):")
+        
+        outcomes = {
+            'Overall accuracy': df['diagnostic_correct'] == 1,
+            'Chikungunya as sole diagnosis': df['dx_category'] == 'Chikungunya only',
+        }
+        for name, outcome in outcomes.items():
+            ci = bootstrap.bootstrap_rates(outcome, clusters=clusters, n_boot=boot['n_boot'],
+                                           seed=boot['seed'], jobs=boot['jobs']).iloc[0]
+            print(f"  {name:<30}: {ci['rate']*100:>5.1f}% [{ci['ci_low']*100:.1f}-{ci['ci_high']*100:.1f}%]")
+    
     return df, results
 
 
@@ -91,72 +98,33 @@ def analyze_factors_accuracy(df):
     symptoms = ['ARTRALGIA', 'CEFALEIA', 'FEBRE', 'MIALGIA', 'EXANTEMA', 
                 'NAUSEA', 'VOMITO', 'EDEMA', 'ASTENIA', 'DOR_RETRO_ORBITAL']
     
-    results = []
+    factors = df[[s for s in symptoms if s in df.columns]].copy()
+    
+    # Tourniquet test
+    if 'PROVA_LACO' in df.columns:
+        df['laco_positive'] = df['PROVA_LACO'].str.contains('POSITIV', case=False, na=False).astype(int)
+        factors['Tourniquet +'] = df['laco_positive']
+    
+    table = odds_ratios(df['diagnostic_correct'], factors).dropna(subset=['or'])
     
     print(f"\n{'Factor':<20} {'OR':<8} {'95% CI':<15} {'p-value':<10}")
     print("-" * 55)
     
-    for symptom in symptoms:
-        if symptom not in df.columns:
-            continue
-            
-        # Create contingency table
-        table = pd.crosstab(df[symptom], df['diagnostic_correct'])
-        
-        if table.shape != (2, 2):
-            continue
+    results = []
+    for factor, row in table.iterrows():
+        p = row['p']
+        significance = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         
-        # Calculate OR
-        try:
-            a, b = table.iloc[1, 1], table.iloc[1, 0]  # symptom present
-            c, d = table.iloc[0, 1], table.iloc[0, 0]  # symptom absent
-            
-            if b * c == 0:
-                continue
-                
-            odds_ratio = (a * d) / (b * c)
-            
-            # 95% CI using log transformation
-            se_log_or = np.sqrt(1/a + 1/b + 1/c + 1/d)
-            ci_low = np.exp(np.log(odds_ratio) - 1.96 * se_log_or)
-            ci_high = np.exp(np.log(odds_ratio) + 1.96 * se_log_or)
-            
-            # Chi-square test
-            chi2, p, dof, expected = stats.chi2_contingency(table)
-            
-            significance = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
-            
+        if factor != 'Tourniquet +':
             results.append({
-                'factor': symptom,
-                'or': odds_ratio,
-                'ci_low': ci_low,
-                'ci_high': ci_high,
+                'factor': factor,
+                'or': row['or'],
+                'ci_low': row['ci_low'],
+                'ci_high': row['ci_high'],
                 'p': p
             })
-            
-            print(f"{symptom:<20} {odds_ratio:>6.2f}   [{ci_low:>5.2f}-{ci_high:>5.2f}]   {p:>8.4f} {significance}")
-            
-        except Exception as e:
-            continue
-    
-    # Tourniquet test
-    if 'PROVA_LACO' in df.columns:
-        df['laco_positive'] = df['PROVA_LACO'].str.contains('POSITIV', case=False, na=False).astype(int)
-        table = pd.crosstab(df['laco_positive'], df['diagnostic_correct'])
         
-        if table.shape == (2, 2):
-            a, b = table.iloc[1, 1], table.iloc[1, 0]
-            c, d = table.iloc[0, 1], table.iloc[0, 0]
-            
-            if b * c > 0:
-                odds_ratio = (a * d) / (b * c)
-                se_log_or = np.sqrt(1/max(a,1) + 1/max(b,1) + 1/max(c,1) + 1/max(d,1))
-                ci_low = np.exp(np.log(odds_ratio) - 1.96 * se_log_or)
-                ci_high = np.exp(np.log(odds_ratio) + 1.96 * se_log_or)
-                chi2, p, dof, expected = stats.chi2_contingency(table)
-                
-                significance = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
-                print(f"{'Tourniquet +':<20} {odds_ratio:>6.2f}   [{ci_low:>5.2f}-{ci_high:>5.2f}]   {p:>8.4f} {significance}")
+        print(f"{factor:<20} {row['or']:>6.2f}   [{row['ci_low']:>5.2f}-{row['ci_high']:>5.2f}]   {p:>8.4f} {significance}")
     
     print("\n* p<0.05, ** p<0.01, *** p<0.001")
     
@@ -178,7 +146,7 @@ def multivariate_logistic_regression(df):
     y = df['diagnostic_correct']
     
     try:
-        model = sm.Logit(y, X)
+        model = Logit(y, X)
         result = model.fit(disp=0)
         
         print(f"\nModel Summary:")
@@ -206,19 +174,28 @@ def multivariate_logistic_regression(df):
         return None
 
 
-if __name__ == "__main__":
+def main():
+    """Run the diagnostic accuracy stage."""
+    parser = argparse.ArgumentParser(description="Diagnostic accuracy of the initial hypotheses.")
+    bootstrap.add_arguments(parser, clusters=['bairro'])
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("DIAGNOSTIC ACCURACY ANALYSIS")
     print("Chikungunya Surveillance Study - Foz do Iguaçu, 2023")
     print("=" * 60)
     
     # Load data
-    rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
+    rtpcr_df = load_dataset('rtpcr', data_dir=DATA_PROCESSED)
     
     # Analysis
-    rtpcr_df, hypothesis_results = analyze_diagnostic_hypotheses(rtpcr_df)
+    rtpcr_df, hypothesis_results = analyze_diagnostic_hypotheses(rtpcr_df, bootstrap.options(args))
     or_results = analyze_factors_accuracy(rtpcr_df)
     model_result = multivariate_logistic_regression(rtpcr_df)
     
     print("\n" + "=" * 60)
     print("✓ Diagnostic accuracy analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,24 +9,36 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import time
 import pandas as pd
 import numpy as np
 from scipy import stats
 from statsmodels.stats.proportion import proportion_confint
+from arbolib.contingency import chi2_by_group, group_counts
+from arbolib.signatures import SIGNATURE, available
+from arbolib.store import dataset_path, load_dataset, write_dataset
+from arbolib.strata import parse_strata, symptoms_by_stratum
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'EXANTEMA', 'NAUSEA', 'VOMITO']
+
 def compare_symptom_frequencies(merged_df):
     """Compare symptom frequencies across groups."""
     print("\n" + "=" * 60)
     print("SYMPTOM FREQUENCY COMPARISON")
     print("=" * 60)
     
-    symptoms = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'EXANTEMA', 'NAUSEA', 'VOMITO']
+    symptoms = available(merged_df, SYMPTOMS)
     groups = merged_df['subgroup'].unique()
     
+    present, total = group_counts(merged_df, 'subgroup', symptoms)
+    freq = (present / total * 100).reindex(groups).fillna(0)
+    tests = chi2_by_group(merged_df, 'subgroup', symptoms)
+    
     results = []
     
     print(f"\n{'Symptom':<12}", end='')
@@ -37,23 +49,13 @@ def compare_symptom_frequencies(merged_df):
     print("-" * 80)
     
     for symptom in symptoms:
-        if symptom not in merged_df.columns:
-            continue
-            
         print(f"{symptom:<12}", end='')
         
-        freqs = []
-        for group in groups:
-            group_data = merged_df[merged_df['subgroup'] == group]
-            n = len(group_data)
-            count = group_data[symptom].sum()
-            pct = count / n * 100 if n > 0 else 0
-            freqs.append(pct)
+        freqs = freq[symptom].tolist()
+        for pct in freqs:
             print(f" {pct:>5.1f}%{'':>5}", end='')
         
-        # Chi-square test
-        contingency = pd.crosstab(merged_df['subgroup'], merged_df[symptom])
-        chi2, p, dof, expected = stats.chi2_contingency(contingency)
+        chi2, p = tests.loc[symptom, ['chi2', 'p']]
         sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         
         print(f" {chi2:>7.2f}  {p:>8.4f} {sig}")
@@ -117,10 +119,10 @@ def compare_hospitalization_rates(merged_df):
     print(f"\n{'Group':<30} {'N':<8} {'Hosp':<8} {'Rate':<10} {'95% CI':<15}")
     print("-" * 75)
     
+    hosp_counts, n_counts = group_counts(merged_df, 'subgroup', ['hospitalized'])
     for group in groups:
-        group_data = merged_df[merged_df['subgroup'] == group]
-        n = len(group_data)
-        hosp = group_data['hospitalized'].sum()
+        n = n_counts.at[group, 'hospitalized']
+        hosp = hosp_counts.at[group, 'hospitalized']
         rate = hosp / n * 100
         ci_low, ci_high = proportion_confint(hosp, n, method='wilson')
         
@@ -128,20 +130,49 @@ def compare_hospitalization_rates(merged_df):
         print(f"{short_name:<30} {n:<8} {hosp:<8} {rate:>5.1f}%{'':>3} [{ci_low*100:.1f}-{ci_high*100:.1f}%]")
     
     # Chi-square test
-    contingency = pd.crosstab(merged_df['subgroup'], merged_df['hospitalized'])
-    chi2, p, dof, expected = stats.chi2_contingency(contingency)
+    chi2, p = chi2_by_group(merged_df, 'subgroup', ['hospitalized']).loc['hospitalized', ['chi2', 'p']]
     sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
     print(f"\nChi-square: {chi2:.2f}, p = {p:.4f} {sig}")
 
 
-if __name__ == "__main__":
+def stratified_comparison(strata):
+    """Write symptom frequencies and tests per stratum and subgroup."""
+    print(f"\nStratified symptom comparison by {', '.join(strata)}...")
+    
+    merged_df = load_dataset('merged', columns=['subgroup', SIGNATURE] + strata,
+                             data_dir=DATA_PROCESSED)
+    
+    start = time.perf_counter()
+    table = symptoms_by_stratum(merged_df, strata, SYMPTOMS)
+    elapsed = time.perf_counter() - start
+    
+    write_dataset(table, 'comparative_strata', data_dir=DATA_PROCESSED, csv=True)
+    n_strata = len(table[strata].drop_duplicates())
+    n_fisher = (table.drop_duplicates(strata + ['symptom'])['test'] == 'fisher').sum()
+    print(f"  {n_strata:,} strata, {len(table):,} rows, {n_fisher:,} Fisher tests ({elapsed:.2f}s)")
+    print(f"  ✓ Saved: {dataset_path('comparative_strata', 'csv', DATA_PROCESSED)}")
+
+
+def main():
+    """Run the comparative analysis stage."""
+    parser = argparse.ArgumentParser(description="Compare RT-PCR+ cases and SINAN subgroups.")
+    parser.add_argument('--strata', type=parse_strata, default=None,
+                        help="comma-separated SINAN keys (e.g. ID_MUNICIP,SEM_PRI); "
+                             "writes a tidy table per stratum instead of the report")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("COMPARATIVE ANALYSIS")
     print("RT-PCR+ vs SINAN Subgroups")
     print("=" * 60)
     
+    if args.strata:
+        stratified_comparison(args.strata)
+        print("\n✓ Comparative analysis complete!")
+        return
+    
     # Load data
-    merged_df = pd.read_csv(f'{DATA_PROCESSED}merged_analysis_dataset.csv')
+    merged_df = load_dataset('merged', data_dir=DATA_PROCESSED)
     
     # Run comparisons
     compare_demographics(merged_df)
@@ -149,3 +180,7 @@ if __name__ == "__main__":
     compare_hospitalization_rates(merged_df)
     
     print("\n✓ Comparative analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,17 +9,40 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import time
 import pandas as pd
 import numpy as np
 from scipy import stats
 import statsmodels.api as sm
 from statsmodels.stats.proportion import proportion_confint
+from arbolib import bootstrap, propensity
+from arbolib.contingency import odds_ratios
+from arbolib.logit import Logit
+from arbolib.stepwise import backward_stepwise
+from arbolib.store import dataset_path, load_dataset, write_dataset
+from arbolib.strata import parse_strata, rates_by_stratum
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
-def analyze_hospitalization_by_group(merged_df):
+# Candidate predictors for the multivariate model (used when present)
+CANDIDATE_SYMPTOMS = ['CEFALEIA', 'FEBRE', 'MIALGIA', 'ARTRALGIA', 'EDEMA', 'EXANTEMA',
+                      'NAUSEA', 'VOMITO', 'CONJUNTIVITE', 'ASTENIA', 'ARTRITE', 'DOR_RETRO_ORBITAL']
+COMORBIDITIES = ['DIABETES', 'HIPERTENSA', 'RENAL', 'AUTO_IMUNE']
+ALARM_SIGNS = ['ALRM_HIPOT', 'ALRM_PLAQ', 'ALRM_VOM', 'ALRM_SANG', 'ALRM_HEMAT',
+               'ALRM_ABDOM', 'ALRM_LETAR', 'ALRM_HEPAT', 'ALRM_LIQ']
+
+# Propensity of laboratory confirmation among SINAN cases
+PS_COVARIATES = ['idade', 'female', 'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+                 'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+# Analysis plan: backward stepwise, variables kept at p < 0.10
+STEPWISE_P = 0.10
+
+
+def analyze_hospitalization_by_group(merged_df, boot=None):
     """Analyze hospitalization rates by diagnostic group."""
     print("\n" + "=" * 60)
     print("HOSPITALIZATION RATES BY GROUP")
@@ -48,6 +71,20 @@ def analyze_hospitalization_by_group(merged_df):
         
         print(f"{group:<35} {n:<7} {hosp:<7} {rate:>5.1f}%   [{ci_low*100:.1f}-{ci_high*100:.1f}%]")
     
+    if boot:
+        clusters = merged_df[boot['cluster']] if boot['cluster'] else None
+        label = f", resampling {boot['cluster']}" if boot['cluster'] else ''
+        print(f"\nBootstrap 95% CI ({boot['n_boot']:,} replicates{label}):")
+        
+        table = bootstrap.bootstrap_rates(merged_df['hospitalized'], merged_df['subgroup'],
+                                          clusters=clusters, n_boot=boot['n_boot'],
+                                          seed=boot['seed'], jobs=boot['jobs'])
+        for group, ci in table.iterrows():
+            print(f"  {group:<33} {ci['rate']*100:>5.1f}%   [{ci['ci_low']*100:.1f}-{ci['ci_high']*100:.1f}%]")
+            result = next(r for r in results if r['group'] == group)
+            result['boot_ci_low'] = ci['ci_low'] * 100
+            result['boot_ci_high'] = ci['ci_high'] * 100
+    
     # Pairwise comparisons
     print("\n--- Pairwise Comparisons ---")
     groups = merged_df['subgroup'].unique()
@@ -79,7 +116,47 @@ def analyze_hospitalization_by_group(merged_df):
     return results
 
 
-def analyze_risk_factors(rtpcr_df):
+def analyze_weighted_hospitalization(merged_df):
+    """Hospitalization of SINAN laboratory vs clinical cases, reweighted by the
+    propensity of laboratory confirmation."""
+    print("\n" + "=" * 60)
+    print("PROPENSITY-WEIGHTED HOSPITALIZATION (SINAN)")
+    print("=" * 60)
+    
+    sinan = merged_df[merged_df['source'] == 'SINAN'].reset_index(drop=True)
+    sinan = sinan.assign(female=(sinan['sexo'] == 'F').astype(int))
+    treated = (sinan['subgroup'] == 'SINAN Laboratory').to_numpy()
+    
+    try:
+        score, _, used = propensity.fit_propensity(sinan, treated, PS_COVARIATES)
+    except Exception as e:
+        print(f"Model error: {e}")
+        return None
+    
+    pairs = propensity.match_nearest(score, treated, k=1)
+    weights = {
+        'Crude': np.ones(len(sinan)),
+        'Matched (1:1)': propensity.matching_weights(pairs, len(sinan)),
+        'IPW': propensity.ipw_weights(score, treated),
+        'Overlap': propensity.overlap_weights(score, treated),
+    }
+    
+    print(f"\nPropensity model: {', '.join(used)}")
+    print(f"\n{'Weights':<15} {'Laboratory':>11} {'Clinical':>10} {'Difference':>11}")
+    print("-" * 50)
+    
+    results = []
+    for name, w in weights.items():
+        rates = propensity.weighted_rates(sinan['hospitalized'], treated, w)
+        diff = rates['treated'] - rates['control']
+        results.append({'weights': name, 'laboratory': rates['treated'] * 100,
+                        'clinical': rates['control'] * 100, 'difference': diff * 100})
+        print(f"{name:<15} {rates['treated']*100:>10.1f}% {rates['control']*100:>9.1f}% {diff*100:>+10.1f}")
+    
+    return results
+
+
+def analyze_risk_factors(rtpcr_df, boot=None):
     """Analyze risk factors for hospitalization in RT-PCR+ cases."""
     print("\n" + "=" * 60)
     print("RISK FACTORS FOR HOSPITALIZATION (RT-PCR+ Cases)")
@@ -88,57 +165,34 @@ def analyze_risk_factors(rtpcr_df):
     # Univariate analysis
     print("\n--- Univariate Analysis ---")
     
-    factors = {
+    factors = pd.DataFrame({
         'age_60plus': (rtpcr_df['idade'] >= 60).astype(int),
         'female': (rtpcr_df['sexo'] == 'F').astype(int),
-        'ARTRALGIA': rtpcr_df['ARTRALGIA'] if 'ARTRALGIA' in rtpcr_df.columns else None,
-        'FEBRE': rtpcr_df['FEBRE'] if 'FEBRE' in rtpcr_df.columns else None,
-        'VOMITO': rtpcr_df['VOMITO'] if 'VOMITO' in rtpcr_df.columns else None,
-        'NAUSEA': rtpcr_df['NAUSEA'] if 'NAUSEA' in rtpcr_df.columns else None,
-    }
+    })
+    for symptom in ['ARTRALGIA', 'FEBRE', 'VOMITO', 'NAUSEA']:
+        if symptom in rtpcr_df.columns:
+            factors[symptom] = rtpcr_df[symptom]
+    
+    table = odds_ratios(rtpcr_df['hospitalized'], factors).dropna(subset=['or'])
     
     print(f"\n{'Factor':<20} {'OR':<8} {'95% CI':<15} {'p-value'}")
     print("-" * 50)
     
     univariate_results = []
     
-    for name, factor in factors.items():
-        if factor is None:
-            continue
-        
-        table = pd.crosstab(factor, rtpcr_df['hospitalized'])
+    for name, row in table.iterrows():
+        p = row['p']
+        sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         
-        if table.shape != (2, 2):
-            continue
+        univariate_results.append({
+            'factor': name,
+            'or': row['or'],
+            'ci_low': row['ci_low'],
+            'ci_high': row['ci_high'],
+            'p': p
+        })
         
-        try:
-            a, b = table.iloc[1, 1], table.iloc[1, 0]
-            c, d = table.iloc[0, 1], table.iloc[0, 0]
-            
-            if min(a, b, c, d) == 0:
-                # Add 0.5 correction
-                a, b, c, d = a + 0.5, b + 0.5, c + 0.5, d + 0.5
-            
-            or_val = (a * d) / (b * c)
-            se_log = np.sqrt(1/a + 1/b + 1/c + 1/d)
-            ci_low = np.exp(np.log(or_val) - 1.96 * se_log)
-            ci_high = np.exp(np.log(or_val) + 1.96 * se_log)
-            
-            chi2, p, dof, exp = stats.chi2_contingency(table)
-            sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
-            
-            univariate_results.append({
-                'factor': name,
-                'or': or_val,
-                'ci_low': ci_low,
-                'ci_high': ci_high,
-                'p': p
-            })
-            
-            print(f"{name:<20} {or_val:>6.2f}   [{ci_low:>5.2f}-{ci_high:>5.2f}]   {p:.4f} {sig}")
-            
-        except Exception as e:
-            continue
+        print(f"{name:<20} {row['or']:>6.2f}   [{row['ci_low']:>5.2f}-{row['ci_high']:>5.2f}]   {p:.4f} {sig}")
     
     # Multivariate analysis
     print("\n--- Multivariate Logistic Regression ---")
@@ -146,15 +200,29 @@ def analyze_risk_factors(rtpcr_df):
     rtpcr_df['age_60plus'] = (rtpcr_df['idade'] >= 60).astype(int)
     rtpcr_df['female'] = (rtpcr_df['sexo'] == 'F').astype(int)
     
-    predictors = ['age_60plus', 'female', 'VOMITO']
-    available = [p for p in predictors if p in rtpcr_df.columns]
+    candidates = [p for p in ['age_60plus', 'female'] + CANDIDATE_SYMPTOMS + COMORBIDITIES + ALARM_SIGNS
+                  if p in rtpcr_df.columns and rtpcr_df[p].nunique() > 1]
     
     try:
+        y = rtpcr_df['hospitalized']
+        selection = backward_stepwise(sm.add_constant(rtpcr_df[candidates].fillna(0)), y,
+                                      threshold=STEPWISE_P)
+        
+        print(f"\nBackward stepwise selection ({len(candidates)} candidates, kept at p < {STEPWISE_P:.2f}):")
+        for step in selection.steps.itertuples():
+            if pd.notna(step.removed):
+                print(f"  - {step.removed:<20} LR p = {step.p:.4f}")
+        print(f"  {selection.fits.fitted} models fitted, {selection.fits.hits} reused")
+        
+        available = selection.selected
+        if not available:
+            print("  No predictor retained")
+            return univariate_results
+        
         X = rtpcr_df[available].fillna(0)
         X = sm.add_constant(X)
-        y = rtpcr_df['hospitalized']
         
-        model = sm.Logit(y, X)
+        model = Logit(y, X)
         result = model.fit(disp=0)
         
         print(f"\n{'Variable':<15} {'aOR':<8} {'95% CI':<15} {'p-value'}")
@@ -170,6 +238,19 @@ def analyze_risk_factors(rtpcr_df):
             sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
             
             print(f"{var:<15} {aor:>6.2f}   [{ci_low:>5.2f}-{ci_high:>5.2f}]   {p:.4f} {sig}")
+        
+        if boot:
+            cluster = boot['cluster'] if boot['cluster'] in rtpcr_df.columns else None
+            clusters = rtpcr_df[cluster] if cluster else None
+            label = f", resampling {cluster}" if cluster else ''
+            print(f"\nBootstrap 95% CI ({boot['n_boot']:,} replicates{label}):")
+            
+            table = bootstrap.bootstrap_logit(X, y, clusters=clusters, n_boot=boot['n_boot'],
+                                              seed=boot['seed'], jobs=boot['jobs'])
+            for var in available:
+                ci = table.loc[var]
+                print(f"{var:<15} {np.exp(result.params[var]):>6.2f}   [{ci['ci_low']:>5.2f}-{ci['ci_high']:>5.2f}]   "
+                      f"({int(ci['n_boot']):,} fits)")
             
     except Exception as e:
         print(f"Model error: {e}")
@@ -177,18 +258,54 @@ def analyze_risk_factors(rtpcr_df):
     return univariate_results
 
 
-if __name__ == "__main__":
+def stratified_rates(strata):
+    """Write hospitalization rates and tests per stratum and subgroup."""
+    print(f"\nStratified hospitalization rates by {', '.join(strata)}...")
+    
+    merged_df = load_dataset('merged', columns=['subgroup', 'hospitalized'] + strata,
+                             data_dir=DATA_PROCESSED)
+    
+    start = time.perf_counter()
+    table = rates_by_stratum(merged_df, strata)
+    elapsed = time.perf_counter() - start
+    
+    write_dataset(table, 'hospitalization_strata', data_dir=DATA_PROCESSED, csv=True)
+    n_strata = len(table[strata].drop_duplicates())
+    print(f"  {n_strata:,} strata, {len(table):,} rows ({elapsed:.2f}s)")
+    print(f"  ✓ Saved: {dataset_path('hospitalization_strata', 'csv', DATA_PROCESSED)}")
+
+
+def main():
+    """Run the hospitalization analysis stage."""
+    parser = argparse.ArgumentParser(description="Hospitalization rates and risk factors.")
+    parser.add_argument('--strata', type=parse_strata, default=None,
+                        help="comma-separated SINAN keys (e.g. ID_MUNICIP,SEM_PRI); "
+                             "writes a tidy table per stratum instead of the report")
+    bootstrap.add_arguments(parser, clusters=['bairro', 'ID_UNIDADE'])
+    args = parser.parse_args()
+    boot = bootstrap.options(args)
+    
     print("=" * 60)
     print("HOSPITALIZATION ANALYSIS")
     print("Chikungunya Surveillance Study")
     print("=" * 60)
     
+    if args.strata:
+        stratified_rates(args.strata)
+        print("\n✓ Hospitalization analysis complete!")
+        return
+    
     # Load data
-    merged_df = pd.read_csv(f'{DATA_PROCESSED}merged_analysis_dataset.csv')
-    rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
+    merged_df = load_dataset('merged', data_dir=DATA_PROCESSED)
+    rtpcr_df = load_dataset('rtpcr', data_dir=DATA_PROCESSED)
     
     # Analysis
-    hosp_results = analyze_hospitalization_by_group(merged_df)
-    risk_results = analyze_risk_factors(rtpcr_df)
+    hosp_results = analyze_hospitalization_by_group(merged_df, boot)
+    weighted_results = analyze_weighted_hospitalization(merged_df)
+    risk_results = analyze_risk_factors(rtpcr_df, boot)
     
     print("\n✓ Hospitalization analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
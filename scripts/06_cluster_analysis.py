@@ -9,56 +9,55 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
-import pandas as pd
+import argparse
 import numpy as np
-from scipy import stats
-from scipy.cluster.hierarchy import linkage, fcluster, dendrogram
-from sklearn.preprocessing import StandardScaler
+from arbolib.clustering import METHODS, ClusterModel
+from arbolib.contingency import chi2_by_group, group_counts
+from arbolib.signatures import SIGNATURE, available, collapse
+from arbolib.store import dataset_path, load_dataset, write_dataset
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
-def perform_cluster_analysis(rtpcr_df):
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+            'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+def perform_cluster_analysis(rtpcr_df, method='ward'):
     """Perform hierarchical clustering on symptom patterns."""
     print("\n" + "=" * 60)
     print("SYMPTOM CLUSTER ANALYSIS")
     print("=" * 60)
     
     # Select symptom variables
-    symptoms = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 
-                'EXANTEMA', 'NAUSEA', 'VOMITO']
-    
-    available_symptoms = [s for s in symptoms if s in rtpcr_df.columns]
-    
-    # Prepare data matrix
-    X = rtpcr_df[available_symptoms].fillna(0).values
+    available_symptoms = available(rtpcr_df, SYMPTOMS)
     
     print(f"\nUsing {len(available_symptoms)} symptom variables:")
     for s in available_symptoms:
         print(f"  - {s}")
     
-    # Standardize
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Standardized symptoms, clustered over the distinct symptom patterns
+    if method == 'minibatch':
+        print("\nPerforming mini-batch k-means clustering...")
+    else:
+        print("\nPerforming hierarchical clustering (Ward's method)...")
+    n_patterns = len(collapse(rtpcr_df[SIGNATURE], available_symptoms)[0])
+    print(f"  {len(rtpcr_df)} cases, {n_patterns} distinct symptom patterns")
     
-    # Hierarchical clustering
-    print("\nPerforming hierarchical clustering (Ward's method)...")
-    linkage_matrix = linkage(X_scaled, method='ward')
-    
-    # Determine optimal number of clusters (3 based on domain knowledge)
+    # Determine optimal number of clusters (3 based on domain knowledge;
+    # see 10_cluster_selection.py)
     n_clusters = 3
-    clusters = fcluster(linkage_matrix, n_clusters, criterion='maxclust')
-    rtpcr_df['cluster'] = clusters
+    model = ClusterModel.fit(rtpcr_df, available_symptoms, n_clusters, method=method)
+    rtpcr_df['cluster'] = model.predict(rtpcr_df)
     
     # Analyze cluster profiles
     print(f"\n--- Cluster Profiles (n={len(rtpcr_df)}) ---")
     
     cluster_profiles = []
+    present, _ = group_counts(rtpcr_df, 'cluster', available_symptoms)
     
     for i in range(1, n_clusters + 1):
-        cluster_data = rtpcr_df[rtpcr_df['cluster'] == i]
-        n = len(cluster_data)
+        n = int((rtpcr_df['cluster'] == i).sum())
         pct = n / len(rtpcr_df) * 100
         
         profile = {'cluster': i, 'n': n, 'pct': pct}
@@ -67,7 +66,7 @@ def perform_cluster_analysis(rtpcr_df):
         print(f"  Symptom frequencies:")
         
         for symptom in available_symptoms:
-            freq = cluster_data[symptom].mean() * 100
+            freq = present.at[i, symptom] / n * 100 if n else np.nan
             profile[symptom] = freq
             bar = '█' * int(freq / 5) + '░' * (20 - int(freq / 5))
             print(f"    {symptom:<12}: {bar} {freq:>5.1f}%")
@@ -96,13 +95,12 @@ def perform_cluster_analysis(rtpcr_df):
     # Chi-square test for cluster distribution
     print("\n--- Statistical Comparison ---")
     
-    for symptom in available_symptoms:
-        contingency = pd.crosstab(rtpcr_df['cluster'], rtpcr_df[symptom])
-        chi2, p, dof, expected = stats.chi2_contingency(contingency)
+    tests = chi2_by_group(rtpcr_df, 'cluster', available_symptoms)
+    for symptom, (chi2, p) in tests[['chi2', 'p']].iterrows():
         sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         print(f"  {symptom:<12}: χ² = {chi2:>7.2f}, p = {p:.4f} {sig}")
     
-    return rtpcr_df, cluster_profiles
+    return rtpcr_df, model, cluster_profiles
 
 
 def analyze_cluster_outcomes(rtpcr_df):
@@ -114,33 +112,45 @@ def analyze_cluster_outcomes(rtpcr_df):
     print(f"\n{'Cluster':<10} {'N':<8} {'Hosp':<8} {'Rate':<10}")
     print("-" * 40)
     
-    for cluster in sorted(rtpcr_df['cluster'].unique()):
-        data = rtpcr_df[rtpcr_df['cluster'] == cluster]
-        n = len(data)
-        hosp = data['hospitalized'].sum()
+    hosp_counts, n_counts = group_counts(rtpcr_df, 'cluster', ['hospitalized'])
+    for cluster in hosp_counts.index:
+        n = n_counts.at[cluster, 'hospitalized']
+        hosp = hosp_counts.at[cluster, 'hospitalized']
         rate = hosp / n * 100 if n > 0 else 0
         print(f"{cluster:<10} {n:<8} {hosp:<8} {rate:>5.1f}%")
     
     # Chi-square test
-    contingency = pd.crosstab(rtpcr_df['cluster'], rtpcr_df['hospitalized'])
-    chi2, p, dof, expected = stats.chi2_contingency(contingency)
+    chi2, p = chi2_by_group(rtpcr_df, 'cluster', ['hospitalized']).loc['hospitalized', ['chi2', 'p']]
     print(f"\nChi-square: {chi2:.2f}, p = {p:.4f}")
 
 
-if __name__ == "__main__":
+def main():
+    """Run the cluster analysis stage."""
+    parser = argparse.ArgumentParser(description="Symptom clustering of RT-PCR+ cases.")
+    parser.add_argument('--method', choices=METHODS, default='ward',
+                        help="ward (exact, over distinct symptom patterns) or "
+                             "minibatch (mini-batch k-means, for very large data)")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("CLUSTER ANALYSIS")
     print("Symptom Pattern Identification")
     print("=" * 60)
     
     # Load data
-    rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
+    rtpcr_df = load_dataset('rtpcr', columns=['id', 'hospitalized', SIGNATURE] + SYMPTOMS,
+                            data_dir=DATA_PROCESSED)
     
     # Analysis
-    rtpcr_df, profiles = perform_cluster_analysis(rtpcr_df)
+    rtpcr_df, model, profiles = perform_cluster_analysis(rtpcr_df, args.method)
     analyze_cluster_outcomes(rtpcr_df)
     
-    # Save with cluster assignments
-    rtpcr_df.to_csv(f'{DATA_PROCESSED}rtpcr_with_clusters.csv', index=False)
+    # Save with cluster assignments, and the model for later stages
+    write_dataset(rtpcr_df, 'rtpcr_clusters', data_dir=DATA_PROCESSED)
+    model.save(dataset_path('cluster_model', 'json', DATA_PROCESSED))
     
     print("\n✓ Cluster analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
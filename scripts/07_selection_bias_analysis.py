@@ -9,15 +9,24 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
-import pandas as pd
 import numpy as np
-from scipy import stats
-import statsmodels.api as sm
+from arbolib import propensity
+from arbolib.contingency import odds_ratios
+from arbolib.store import dataset_path, load_dataset, write_dataset
 import warnings
 warnings.filterwarnings('ignore')
 
 DATA_PROCESSED = '../data/processed/'
 
+# Columns read from the processed store
+COLUMNS = ['sinan_group', 'idade', 'sexo', 'hospitalized', 'FEBRE', 'MIALGIA',
+           'CEFALEIA', 'ARTRALGIA', 'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+# Propensity model predictors, and the covariates checked for balance
+PS_PREDICTORS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'hospitalized']
+BALANCE_COVARIATES = ['idade', 'female', 'FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+                      'EXANTEMA', 'NAUSEA', 'VOMITO', 'hospitalized']
+
 def analyze_selection_bias(sinan_df):
     """Analyze selection bias for PCR testing in SINAN data."""
     print("\n" + "=" * 60)
@@ -42,55 +51,43 @@ def analyze_selection_bias(sinan_df):
     print(f"\n{'Factor':<15} {'Tested %':<12} {'Not Tested %':<15} {'OR':<8} {'p-value'}")
     print("-" * 65)
     
+    present = [s for s in symptoms if s in sinan_df.columns]
+    factors = sinan_df[present + ['hospitalized']]
+    table = odds_ratios(sinan_df['pcr_tested'], factors)
+    freq = sinan_df.groupby('pcr_tested')[present].mean() * 100
+    
     results = []
     
-    for symptom in symptoms:
-        if symptom not in sinan_df.columns:
+    for symptom in present:
+        row = table.loc[symptom]
+        if np.isnan(row['or']):
             continue
         
-        tested = sinan_df[sinan_df['pcr_tested'] == 1]
-        not_tested = sinan_df[sinan_df['pcr_tested'] == 0]
-        
-        freq_tested = tested[symptom].mean() * 100
-        freq_not_tested = not_tested[symptom].mean() * 100
+        freq_tested = freq[symptom].get(1, np.nan)
+        freq_not_tested = freq[symptom].get(0, np.nan)
+        p = row['p']
+        sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         
-        # Chi-square and OR
-        table = pd.crosstab(sinan_df[symptom], sinan_df['pcr_tested'])
+        results.append({
+            'factor': symptom,
+            'freq_tested': freq_tested,
+            'freq_not_tested': freq_not_tested,
+            'or': row['or'],
+            'p': p
+        })
         
-        if table.shape == (2, 2):
-            a, b = table.iloc[1, 1], table.iloc[1, 0]
-            c, d = table.iloc[0, 1], table.iloc[0, 0]
-            
-            if b * c > 0:
-                or_val = (a * d) / (b * c)
-                chi2, p, dof, exp = stats.chi2_contingency(table)
-                sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
-                
-                results.append({
-                    'factor': symptom,
-                    'freq_tested': freq_tested,
-                    'freq_not_tested': freq_not_tested,
-                    'or': or_val,
-                    'p': p
-                })
-                
-                print(f"{symptom:<15} {freq_tested:>5.1f}%{'':>5} {freq_not_tested:>5.1f}%{'':>8} {or_val:>6.2f}   {p:.4f} {sig}")
+        print(f"{symptom:<15} {freq_tested:>5.1f}%{'':>5} {freq_not_tested:>5.1f}%{'':>8} {row['or']:>6.2f}   {p:.4f} {sig}")
     
     # Hospitalization as predictor of testing
     print("\n--- Hospitalization and Testing ---")
     
-    table = pd.crosstab(sinan_df['hospitalized'], sinan_df['pcr_tested'])
-    if table.shape == (2, 2):
-        a, b = table.iloc[1, 1], table.iloc[1, 0]
-        c, d = table.iloc[0, 1], table.iloc[0, 0]
+    row = table.loc['hospitalized']
+    if not np.isnan(row['or']):
+        p = row['p']
+        sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
         
-        if b * c > 0:
-            or_val = (a * d) / (b * c)
-            chi2, p, dof, exp = stats.chi2_contingency(table)
-            sig = '***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else ''
-            
-            print(f"Hospitalized patients more likely to be PCR tested:")
-            print(f"  OR = {or_val:.2f}, p = {p:.4f} {sig}")
+        print(f"Hospitalized patients more likely to be PCR tested:")
+        print(f"  OR = {row['or']:.2f}, p = {p:.4f} {sig}")
     
     return results
 
@@ -103,17 +100,13 @@ def propensity_score_analysis(sinan_df):
     
     sinan_df['pcr_tested'] = (sinan_df['sinan_group'] == 'Laboratory').astype(int)
     
-    # Predictors
-    predictors = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'hospitalized']
-    available = [p for p in predictors if p in sinan_df.columns]
-    
     try:
-        X = sinan_df[available].fillna(0)
-        X = sm.add_constant(X)
-        y = sinan_df['pcr_tested']
+        scores, result, available = propensity.fit_propensity(
+            sinan_df, sinan_df['pcr_tested'], PS_PREDICTORS)
         
-        model = sm.Logit(y, X)
-        result = model.fit(disp=0)
+        constant = [p for p in PS_PREDICTORS if p in sinan_df.columns and p not in available]
+        if constant:
+            print(f"\nLeft out (no variation): {', '.join(constant)}")
         
         print(f"\nModel fit:")
         print(f"  Pseudo R²: {result.prsquared:.3f}")
@@ -130,7 +123,7 @@ def propensity_score_analysis(sinan_df):
             print(f"{var:<15} {coef:>7.3f}  {or_val:>6.2f}   {p:.4f} {sig}")
         
         # Calculate propensity scores
-        sinan_df['propensity_score'] = result.predict(X)
+        sinan_df['propensity_score'] = scores
         
         print(f"\nPropensity score distribution:")
         print(f"  Mean: {sinan_df['propensity_score'].mean():.3f}")
@@ -144,17 +137,68 @@ def propensity_score_analysis(sinan_df):
         return None
 
 
-if __name__ == "__main__":
+def propensity_balance(sinan_df):
+    """Matching and weighting on the propensity score, with balance diagnostics."""
+    print("\n" + "=" * 60)
+    print("PROPENSITY SCORE MATCHING AND WEIGHTING")
+    print("=" * 60)
+    
+    treated = sinan_df['pcr_tested'].to_numpy(dtype=bool)
+    score = sinan_df['propensity_score'].to_numpy()
+    
+    pairs = propensity.match_nearest(score, treated, k=1)
+    n_matched = pairs['treated'].nunique()
+    print(f"\n1:1 nearest-neighbour matching (caliper {propensity.CALIPER_SD} SD of logit score):")
+    print(f"  Tested matched: {n_matched} of {treated.sum()}")
+    print(f"  Distinct untested controls: {pairs['control'].nunique()}")
+    
+    weights = {
+        'matched': propensity.matching_weights(pairs, len(sinan_df)),
+        'ipw': propensity.ipw_weights(score, treated),
+        'overlap': propensity.overlap_weights(score, treated),
+    }
+    
+    print(f"\n{'Weights':<10} {'ESS tested':>11} {'ESS untested':>13}")
+    print("-" * 36)
+    for name, w in weights.items():
+        ess = propensity.effective_size(w, treated)
+        print(f"{name:<10} {ess['treated']:>11.1f} {ess['control']:>13.1f}")
+    
+    covariates = sinan_df.assign(female=(sinan_df['sexo'] == 'F').astype(int))
+    covariates = covariates[[c for c in BALANCE_COVARIATES if c in covariates.columns]]
+    table = propensity.balance_table(covariates, treated, weights)
+    
+    print(f"\nStandardized mean differences (|SMD| < 0.1 = balanced):")
+    print(f"\n{'Covariate':<15} {'Crude':>7} {'Matched':>8} {'IPW':>7} {'Overlap':>8}")
+    print("-" * 50)
+    for name, row in table.iterrows():
+        print(f"{name:<15} {row['smd_crude']:>7.3f} {row['smd_matched']:>8.3f} "
+              f"{row['smd_ipw']:>7.3f} {row['smd_overlap']:>8.3f}")
+    
+    write_dataset(table.reset_index(), 'propensity_balance', data_dir=DATA_PROCESSED, csv=True)
+    print(f"\n✓ Saved: {dataset_path('propensity_balance', 'csv', DATA_PROCESSED)}")
+    
+    return table
+
+
+def main():
+    """Run the selection bias stage."""
     print("=" * 60)
     print("SELECTION BIAS ANALYSIS")
     print("Propensity for PCR Testing")
     print("=" * 60)
     
     # Load data
-    sinan_df = pd.read_csv(f'{DATA_PROCESSED}sinan_processed.csv')
+    sinan_df = load_dataset('sinan', columns=COLUMNS, data_dir=DATA_PROCESSED)
     
     # Analysis
     bias_results = analyze_selection_bias(sinan_df)
     propensity_model = propensity_score_analysis(sinan_df)
+    if propensity_model is not None:
+        propensity_balance(sinan_df)
     
     print("\n✓ Selection bias analysis complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,118 +14,158 @@ This script generates all 7 figures for the Chikungunya surveillance study:
 - Figure 6: Symptom cluster profiles
 - Figure 7: Selection bias analysis
 
-All values are calculated dynamically from processed data.
+All values are calculated dynamically from processed data. The statistics
+behind every figure (odds ratios, logistic fits, cluster assignments,
+propensity scores) are computed once up front; the figures are then drawn
+from those numbers concurrently, one per worker process, with the Agg
+backend.
+
+figures/manifest.json records, for each figure, the hash of its statistics
+and styling and the hashes of the files written. A figure whose hash and
+files are unchanged is not drawn again (``--force`` redraws everything).
 
 Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import inspect
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # non-interactive; pyplot is not thread-safe, so figures render in processes
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy import stats
 from statsmodels.stats.proportion import proportion_confint
 import statsmodels.api as sm
-from scipy.cluster.hierarchy import linkage, fcluster
-from sklearn.preprocessing import StandardScaler
+from arbolib.buildcache import Manifest, data_digest
+from arbolib.clustering import ClusterModel
+from arbolib.contingency import odds_ratios
+from arbolib.diagnosis import DX_CATEGORIES, categorize_diagnoses
+from arbolib.logit import Logit
+from arbolib.store import dataset_path, load_dataset
+from arbolib.strata import parse_strata, rates_by_stratum, symptoms_by_stratum
 import warnings
 warnings.filterwarnings('ignore')
 
 # Configuration
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.size'] = 10
-plt.rcParams['figure.dpi'] = 300
+STYLE = {
+    'font.family': 'DejaVu Sans',
+    'font.size': 10,
+    'figure.dpi': 300,
+}
+plt.rcParams.update(STYLE)
+
+FORMATS = ['png', 'pdf']
+SAVE_OPTIONS = {'dpi': 300, 'bbox_inches': 'tight', 'facecolor': 'white'}
 
 DATA_PROCESSED = '../data/processed/'
 FIGURES_DIR = '../figures/'
+MANIFEST = f'{FIGURES_DIR}manifest.json'
+STRATA_DIR = f'{FIGURES_DIR}strata/'
+
+# Strata drawn per pool task (each task reuses one Figure for all of them)
+STRATA_CHUNK = 100
+
+# Stratum figures keep the layout of tight_layout (no second draw for
+# bbox_inches='tight') and use fast PNG compression: zlib dominates the
+# cost of a 300 dpi PNG
+STRATA_SAVE_OPTIONS = {'dpi': 300, 'facecolor': 'white', 'pil_kwargs': {'compress_level': 1}}
+
+# Diagnostic groups compared in figures 3 and 4, with their labels and colors
+GROUPS = ['RT-PCR Confirmed', 'SINAN Laboratory', 'SINAN Clinical-Epidemiological']
+GROUP_LABELS = {
+    'RT-PCR Confirmed': 'RT-PCR+',
+    'SINAN Laboratory': 'SINAN Laboratory',
+    'SINAN Clinical-Epidemiological': 'SINAN Clinical',
+    'SINAN Total': 'SINAN Total',
+}
+GROUP_COLORS = {
+    'RT-PCR Confirmed': '#2E86AB',
+    'SINAN Laboratory': '#E74C3C',
+    'SINAN Clinical-Epidemiological': '#27AE60',
+    'SINAN Total': '#9B59B6',
+}
+
+# Symptoms compared across groups in figure 3
+COMPARISON_SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+                       'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+# Symptom matrix of 06_cluster_analysis.py (used if its model is missing)
+CLUSTER_SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+                    'EXANTEMA', 'NAUSEA', 'VOMITO']
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
-def categorize_diagnosis(dx):
-    """Categorize diagnostic hypothesis."""
-    if pd.isna(dx):
-        return 'Other'
-    dx = str(dx).upper()
-    if 'CHIKUNGUNYA' in dx and 'DENGUE' not in dx:
-        return 'Chikungunya only'
-    elif 'DENGUE' in dx and 'CHIKUNGUNYA' not in dx:
-        return 'Dengue only'
-    elif 'DENGUE' in dx and 'CHIKUNGUNYA' in dx:
-        return 'Dengue or Chikungunya'
-    elif 'DENGUE OU CHIK' in dx:
-        return 'Dengue or Chikungunya'
-    else:
-        return 'Other'
+def calculate_or_ci(outcome, factors):
+    """Estimable odds ratios as (factor, OR, CI low, CI high, p) tuples."""
+    table = odds_ratios(outcome, factors).dropna(subset=['or'])
+    return list(table[['or', 'ci_low', 'ci_high', 'p']].itertuples(name=None))
+
+
+def save_figure(fig, name):
+    """Save a figure as PNG and PDF (300 dpi) and close it."""
+    for ext in FORMATS:
+        fig.savefig(f'{FIGURES_DIR}{name}.{ext}', **SAVE_OPTIONS)
+    plt.close(fig)
 
-def calculate_or_ci(table):
-    """Calculate odds ratio and 95% CI from 2x2 table."""
-    if table.shape != (2, 2):
-        return None, None, None, None
-    a, b = table.iloc[1, 1], table.iloc[1, 0]
-    c, d = table.iloc[0, 1], table.iloc[0, 0]
-    
-    if b * c == 0:
-        return None, None, None, None
-    
-    odds_ratio = (a * d) / (b * c)
-    se_log_or = np.sqrt(1/a + 1/b + 1/c + 1/d)
-    ci_low = np.exp(np.log(odds_ratio) - 1.96 * se_log_or)
-    ci_high = np.exp(np.log(odds_ratio) + 1.96 * se_log_or)
-    
-    chi2, p, dof, expected = stats.chi2_contingency(table)
-    
-    return odds_ratio, ci_low, ci_high, p
+
+def with_stratum(title, fig_stats):
+    """Figure title, with the stratum on a second line for stratum figures."""
+    return f"{title}\n({fig_stats['stratum']})" if fig_stats.get('stratum') else title
 
 # =============================================================================
 # FIGURE 1: Diagnostic Hypotheses
 # =============================================================================
 
-def create_figure1(rtpcr_df):
-    """Distribution of initial diagnostic hypotheses."""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+def figure1_stats(rtpcr_df):
+    """Diagnostic category counts and initial diagnostic accuracy."""
+    # Diagnostic categories (computed during preprocessing)
+    if 'dx_category' not in rtpcr_df.columns:
+        rtpcr_df['dx_category'] = categorize_diagnoses(rtpcr_df['HIPOTESE_DIAGNOSTICA'])
     
-    # Calculate diagnostic categories
-    rtpcr_df['dx_category'] = rtpcr_df['HIPOTESE_DIAGNOSTICA'].apply(categorize_diagnosis)
-    
-    categories = ['Dengue only', 'Dengue or Chikungunya', 'Chikungunya only', 'Other']
-    counts = []
-    percentages = []
+    n = len(rtpcr_df)
+    correct = (rtpcr_df['diagnostic_correct'] == 1).sum()
+    chik_only = (rtpcr_df['dx_category'] == 'Chikungunya only').sum()
     
-    for cat in categories:
-        count = (rtpcr_df['dx_category'] == cat).sum()
-        counts.append(count)
-        percentages.append(count / len(rtpcr_df) * 100)
+    return {
+        'n': n,
+        'categories': list(DX_CATEGORIES),
+        'counts': [(rtpcr_df['dx_category'] == cat).sum() for cat in DX_CATEGORIES],
+        'accuracy': [correct / n * 100, chik_only / n * 100],
+    }
+
+
+def create_figure1(fig_stats):
+    """Distribution of initial diagnostic hypotheses."""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
     
     colors = ['#E74C3C', '#F39C12', '#27AE60', '#95A5A6']
     
     # Panel A: Donut chart
-    wedges, texts, autotexts = ax1.pie(counts, labels=categories, autopct='%1.1f%%',
+    wedges, texts, autotexts = ax1.pie(fig_stats['counts'], labels=fig_stats['categories'], autopct='%1.1f%%',
                                         colors=colors, pctdistance=0.75,
                                         wedgeprops=dict(width=0.5, edgecolor='white'))
-    ax1.set_title('A. Distribution of Initial Diagnoses\n(n=201 RT-PCR+ cases)', 
+    ax1.set_title(f'A. Distribution of Initial Diagnoses\n(n={fig_stats["n"]} RT-PCR+ cases)',
                   fontweight='bold', fontsize=12)
     
     # Panel B: Accuracy bar chart
-    n = len(rtpcr_df)
-    correct = (rtpcr_df['diagnostic_correct'] == 1).sum()
-    accuracy_overall = correct / n * 100
-    
-    chik_only = (rtpcr_df['dx_category'] == 'Chikungunya only').sum()
-    accuracy_chik = chik_only / n * 100
-    
     accuracy_categories = ['Including\nChikungunya', 'Chikungunya\nonly']
-    accuracy_values = [accuracy_overall, accuracy_chik]
+    accuracy_values = fig_stats['accuracy']
     accuracy_colors = ['#3498DB', '#27AE60']
     
-    bars = ax2.bar(accuracy_categories, accuracy_values, color=accuracy_colors, 
+    bars = ax2.bar(accuracy_categories, accuracy_values, color=accuracy_colors,
                    edgecolor='black', linewidth=1.5)
     
     for bar, val in zip(bars, accuracy_values):
         ax2.annotate(f'{val:.1f}%', xy=(bar.get_x() + bar.get_width()/2, bar.get_height()),
-                    xytext=(0, 5), textcoords='offset points', ha='center', 
+                    xytext=(0, 5), textcoords='offset points', ha='center',
                     fontsize=14, fontweight='bold')
     
     ax2.set_ylabel('Diagnostic Accuracy (%)', fontweight='bold')
@@ -135,51 +175,40 @@ def create_figure1(rtpcr_df):
     ax2.spines['right'].set_visible(False)
     ax2.axhline(y=50, color='red', linestyle='--', alpha=0.5, label='Random chance')
     
-    plt.suptitle('Figure 1. Initial Diagnostic Hypotheses and Accuracy', 
+    fig.suptitle('Figure 1. Initial Diagnostic Hypotheses and Accuracy',
                  fontsize=14, fontweight='bold', y=1.02)
-    plt.tight_layout()
-    
-    plt.savefig(f'{FIGURES_DIR}Figura1_Hipoteses_Diagnosticas.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura1_Hipoteses_Diagnosticas.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 1 created")
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 2: Forest Plot - Diagnostic Accuracy
 # =============================================================================
 
-def create_figure2(rtpcr_df):
-    """Forest plot of factors associated with correct diagnosis."""
-    fig, ax = plt.subplots(figsize=(10, 8))
-    
-    # Calculate ORs for each factor
-    symptoms = ['ARTRALGIA', 'CEFALEIA', 'FEBRE', 'MIALGIA', 'EXANTEMA', 
+def figure2_stats(rtpcr_df):
+    """Odds ratios of correct diagnosis by symptom, largest first."""
+    symptoms = ['ARTRALGIA', 'CEFALEIA', 'FEBRE', 'MIALGIA', 'EXANTEMA',
                 'NAUSEA', 'VOMITO']
     
-    factors_data = []
-    
-    for symptom in symptoms:
-        if symptom not in rtpcr_df.columns:
-            continue
-        table = pd.crosstab(rtpcr_df[symptom], rtpcr_df['diagnostic_correct'])
-        or_val, ci_low, ci_high, p = calculate_or_ci(table)
-        if or_val is not None:
-            factors_data.append((symptom, or_val, ci_low, ci_high, p))
+    factors = rtpcr_df[[s for s in symptoms if s in rtpcr_df.columns]].copy()
     
     # Tourniquet test
     if 'PROVA_LACO' in rtpcr_df.columns:
         rtpcr_df['laco_positive'] = rtpcr_df['PROVA_LACO'].str.contains('POSITIV', case=False, na=False).astype(int)
-        table = pd.crosstab(rtpcr_df['laco_positive'], rtpcr_df['diagnostic_correct'])
-        or_val, ci_low, ci_high, p = calculate_or_ci(table)
-        if or_val is not None:
-            factors_data.append(('Positive tourniquet', or_val, ci_low, ci_high, p))
+        factors['Positive tourniquet'] = rtpcr_df['laco_positive']
+    
+    factors_data = calculate_or_ci(rtpcr_df['diagnostic_correct'], factors)
     
     # Sort by OR (descending)
     factors_data.sort(key=lambda x: x[1], reverse=True)
+    return {'factors': factors_data}
+
+
+def create_figure2(fig_stats):
+    """Forest plot of factors associated with correct diagnosis."""
+    fig, ax = plt.subplots(figsize=(10, 8))
     
+    factors_data = fig_stats['factors']
     y_positions = range(len(factors_data))
     
     for i, (name, or_val, ci_low, ci_high, p) in enumerate(factors_data):
@@ -197,7 +226,7 @@ def create_figure2(rtpcr_df):
     ax.set_yticklabels([f[0] for f in factors_data])
     ax.set_xlabel('Odds Ratio (95% CI)', fontweight='bold')
     ax.set_xlim(0, max([f[2] for f in factors_data]) * 1.3)
-    ax.set_title('Figure 2. Factors Associated with Correct Initial Diagnosis\n(Including Chikungunya in differential)', 
+    ax.set_title('Figure 2. Factors Associated with Correct Initial Diagnosis\n(Including Chikungunya in differential)',
                  fontweight='bold', fontsize=12)
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
@@ -207,57 +236,48 @@ def create_figure2(rtpcr_df):
     ax.text(0.05, -1.5, 'Favors incorrect diagnosis', fontsize=9, color='#E74C3C')
     ax.text(max([f[2] for f in factors_data]) * 0.7, -1.5, 'Favors correct diagnosis', fontsize=9, color='#27AE60')
     
-    plt.tight_layout()
-    plt.savefig(f'{FIGURES_DIR}Figura2_ForestPlot_Acuracia.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura2_ForestPlot_Acuracia.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 2 created")
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 3: Symptom Comparison
 # =============================================================================
 
-def create_figure3(merged_df):
-    """Comparison of symptom frequencies across groups."""
-    fig, ax = plt.subplots(figsize=(14, 8))
-    
-    symptoms = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 
-                'EXANTEMA', 'NAUSEA', 'VOMITO']
-    
-    groups = ['RT-PCR Confirmed', 'SINAN Laboratory', 'SINAN Clinical-Epidemiological']
-    
+def figure3_stats(merged_df):
+    """Size and symptom frequencies (%) of each group, and the arthralgia
+    chi-square p."""
     # Calculate frequencies for each group
-    rtpcr_freqs = []
-    sinan_lab_freqs = []
-    sinan_clin_freqs = []
-    
-    for symptom in symptoms:
-        if symptom not in merged_df.columns:
-            rtpcr_freqs.append(0)
-            sinan_lab_freqs.append(0)
-            sinan_clin_freqs.append(0)
+    n = {}
+    freqs = {}
+    for group in GROUPS:
+        group_data = merged_df[merged_df['subgroup'] == group]
+        if len(group_data) == 0:
             continue
-        
-        rtpcr_data = merged_df[merged_df['subgroup'] == 'RT-PCR Confirmed']
-        sinan_lab_data = merged_df[merged_df['subgroup'] == 'SINAN Laboratory']
-        sinan_clin_data = merged_df[merged_df['subgroup'] == 'SINAN Clinical-Epidemiological']
-        
-        rtpcr_freqs.append(rtpcr_data[symptom].mean() * 100 if len(rtpcr_data) > 0 else 0)
-        sinan_lab_freqs.append(sinan_lab_data[symptom].mean() * 100 if len(sinan_lab_data) > 0 else 0)
-        sinan_clin_freqs.append(sinan_clin_data[symptom].mean() * 100 if len(sinan_clin_data) > 0 else 0)
+        n[group] = len(group_data)
+        freqs[group] = [group_data[symptom].mean() * 100 if symptom in merged_df.columns else 0
+                        for symptom in COMPARISON_SYMPTOMS]
+    
+    # Significance of the ARTRALGIA difference
+    contingency = pd.crosstab(merged_df['subgroup'], merged_df['ARTRALGIA'])
+    chi2, p, dof, expected = stats.chi2_contingency(contingency)
+    
+    return {'symptoms': COMPARISON_SYMPTOMS, 'n': n, 'freqs': freqs,
+            'artralgia_p': p, 'stratum': None}
+
+
+def plot_figure3(ax, fig_stats):
+    """Draw the symptom comparison of one data set or stratum on ``ax``."""
+    symptoms = fig_stats['symptoms']
+    groups = list(fig_stats['freqs'])
     
     x = np.arange(len(symptoms))
     width = 0.25
     
-    bars1 = ax.bar(x - width, rtpcr_freqs, width, label='RT-PCR+ (n=201)', 
-                   color='#2E86AB', edgecolor='black')
-    bars2 = ax.bar(x, sinan_lab_freqs, width, label='SINAN Laboratory (n=558)', 
-                   color='#E74C3C', edgecolor='black')
-    bars3 = ax.bar(x + width, sinan_clin_freqs, width, label='SINAN Clinical (n=543)', 
-                   color='#27AE60', edgecolor='black')
+    for i, group in enumerate(groups):
+        ax.bar(x + (i - (len(groups) - 1) / 2) * width, fig_stats['freqs'][group], width,
+               label=f'{GROUP_LABELS[group]} (n={fig_stats["n"][group]})',
+               color=GROUP_COLORS[group], edgecolor='black')
     
     ax.set_ylabel('Frequency (%)', fontweight='bold', fontsize=12)
     ax.set_xticks(x)
@@ -268,109 +288,111 @@ def create_figure3(merged_df):
     ax.spines['right'].set_visible(False)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
     
-    # Add significance markers for ARTRALGIA (index 3)
-    if len(symptoms) > 3:
-        contingency = pd.crosstab(merged_df['subgroup'], merged_df['ARTRALGIA'])
-        chi2, p, dof, expected = stats.chi2_contingency(contingency)
-        if p < 0.001:
-            ax.text(3, 90, '***', ha='center', fontsize=14, fontweight='bold')
-    
-    plt.title('Figure 3. Symptom Frequency Comparison Across Diagnostic Groups', 
-              fontsize=13, fontweight='bold', pad=15)
-    plt.tight_layout()
+    # Add significance markers for ARTRALGIA
+    if fig_stats['artralgia_p'] < 0.001 and 'ARTRALGIA' in symptoms:
+        ax.text(symptoms.index('ARTRALGIA'), 90, '***', ha='center', fontsize=14, fontweight='bold')
     
-    plt.savefig(f'{FIGURES_DIR}Figura3_Comparacao_Sintomas.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura3_Comparacao_Sintomas.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 3 created")
+    ax.set_title(with_stratum('Figure 3. Symptom Frequency Comparison Across Diagnostic Groups', fig_stats),
+                 fontsize=13, fontweight='bold', pad=15)
+
+
+def create_figure3(fig_stats):
+    """Comparison of symptom frequencies across groups."""
+    fig, ax = plt.subplots(figsize=(14, 8))
+    plot_figure3(ax, fig_stats)
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 4: Hospitalization Rates
 # =============================================================================
 
-def create_figure4(merged_df):
-    """Hospitalization rates by diagnostic criteria."""
-    fig, ax = plt.subplots(figsize=(10, 7))
-    
-    groups = ['RT-PCR Confirmed', 'SINAN Laboratory', 'SINAN Clinical-Epidemiological']
-    group_labels = ['RT-PCR+\n(n=201)', 'SINAN\nLaboratory\n(n=558)', 
-                    'SINAN\nClinical\n(n=543)']
-    
-    rates = []
-    colors = ['#2E86AB', '#E74C3C', '#27AE60']
-    
-    for group in groups:
+def figure4_stats(merged_df):
+    """Size and hospitalization rate (%) of each group and of all SINAN
+    cases, and the RT-PCR+ vs SINAN Laboratory two-proportion z-test."""
+    n = {}
+    rates = {}
+    for group in GROUPS:
         group_data = merged_df[merged_df['subgroup'] == group]
-        n = len(group_data)
-        hosp = group_data['hospitalized'].sum()
-        rate = hosp / n * 100 if n > 0 else 0
-        rates.append(rate)
+        if len(group_data) == 0:
+            continue
+        n[group] = len(group_data)
+        rates[group] = group_data['hospitalized'].sum() / n[group] * 100
     
     # Add SINAN Total
     sinan_total = merged_df[merged_df['source'] == 'SINAN']
-    n_sinan_total = len(sinan_total)
-    hosp_sinan_total = sinan_total['hospitalized'].sum()
-    rate_sinan_total = hosp_sinan_total / n_sinan_total * 100 if n_sinan_total > 0 else 0
+    if len(sinan_total) > 0:
+        n['SINAN Total'] = len(sinan_total)
+        rates['SINAN Total'] = sinan_total['hospitalized'].sum() / len(sinan_total) * 100
     
-    groups.append('SINAN Total')
-    group_labels.append(f'SINAN\nTotal\n(n={n_sinan_total})')
-    rates.append(rate_sinan_total)
-    colors.append('#9B59B6')
+    # RT-PCR+ vs SINAN Lab
+    p_val = None
+    if 'RT-PCR Confirmed' in n and 'SINAN Laboratory' in n:
+        rtpcr_data = merged_df[merged_df['subgroup'] == 'RT-PCR Confirmed']
+        sinan_lab_data = merged_df[merged_df['subgroup'] == 'SINAN Laboratory']
+        n1, x1 = len(rtpcr_data), rtpcr_data['hospitalized'].sum()
+        n2, x2 = len(sinan_lab_data), sinan_lab_data['hospitalized'].sum()
+        p1, p2 = x1/n1, x2/n2
+        p_pool = (x1 + x2) / (n1 + n2)
+        if p_pool > 0 and p_pool < 1:
+            se = np.sqrt(p_pool * (1 - p_pool) * (1/n1 + 1/n2))
+            z = (p1 - p2) / se
+            p_val = 2 * (1 - stats.norm.cdf(abs(z)))
+    
+    return {'n': n, 'rates': rates, 'p_lab': p_val, 'stratum': None}
+
+
+def plot_figure4(ax, fig_stats):
+    """Draw the hospitalization rates of one data set or stratum on ``ax``."""
+    groups = list(fig_stats['rates'])
+    group_labels = []
+    for group in groups:
+        label = GROUP_LABELS[group].replace(' ', '\n')
+        group_labels.append(f'{label}\n(n={fig_stats["n"][group]})')
+    colors = [GROUP_COLORS[group] for group in groups]
+    rates = [fig_stats['rates'][group] for group in groups]
     
     bars = ax.bar(group_labels, rates, color=colors, edgecolor='black', linewidth=2)
     
     for bar, rate in zip(bars, rates):
         ax.annotate(f'{rate:.1f}%', xy=(bar.get_x() + bar.get_width()/2, bar.get_height()),
-                   xytext=(0, 5), textcoords='offset points', ha='center', 
+                   xytext=(0, 5), textcoords='offset points', ha='center',
                    fontsize=14, fontweight='bold')
     
     # Statistical comparisons
     y_max = max(rates) + 5
     
-    # RT-PCR+ vs SINAN Lab
-    rtpcr_data = merged_df[merged_df['subgroup'] == 'RT-PCR Confirmed']
-    sinan_lab_data = merged_df[merged_df['subgroup'] == 'SINAN Laboratory']
-    n1, x1 = len(rtpcr_data), rtpcr_data['hospitalized'].sum()
-    n2, x2 = len(sinan_lab_data), sinan_lab_data['hospitalized'].sum()
-    p1, p2 = x1/n1, x2/n2
-    p_pool = (x1 + x2) / (n1 + n2)
-    if p_pool > 0 and p_pool < 1:
-        se = np.sqrt(p_pool * (1 - p_pool) * (1/n1 + 1/n2))
-        z = (p1 - p2) / se
-        p_val = 2 * (1 - stats.norm.cdf(abs(z)))
-        if p_val < 0.05:
-            ax.plot([0, 0, 1, 1], [y_max, y_max+1, y_max+1, y_max], 'k-', lw=1.5)
-            ax.text(0.5, y_max+1.5, f'p={p_val:.3f}', ha='center', fontsize=10, fontweight='bold')
+    # RT-PCR+ vs SINAN Lab (the first two bars)
+    p_val = fig_stats['p_lab']
+    if p_val is not None and p_val < 0.05:
+        ax.plot([0, 0, 1, 1], [y_max, y_max+1, y_max+1, y_max], 'k-', lw=1.5)
+        ax.text(0.5, y_max+1.5, f'p={p_val:.3f}', ha='center', fontsize=10, fontweight='bold')
     
     ax.set_ylabel('Hospitalization Rate (%)', fontsize=12, fontweight='bold')
-    ax.set_ylim(0, max(rates) * 1.4)
+    ax.set_ylim(0, max(rates) * 1.4 or 1)
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
     
-    plt.title('Figure 4. Hospitalization Rates by Diagnostic Confirmation Criteria', 
-              fontsize=13, fontweight='bold', pad=15)
-    plt.tight_layout()
-    
-    plt.savefig(f'{FIGURES_DIR}Figura4_Hospitalizacao.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura4_Hospitalizacao.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 4 created")
+    ax.set_title(with_stratum('Figure 4. Hospitalization Rates by Diagnostic Confirmation Criteria', fig_stats),
+                 fontsize=13, fontweight='bold', pad=15)
+
+
+def create_figure4(fig_stats):
+    """Hospitalization rates by diagnostic criteria."""
+    fig, ax = plt.subplots(figsize=(10, 7))
+    plot_figure4(ax, fig_stats)
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 5: Risk Factors for Hospitalization
 # =============================================================================
 
-def create_figure5(rtpcr_df):
-    """Risk factors for hospitalization - multivariate analysis."""
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
+def figure5_stats(rtpcr_df):
+    """Adjusted odds ratios of hospitalization (None if none could be estimated)."""
     # Prepare data for multivariate model
     rtpcr_df['age_60plus'] = (rtpcr_df['idade'] >= 60).astype(int)
     rtpcr_df['female'] = (rtpcr_df['sexo'] == 'F').astype(int)
@@ -391,7 +413,7 @@ def create_figure5(rtpcr_df):
         X = sm.add_constant(X)
         y = rtpcr_df['hospitalized']
         
-        model = sm.Logit(y, X)
+        model = Logit(y, X)
         result = model.fit(disp=0)
         
         conf = result.conf_int()
@@ -414,17 +436,21 @@ def create_figure5(rtpcr_df):
     except Exception as e:
         print(f"Warning: Could not fit multivariate model: {e}")
         # Fallback to univariate
-        for var in available:
-            table = pd.crosstab(rtpcr_df[var], rtpcr_df['hospitalized'])
-            or_val, ci_low, ci_high, p = calculate_or_ci(table)
-            if or_val is not None:
-                var_name = var.replace('_', ' ').title()
-                factors_data.append((var_name, or_val, ci_low, ci_high, p))
+        for var, or_val, ci_low, ci_high, p in calculate_or_ci(rtpcr_df['hospitalized'], rtpcr_df[available]):
+            var_name = var.replace('_', ' ').title()
+            factors_data.append((var_name, or_val, ci_low, ci_high, p))
     
     if not factors_data:
         print("Warning: No factors found for Figure 5")
-        return
+        return None
+    return {'factors': factors_data}
+
+
+def create_figure5(fig_stats):
+    """Risk factors for hospitalization - multivariate analysis."""
+    fig, ax = plt.subplots(figsize=(10, 6))
     
+    factors_data = fig_stats['factors']
     y_positions = range(len(factors_data))
     
     for i, (name, or_val, ci_low, ci_high, p) in enumerate(factors_data):
@@ -444,46 +470,36 @@ def create_figure5(rtpcr_df):
     ax.spines['right'].set_visible(False)
     ax.grid(axis='x', alpha=0.3, linestyle='--')
     
-    plt.title('Figure 5. Independent Risk Factors for Hospitalization\n(Multivariate Logistic Regression, RT-PCR+ cases)', 
-              fontsize=12, fontweight='bold', pad=15)
-    plt.tight_layout()
-    
-    plt.savefig(f'{FIGURES_DIR}Figura5_Fatores_Risco_Hospitalizacao.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura5_Fatores_Risco_Hospitalizacao.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 5 created")
+    ax.set_title('Figure 5. Independent Risk Factors for Hospitalization\n(Multivariate Logistic Regression, RT-PCR+ cases)',
+                 fontsize=12, fontweight='bold', pad=15)
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 6: Symptom Clusters
 # =============================================================================
 
-def create_figure6(rtpcr_df):
-    """Symptom cluster profiles - radar plot."""
-    fig = plt.figure(figsize=(14, 6))
-    
-    # Perform clustering if not already done
-    symptoms = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'NAUSEA', 'VOMITO']
-    available_symptoms = [s for s in symptoms if s in rtpcr_df.columns]
-    
-    if 'cluster' not in rtpcr_df.columns:
-        X = rtpcr_df[available_symptoms].fillna(0).values
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        linkage_matrix = linkage(X_scaled, method='ward')
-        clusters = fcluster(linkage_matrix, 3, criterion='maxclust')
-        rtpcr_df['cluster'] = clusters
-    
-    categories = available_symptoms[:6]  # Limit to 6 for radar plot
-    N = len(categories)
-    angles = [n / float(N) * 2 * np.pi for n in range(N)]
-    angles += angles[:1]
+def load_cluster_model(rtpcr_df):
+    """Cluster model saved by 06_cluster_analysis.py (fitted here if missing)."""
+    path = dataset_path('cluster_model', 'json', DATA_PROCESSED)
+    if os.path.exists(path):
+        return ClusterModel.load(path)
+    print("  Cluster model not found (run 06_cluster_analysis.py); fitting it here")
+    symptoms = [s for s in CLUSTER_SYMPTOMS if s in rtpcr_df.columns]
+    return ClusterModel.fit(rtpcr_df, symptoms, n_clusters=3)
+
+
+def figure6_stats(rtpcr_df):
+    """Symptom profile, size and share of each cluster, and the chi-square
+    test of arthralgia across clusters."""
+    # Clusters of the model fitted by 06_cluster_analysis.py
+    model = load_cluster_model(rtpcr_df)
+    rtpcr_df['cluster'] = model.predict(rtpcr_df)
     
     # Calculate cluster profiles
     cluster_profiles = {}
-    for i in range(1, 4):
+    for i in range(1, model.n_clusters + 1):
         cluster_data = rtpcr_df[rtpcr_df['cluster'] == i]
         if len(cluster_data) == 0:
             continue
@@ -491,7 +507,7 @@ def create_figure6(rtpcr_df):
         pct = n / len(rtpcr_df) * 100
         
         values = []
-        for symptom in categories:
+        for symptom in model.symptoms:
             freq = cluster_data[symptom].mean() * 100
             values.append(freq)
         
@@ -501,6 +517,23 @@ def create_figure6(rtpcr_df):
             'pct': pct
         }
     
+    # Chi-square test
+    contingency = pd.crosstab(rtpcr_df['cluster'], rtpcr_df['ARTRALGIA'])
+    chi2, p, dof, expected = stats.chi2_contingency(contingency)
+    
+    return {'symptoms': model.symptoms, 'profiles': cluster_profiles, 'chi2': chi2, 'p': p}
+
+
+def create_figure6(fig_stats):
+    """Symptom cluster profiles - radar plot."""
+    fig = plt.figure(figsize=(14, 6))
+    
+    categories = fig_stats['symptoms']
+    cluster_profiles = fig_stats['profiles']
+    N = len(categories)
+    angles = [n / float(N) * 2 * np.pi for n in range(N)]
+    angles += angles[:1]
+    
     colors = ['#2166AC', '#1B7837', '#D95F02']
     
     # Panel A: Radar chart
@@ -536,9 +569,9 @@ def create_figure6(rtpcr_df):
     x = np.arange(len(cluster_labels))
     width = 0.35
     
-    bars1 = ax2.bar(x - width/2, total_pct, width, label='Total Cluster %', 
+    bars1 = ax2.bar(x - width/2, total_pct, width, label='Total Cluster %',
                     color='lightgray', edgecolor='gray')
-    bars2 = ax2.bar(x + width/2, rtpcr_pct, width, label='RT-PCR+ in Cluster %', 
+    bars2 = ax2.bar(x + width/2, rtpcr_pct, width, label='RT-PCR+ in Cluster %',
                     color=colors[:len(cluster_labels)], edgecolor='black')
     
     for bar, val in zip(bars1, total_pct):
@@ -546,7 +579,7 @@ def create_figure6(rtpcr_df):
                     xytext=(0, 3), textcoords='offset points', ha='center', fontsize=9)
     for bar, val in zip(bars2, rtpcr_pct):
         ax2.annotate(f'{val:.1f}%', xy=(bar.get_x() + bar.get_width()/2, bar.get_height()),
-                    xytext=(0, 3), textcoords='offset points', ha='center', 
+                    xytext=(0, 3), textcoords='offset points', ha='center',
                     fontsize=9, fontweight='bold')
     
     ax2.set_ylabel('Proportion (%)', fontweight='bold')
@@ -557,90 +590,34 @@ def create_figure6(rtpcr_df):
     ax2.spines['top'].set_visible(False)
     ax2.spines['right'].set_visible(False)
     ax2.grid(axis='y', alpha=0.3, linestyle='--')
+    ax2.set_title(f'B. RT-PCR+ Concentration by Cluster\n(χ²={fig_stats["chi2"]:.2f}; p={fig_stats["p"]:.3f})', fontweight='bold')
     
-    # Chi-square test
-    contingency = pd.crosstab(rtpcr_df['cluster'], rtpcr_df['ARTRALGIA'])
-    chi2, p, dof, expected = stats.chi2_contingency(contingency)
-    ax2.set_title(f'B. RT-PCR+ Concentration by Cluster\n(χ²={chi2:.2f}; p={p:.3f})', fontweight='bold')
-    
-    plt.suptitle('Figure 6. Hierarchical Clustering Analysis - Symptom Profiles', 
+    fig.suptitle('Figure 6. Hierarchical Clustering Analysis - Symptom Profiles',
                  fontsize=13, fontweight='bold', y=1.02)
-    plt.tight_layout()
-    
-    plt.savefig(f'{FIGURES_DIR}Figura6_Clusters_Sintomaticos.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura6_Clusters_Sintomaticos.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 6 created")
+    fig.tight_layout()
+    return fig
 
 
 # =============================================================================
 # FIGURE 7: Selection Bias
 # =============================================================================
 
-def create_figure7(sinan_df):
-    """Selection bias analysis for PCR testing."""
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-    
+def figure7_stats(sinan_df):
+    """Odds ratios of PCR testing and propensity scores of tested and
+    untested SINAN cases."""
     sinan_df['pcr_tested'] = (sinan_df['sinan_group'] == 'Laboratory').astype(int)
     
-    # Panel A: Factors associated with PCR testing
-    factors = []
-    or_values = []
-    ci_lows = []
-    ci_highs = []
-    
-    # Hospitalization
-    table = pd.crosstab(sinan_df['hospitalized'], sinan_df['pcr_tested'])
-    or_val, ci_low, ci_high, p = calculate_or_ci(table)
-    if or_val is not None:
-        factors.append('Hospitalization')
-        or_values.append(or_val)
-        ci_lows.append(ci_low)
-        ci_highs.append(ci_high)
-    
-    # Symptoms
+    # Factors associated with PCR testing
+    # (hospitalization, symptoms and age ≥60)
     symptoms = ['ARTRALGIA', 'FEBRE', 'MIALGIA']
-    for symptom in symptoms:
-        if symptom not in sinan_df.columns:
-            continue
-        table = pd.crosstab(sinan_df[symptom], sinan_df['pcr_tested'])
-        or_val, ci_low, ci_high, p = calculate_or_ci(table)
-        if or_val is not None:
-            factors.append(symptom)
-            or_values.append(or_val)
-            ci_lows.append(ci_low)
-            ci_highs.append(ci_high)
-    
-    # Age ≥60
     sinan_df['age_60plus'] = (sinan_df['idade'] >= 60).astype(int)
-    table = pd.crosstab(sinan_df['age_60plus'], sinan_df['pcr_tested'])
-    or_val, ci_low, ci_high, p = calculate_or_ci(table)
-    if or_val is not None:
-        factors.append('Age ≥60')
-        or_values.append(or_val)
-        ci_lows.append(ci_low)
-        ci_highs.append(ci_high)
-    
-    y_pos = range(len(factors))
     
-    for i, (f, or_val, cl, ch) in enumerate(zip(factors, or_values, ci_lows, ci_highs)):
-        color = '#E74C3C' if cl > 1 else '#3498DB'
-        ax1.plot([cl, ch], [i, i], color=color, linewidth=2.5)
-        ax1.plot(or_val, i, 'D', color=color, markersize=10)
+    exposures = sinan_df[['hospitalized'] + [s for s in symptoms if s in sinan_df.columns] + ['age_60plus']]
+    exposures = exposures.rename(columns={'hospitalized': 'Hospitalization', 'age_60plus': 'Age ≥60'})
     
-    ax1.axvline(x=1, color='black', linestyle='--', linewidth=1)
-    ax1.set_yticks(y_pos)
-    ax1.set_yticklabels(factors)
-    ax1.set_xlabel('Odds Ratio for PCR Testing (95% CI)', fontweight='bold')
-    ax1.set_xlim(0, max(ci_highs) * 1.2 if ci_highs else 6)
-    ax1.set_title('A. Factors Associated with\nPCR Testing (Selection Bias)', fontweight='bold')
-    ax1.spines['top'].set_visible(False)
-    ax1.spines['right'].set_visible(False)
-    ax1.grid(axis='x', alpha=0.3, linestyle='--')
+    rows = calculate_or_ci(sinan_df['pcr_tested'], exposures)
     
-    # Panel B: Propensity score distribution
+    # Propensity score
     predictors = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'hospitalized']
     available = [p for p in predictors if p in sinan_df.columns]
     
@@ -649,7 +626,7 @@ def create_figure7(sinan_df):
         X = sm.add_constant(X)
         y = sinan_df['pcr_tested']
         
-        model = sm.Logit(y, X)
+        model = Logit(y, X)
         result = model.fit(disp=0)
         sinan_df['propensity_score'] = result.predict(X)
     except:
@@ -669,9 +646,44 @@ def create_figure7(sinan_df):
         tested_scores = sinan_df[sinan_df['pcr_tested'] == 1]['propensity_score'].values
         not_tested_scores = sinan_df[sinan_df['pcr_tested'] == 0]['propensity_score'].values
     
-    ax2.hist(tested_scores, bins=30, alpha=0.7, label=f'PCR Tested (n={len(tested_scores)})', 
+    return {'factors': rows, 'tested_scores': tested_scores, 'not_tested_scores': not_tested_scores}
+
+
+def create_figure7(fig_stats):
+    """Selection bias analysis for PCR testing."""
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    
+    # Panel A: Factors associated with PCR testing
+    rows = fig_stats['factors']
+    factors = [r[0] for r in rows]
+    or_values = [r[1] for r in rows]
+    ci_lows = [r[2] for r in rows]
+    ci_highs = [r[3] for r in rows]
+    
+    y_pos = range(len(factors))
+    
+    for i, (f, or_val, cl, ch) in enumerate(zip(factors, or_values, ci_lows, ci_highs)):
+        color = '#E74C3C' if cl > 1 else '#3498DB'
+        ax1.plot([cl, ch], [i, i], color=color, linewidth=2.5)
+        ax1.plot(or_val, i, 'D', color=color, markersize=10)
+    
+    ax1.axvline(x=1, color='black', linestyle='--', linewidth=1)
+    ax1.set_yticks(y_pos)
+    ax1.set_yticklabels(factors)
+    ax1.set_xlabel('Odds Ratio for PCR Testing (95% CI)', fontweight='bold')
+    ax1.set_xlim(0, max(ci_highs) * 1.2 if ci_highs else 6)
+    ax1.set_title('A. Factors Associated with\nPCR Testing (Selection Bias)', fontweight='bold')
+    ax1.spines['top'].set_visible(False)
+    ax1.spines['right'].set_visible(False)
+    ax1.grid(axis='x', alpha=0.3, linestyle='--')
+    
+    # Panel B: Propensity score distribution
+    tested_scores = fig_stats['tested_scores']
+    not_tested_scores = fig_stats['not_tested_scores']
+    
+    ax2.hist(tested_scores, bins=30, alpha=0.7, label=f'PCR Tested (n={len(tested_scores)})',
              color='#E74C3C', edgecolor='white')
-    ax2.hist(not_tested_scores, bins=30, alpha=0.7, label=f'Not PCR Tested (n={len(not_tested_scores)})', 
+    ax2.hist(not_tested_scores, bins=30, alpha=0.7, label=f'Not PCR Tested (n={len(not_tested_scores)})',
              color='#3498DB', edgecolor='white')
     
     ax2.set_xlabel('Propensity Score', fontweight='bold')
@@ -681,51 +693,288 @@ def create_figure7(sinan_df):
     ax2.spines['top'].set_visible(False)
     ax2.spines['right'].set_visible(False)
     
-    plt.suptitle('Figure 7. Selection Bias Analysis for PCR Testing', 
+    fig.suptitle('Figure 7. Selection Bias Analysis for PCR Testing',
                  fontsize=13, fontweight='bold', y=1.02)
-    plt.tight_layout()
+    fig.tight_layout()
+    return fig
+
+
+# =============================================================================
+# STATISTICS AND RENDERING
+# =============================================================================
+
+# Figure number: (output file name, statistics, drawing function)
+FIGURES = {
+    1: ('Figura1_Hipoteses_Diagnosticas', figure1_stats, create_figure1),
+    2: ('Figura2_ForestPlot_Acuracia', figure2_stats, create_figure2),
+    3: ('Figura3_Comparacao_Sintomas', figure3_stats, create_figure3),
+    4: ('Figura4_Hospitalizacao', figure4_stats, create_figure4),
+    5: ('Figura5_Fatores_Risco_Hospitalizacao', figure5_stats, create_figure5),
+    6: ('Figura6_Clusters_Sintomaticos', figure6_stats, create_figure6),
+    7: ('Figura7_Vies_Selecao', figure7_stats, create_figure7),
+}
+
+# Figures that can be drawn per stratum: Axes-level drawing function and size
+STRATUM_FIGURES = {
+    3: (plot_figure3, (14, 8)),
+    4: (plot_figure4, (10, 7)),
+}
+
+# Dataset each figure's statistics are computed from
+FIGURE_DATA = {1: 'rtpcr', 2: 'rtpcr', 3: 'merged', 4: 'merged',
+               5: 'rtpcr', 6: 'rtpcr', 7: 'sinan'}
+
+
+def compute_statistics(datasets):
+    """Numbers behind every figure, keyed by figure number.
+    
+    Computed once, in this process, before any figure is drawn; a figure
+    whose statistics could not be estimated maps to None.
+    """
+    return {number: stats_func(datasets[FIGURE_DATA[number]])
+            for number, (name, stats_func, draw) in FIGURES.items()}
+
+
+def figure_files(number):
+    """Names of a figure's output files (relative to FIGURES_DIR)."""
+    return [f'{FIGURES[number][0]}.{ext}' for ext in FORMATS]
+
+
+def figure_digest(number, fig_stats, formats=FORMATS, save_options=SAVE_OPTIONS):
+    """Hash of everything a figure's pixels depend on: its statistics, the
+    style and save settings, its drawing code and the matplotlib version."""
+    drawers = [FIGURES[number][2]] + ([STRATUM_FIGURES[number][0]]
+                                      if number in STRATUM_FIGURES else [])
+    return data_digest([fig_stats, STYLE, save_options, formats,
+                        [inspect.getsource(draw) for draw in drawers],
+                        matplotlib.__version__])
+
+
+def render_figure(number, fig_stats):
+    """Draw and save one figure; returns the seconds it took."""
+    start = time.perf_counter()
+    name, stats_func, draw = FIGURES[number]
+    save_figure(draw(fig_stats), name)
+    return time.perf_counter() - start
+
+
+def render_figures(statistics, jobs=0):
+    """Render every figure that has statistics; returns {number: seconds}.
+    
+    With ``jobs`` > 1 (0 = all CPUs) the figures are drawn on a process
+    pool, each worker with its own pyplot state; the workers receive only
+    the precomputed statistics.
+    """
+    numbers = [number for number, fig_stats in statistics.items() if fig_stats is not None]
+    jobs = min(jobs or os.cpu_count(), len(numbers))
+    
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            seconds = list(pool.map(render_figure, numbers, [statistics[n] for n in numbers]))
+    else:
+        seconds = [render_figure(number, statistics[number]) for number in numbers]
+    return dict(zip(numbers, seconds))
+
+
+# =============================================================================
+# FIGURES BY STRATUM
+# =============================================================================
+
+def strata_statistics(merged_df, strata):
+    """Figure 3 and 4 statistics of every stratum.
+    
+    The numbers come from the batched engines of ``arbolib.strata`` (one
+    groupby pass for all strata) and are only regrouped per stratum here.
+    Returns a list of (file name suffix, {figure number: fig_stats}).
+    """
+    symptoms = symptoms_by_stratum(merged_df, strata, COMPARISON_SYMPTOMS)
+    rates = rates_by_stratum(merged_df, strata)
+    
+    pct = (symptoms.set_index(strata + ['subgroup', 'symptom'])['pct']
+           .unstack('symptom').reindex(columns=COMPARISON_SYMPTOMS, fill_value=0))
+    artralgia_p = (symptoms[symptoms['symptom'] == 'ARTRALGIA']
+                   .drop_duplicates(strata).set_index(strata)['p'])
+    sinan = merged_df[merged_df['source'] == 'SINAN'].groupby(strata, observed=True)['hospitalized']
+    sinan_n, sinan_events = sinan.size(), sinan.sum()
+    
+    out = []
+    for key, rows in rates.groupby(strata, sort=True):
+        # Index label of this stratum in the tables keyed by the strata alone
+        label = key if len(strata) > 1 else key[0]
+        stratum = ', '.join(f'{k} {v}' for k, v in zip(strata, key))
+        groups = [g for g in GROUPS if g in set(rows['subgroup'])]
+        rows = rows.set_index('subgroup').loc[groups]
+        n = {group: int(rows.at[group, 'n']) for group in groups}
+        
+        figure3 = {
+            'symptoms': COMPARISON_SYMPTOMS,
+            'n': n,
+            'freqs': {group: pct.loc[key + (group,)].tolist() for group in groups},
+            'artralgia_p': artralgia_p.get(label, 1.0),
+            'stratum': stratum,
+        }
+        
+        # RT-PCR cases carry no SINAN geography, so there is no RT-PCR+ vs
+        # SINAN Laboratory test within a stratum
+        figure4 = {'n': dict(n), 'rates': rows['rate'].to_dict(), 'p_lab': None, 'stratum': stratum}
+        if label in sinan_n.index:
+            figure4['n']['SINAN Total'] = int(sinan_n[label])
+            figure4['rates']['SINAN Total'] = sinan_events[label] / sinan_n[label] * 100
+        
+        suffix = '_'.join(f'{k}-{v}' for k, v in zip(strata, key))
+        out.append((suffix, {3: figure3, 4: figure4}))
+    return out
+
+
+def render_stratum_batch(number, batch):
+    """Draw one figure for a batch of (file stem, fig_stats) strata.
+    
+    A single Figure and Axes is created and cleared between strata, so the
+    per-figure cost is one draw and the PNG encoding. Returns the seconds
+    it took.
+    """
+    start = time.perf_counter()
+    plot, figsize = STRATUM_FIGURES[number]
+    fig, ax = plt.subplots(figsize=figsize)
+    for stem, fig_stats in batch:
+        ax.clear()
+        plot(ax, fig_stats)
+        fig.tight_layout()
+        fig.savefig(f'{STRATA_DIR}{stem}.png', **STRATA_SAVE_OPTIONS)
+    plt.close(fig)
+    return time.perf_counter() - start
+
+
+def render_strata(merged_df, strata, jobs=0, force=False):
+    """Figures 3 and 4 for every stratum, as PNGs in STRATA_DIR.
+    
+    Strata whose statistics are unchanged since they were drawn are skipped
+    (``STRATA_DIR/manifest.json``). The rest are drawn in batches of
+    STRATA_CHUNK, on a process pool when ``jobs`` > 1 (0 = all CPUs).
+    Returns (number of strata, figures drawn, figures unchanged, seconds
+    spent drawing summed over batches).
+    """
+    os.makedirs(STRATA_DIR, exist_ok=True)
+    manifest = Manifest(f'{STRATA_DIR}manifest.json')
+    
+    strata_stats = strata_statistics(merged_df, strata)
+    tasks = {number: [] for number in STRATUM_FIGURES}
+    digests = {}
+    for suffix, figures in strata_stats:
+        for number, fig_stats in figures.items():
+            stem = f'{FIGURES[number][0]}_{suffix}'
+            digests[stem] = figure_digest(number, fig_stats, ['png'], STRATA_SAVE_OPTIONS)
+            if force or not manifest.is_fresh(stem, digests[stem], [f'{stem}.png']):
+                tasks[number].append((stem, fig_stats))
+    
+    batches = [(number, items[i:i + STRATA_CHUNK])
+               for number, items in tasks.items() for i in range(0, len(items), STRATA_CHUNK)]
+    jobs = min(jobs or os.cpu_count(), max(1, len(batches)))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            seconds = list(pool.map(render_stratum_batch, *zip(*batches)))
+    else:
+        seconds = [render_stratum_batch(number, batch) for number, batch in batches]
     
-    plt.savefig(f'{FIGURES_DIR}Figura7_Vies_Selecao.png', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.savefig(f'{FIGURES_DIR}Figura7_Vies_Selecao.pdf', dpi=300, 
-                bbox_inches='tight', facecolor='white')
-    plt.close()
-    print("✓ Figure 7 created")
+    drawn = [stem for _, batch in batches for stem, _ in batch]
+    for stem in drawn:
+        manifest.record(stem, digests[stem], [f'{stem}.png'])
+    manifest.save()
+    
+    return len(strata_stats), len(drawn), len(digests) - len(drawn), sum(seconds)
+
+
+def stratified_figures(strata, jobs=0, force=False):
+    """Draw figures 3 and 4 for each SINAN stratum."""
+    print(f"Figures 3 and 4 by {', '.join(strata)}...")
+    merged_df = load_dataset('merged', columns=['subgroup', 'source', 'hospitalized']
+                             + COMPARISON_SYMPTOMS + strata, data_dir=DATA_PROCESSED)
+    
+    start = time.perf_counter()
+    n_strata, drawn, unchanged, seconds = render_strata(merged_df, strata, jobs, force)
+    elapsed = time.perf_counter() - start
+    
+    print(f"  {n_strata:,} strata: {drawn:,} figures drawn, {unchanged:,} unchanged")
+    if drawn:
+        print(f"  Timing: {elapsed:.2f}s ({drawn / seconds:.1f} figures/s per worker)")
+    print(f"  ✓ Output directory: {STRATA_DIR}")
 
 
 # =============================================================================
 # MAIN
 # =============================================================================
 
-if __name__ == "__main__":
+def main():
+    """Generate all figures."""
+    parser = argparse.ArgumentParser(description="Generate the publication figures.")
+    parser.add_argument('--jobs', type=int, default=0,
+                        help="worker processes rendering figures (default 0 = all CPUs; "
+                             "1 = render in this process)")
+    parser.add_argument('--force', action='store_true',
+                        help="redraw every figure, even if its data are unchanged")
+    parser.add_argument('--strata', type=parse_strata, default=None,
+                        help="draw figures 3 and 4 per stratum of these comma-separated "
+                             "SINAN fields (e.g. ID_MUNICIP,SEM_PRI) instead")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("GENERATING PUBLICATION FIGURES")
     print("Chikungunya Surveillance Study - Foz do Iguaçu, 2023")
     print("=" * 60)
     print()
     
+    if args.strata:
+        stratified_figures(args.strata, args.jobs, args.force)
+        return
+    
     # Load processed data
     print("Loading processed data...")
-    rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
-    sinan_df = pd.read_csv(f'{DATA_PROCESSED}sinan_processed.csv')
-    merged_df = pd.read_csv(f'{DATA_PROCESSED}merged_analysis_dataset.csv')
-    
-    print(f"  RT-PCR cases: {len(rtpcr_df)}")
-    print(f"  SINAN cases: {len(sinan_df)}")
-    print(f"  Merged dataset: {len(merged_df)}")
+    datasets = {
+        'rtpcr': load_dataset('rtpcr', data_dir=DATA_PROCESSED),
+        'sinan': load_dataset('sinan', data_dir=DATA_PROCESSED),
+        'merged': load_dataset('merged', data_dir=DATA_PROCESSED),
+    }
+    
+    print(f"  RT-PCR cases: {len(datasets['rtpcr'])}")
+    print(f"  SINAN cases: {len(datasets['sinan'])}")
+    print(f"  Merged dataset: {len(datasets['merged'])}")
     print()
     
-    # Generate all figures
-    create_figure1(rtpcr_df)
-    create_figure2(rtpcr_df)
-    create_figure3(merged_df)
-    create_figure4(merged_df)
-    create_figure5(rtpcr_df)
-    create_figure6(rtpcr_df)
-    create_figure7(sinan_df)
+    # Statistics first, then the figures from those numbers
+    print("Computing figure statistics...")
+    start = time.perf_counter()
+    statistics = compute_statistics(datasets)
+    stats_time = time.perf_counter() - start
+    
+    # Only figures whose data, styling or files changed are drawn
+    manifest = Manifest(MANIFEST)
+    digests = {number: figure_digest(number, fig_stats)
+               for number, fig_stats in statistics.items() if fig_stats is not None}
+    stale = {number: statistics[number] for number in digests
+             if args.force or not manifest.is_fresh(FIGURES[number][0], digests[number],
+                                                     figure_files(number))}
+    
+    start = time.perf_counter()
+    seconds = render_figures(stale, args.jobs)
+    render_wall = time.perf_counter() - start
+    
+    for number in sorted(digests):
+        if number in seconds:
+            manifest.record(FIGURES[number][0], digests[number], figure_files(number))
+            print(f"✓ Figure {number} created ({seconds[number]:.2f}s)")
+        else:
+            print(f"✓ Figure {number} unchanged, not redrawn")
+    manifest.save()
     
     print()
+    print(f"Timing: statistics {stats_time:.2f}s, rendering {render_wall:.2f}s "
+          f"(sum of figures {sum(seconds.values()):.2f}s)")
+    print(f"  {len(seconds)} of {len(digests)} figures drawn; manifest: {MANIFEST}")
     print("=" * 60)
     print("✓ All figures generated successfully!")
     print(f"  Output directory: {FIGURES_DIR}")
     print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,13 +15,14 @@ Author: Welisson G.N. Costa
 Date: January 2025
 """
 
-import pandas as pd
 import numpy as np
 from scipy import stats
 from statsmodels.stats.proportion import proportion_confint
 import statsmodels.api as sm
 import sys
 import os
+from arbolib.diagnosis import categorize_diagnoses
+from arbolib.store import load_dataset
 
 # Add parent directory to path to import expected results
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -63,23 +64,6 @@ TOLERANCE = {
 }
 
 
-def categorize_diagnosis(dx):
-    """Categorize diagnostic hypothesis."""
-    if pd.isna(dx):
-        return 'Other'
-    dx = str(dx).upper()
-    if 'CHIKUNGUNYA' in dx and 'DENGUE' not in dx:
-        return 'Chikungunya only'
-    elif 'DENGUE' in dx and 'CHIKUNGUNYA' not in dx:
-        return 'Dengue only'
-    elif 'DENGUE' in dx and 'CHIKUNGUNYA' in dx:
-        return 'Dengue or Chikungunya'
-    elif 'DENGUE OU CHIK' in dx:
-        return 'Dengue or Chikungunya'
-    else:
-        return 'Other'
-
-
 def check_tolerance(observed, expected, tolerance, metric_name='value'):
     """Check if observed value is within tolerance of expected."""
     diff = abs(observed - expected)
@@ -156,8 +140,8 @@ def validate_diagnostic_accuracy(rtpcr_df):
     if not passed:
         all_passed = False
     
-    # Chikungunya only
-    rtpcr_df['dx_category'] = rtpcr_df['HIPOTESE_DIAGNOSTICA'].apply(categorize_diagnosis)
+    # Chikungunya only (recalculated from the raw hypothesis)
+    rtpcr_df['dx_category'] = categorize_diagnoses(rtpcr_df['HIPOTESE_DIAGNOSTICA'])
     chik_only = (rtpcr_df['dx_category'] == 'Chikungunya only').sum()
     accuracy_chik = chik_only / n * 100
     ci_low_c, ci_high_c = proportion_confint(chik_only, n, method='wilson')
@@ -188,7 +172,7 @@ def validate_diagnostic_hypotheses(rtpcr_df):
     n = len(rtpcr_df)
     
     if 'dx_category' not in rtpcr_df.columns:
-        rtpcr_df['dx_category'] = rtpcr_df['HIPOTESE_DIAGNOSTICA'].apply(categorize_diagnosis)
+        rtpcr_df['dx_category'] = categorize_diagnoses(rtpcr_df['HIPOTESE_DIAGNOSTICA'])
     
     for category, expected in EXPECTED['diagnostic_hypotheses'].items():
         count = (rtpcr_df['dx_category'] == category).sum()
@@ -313,7 +297,8 @@ def validate_data_integrity(rtpcr_df, sinan_df, merged_df):
     return all_passed
 
 
-if __name__ == "__main__":
+def main():
+    """Run all validations and return the exit status."""
     print("=" * 60)
     print("VALIDATING ANALYSIS RESULTS")
     print("Chikungunya Surveillance Study - Foz do Iguaçu, 2023")
@@ -322,14 +307,14 @@ if __name__ == "__main__":
     # Load processed data
     print("\nLoading processed data...")
     try:
-        rtpcr_df = pd.read_csv(f'{DATA_PROCESSED}rtpcr_processed.csv')
-        sinan_df = pd.read_csv(f'{DATA_PROCESSED}sinan_processed.csv')
-        merged_df = pd.read_csv(f'{DATA_PROCESSED}merged_analysis_dataset.csv')
+        rtpcr_df = load_dataset('rtpcr', data_dir=DATA_PROCESSED)
+        sinan_df = load_dataset('sinan', data_dir=DATA_PROCESSED)
+        merged_df = load_dataset('merged', data_dir=DATA_PROCESSED)
         print("✓ Data loaded successfully")
     except FileNotFoundError as e:
         print(f"✗ ERROR: Could not load data files: {e}")
         print("  Please run data preprocessing first (01_data_preprocessing.py)")
-        sys.exit(1)
+        return 1
     
     # Run validations
     results = {}
@@ -355,7 +340,7 @@ if __name__ == "__main__":
     if all_passed:
         print("✓ ALL VALIDATIONS PASSED")
         print("=" * 60)
-        sys.exit(0)
+        return 0
     else:
         print("✗ SOME VALIDATIONS FAILED")
         print("=" * 60)
@@ -363,4 +348,8 @@ if __name__ == "__main__":
         print("  - Rounding differences")
         print("  - Minor data processing variations")
         print("  - Statistical method implementation differences")
-        sys.exit(1)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+10_cluster_selection.py
+=======================
+Choice of the number of symptom clusters used in 06_cluster_analysis.py:
+silhouette, gap statistic and bootstrap Jaccard stability for k = 2..10.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import time
+from arbolib.clusterselect import DEFAULT_SEED, choose_k, evaluate_k
+from arbolib.store import dataset_path, load_dataset, write_dataset
+import warnings
+warnings.filterwarnings('ignore')
+
+DATA_PROCESSED = '../data/processed/'
+
+# Same symptom matrix as 06_cluster_analysis.py
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA',
+            'EXANTEMA', 'NAUSEA', 'VOMITO']
+
+# Number of clusters used by 06_cluster_analysis.py
+CURRENT_K = 3
+
+
+def select_clusters(rtpcr_df, k_max=10, references=100, resamples=200, seed=DEFAULT_SEED, jobs=1):
+    """Evaluate k = 2..k_max and report the number of clusters chosen."""
+    print("\n" + "=" * 60)
+    print("NUMBER OF SYMPTOM CLUSTERS")
+    print("=" * 60)
+    
+    available_symptoms = [s for s in SYMPTOMS if s in rtpcr_df.columns]
+    X = rtpcr_df[available_symptoms].fillna(0).values
+    
+    print(f"\n{len(X)} cases, {len(available_symptoms)} symptoms, Ward clustering")
+    print(f"Gap statistic: {references} reference data sets; "
+          f"stability: {resamples} bootstrap samples")
+    
+    start = time.perf_counter()
+    table, timings = evaluate_k(X, range(2, k_max + 1), n_references=references,
+                                n_boot=resamples, seed=seed, jobs=jobs)
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n{'k':>3} {'Silhouette':>11} {'Gap':>8} {'SE':>7} {'Jaccard':>8} {'Min Jacc':>9}")
+    print("-" * 52)
+    for k, row in table.iterrows():
+        print(f"{k:>3} {row['silhouette']:>11.3f} {row['gap']:>8.3f} {row['gap_se']:>7.3f} "
+              f"{row['jaccard_mean']:>8.3f} {row['jaccard_min']:>9.3f}")
+    
+    choice = choose_k(table)
+    print("\n--- Chosen k ---")
+    print(f"  Largest silhouette:          k = {choice['silhouette']}")
+    print(f"  Gap statistic (1-SE rule):   k = {choice['gap']}")
+    print(f"  Most stable (mean Jaccard):  k = {choice['stability']}")
+    print(f"  Best silhouette, all clusters stable (Jaccard >= 0.75): k = {choice['chosen']}")
+    print(f"  Used in 06_cluster_analysis.py: k = {CURRENT_K}")
+    
+    print(f"\nTiming: clustering {timings['clustering']:.2f}s, "
+          f"resampling {timings['resampling']:.2f}s, total {elapsed:.2f}s")
+    
+    write_dataset(table.reset_index(), 'cluster_selection', data_dir=DATA_PROCESSED, csv=True)
+    print(f"  ✓ Saved: {dataset_path('cluster_selection', 'csv', DATA_PROCESSED)}")
+    
+    return table, choice
+
+
+def main():
+    """Run the cluster selection stage."""
+    parser = argparse.ArgumentParser(description="Number of symptom clusters.")
+    parser.add_argument('--k-max', type=int, default=10,
+                        help="largest number of clusters evaluated (default 10)")
+    parser.add_argument('--references', type=int, default=100,
+                        help="reference data sets for the gap statistic (default 100)")
+    parser.add_argument('--resamples', type=int, default=200,
+                        help="bootstrap samples for cluster stability (default 200)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f"resampling seed (default {DEFAULT_SEED})")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes for the resamples (0 = all CPUs)")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("CLUSTER SELECTION")
+    print("Silhouette, Gap Statistic and Stability")
+    print("=" * 60)
+    
+    rtpcr_df = load_dataset('rtpcr', columns=['id'] + SYMPTOMS, data_dir=DATA_PROCESSED)
+    
+    select_clusters(rtpcr_df, args.k_max, args.references, args.resamples, args.seed, args.jobs)
+    
+    print("\n✓ Cluster selection complete!")
+
+
+if __name__ == "__main__":
+    main()
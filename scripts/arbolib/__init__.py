@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+arbolib
+=======
+Shared helpers for the Chikungunya surveillance analysis scripts.
+
+Modules:
+- store: typed columnar store for processed datasets
+- buildcache: content-hash cache for pipeline stages
+- sinan: decoding helpers for SINAN/DATASUS fields
+- dbc: streaming reader for DATASUS .dbc/.dbf files
+- ingest: concurrent multi-file SINAN ingestion into a partitioned dataset
+- incremental: record keys, DT_DIGITA/NU_LOTE_I watermark and upserts of SINAN deltas
+- diagnosis: categorization of initial diagnostic hypotheses
+- contingency: batched odds ratios, chi-square and Fisher tests
+- strata: stratified group-by engines producing tidy tables
+- bootstrap: vectorized (cluster) bootstrap confidence intervals
+- logit: batched Newton-Raphson logistic regression
+- stepwise: backward stepwise selection with memoized sub-model fits
+- propensity: propensity-score matching, weighting and balance tables
+- clustering: Ward / mini-batch k-means over symptom patterns; saved cluster model
+- clusterselect: silhouette, gap statistic and bootstrap stability by k
+- signatures: bit-packed symptom signatures, popcount and Hamming/Jaccard distances
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
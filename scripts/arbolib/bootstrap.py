@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+bootstrap.py
+============
+Percentile bootstrap confidence intervals for rates and logistic-regression
+odds ratios, with optional cluster resampling (e.g. by ``bairro`` or
+``ID_UNIDADE``).
+
+Replicates are drawn as index matrices, a block of replicates at a time,
+and reduced with array operations. Blocks are sized from the data (not the
+number of workers) and each block draws from its own child of one
+``SeedSequence``, so results are identical for any ``jobs`` value; with
+``jobs > 1`` blocks run on a process pool that receives the data once per
+worker.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from arbolib.logit import fit_batch
+
+DEFAULT_SEED = 2023
+
+# Index-matrix entries drawn per block (bounds memory per worker)
+BLOCK_CELLS = 2_000_000
+
+# Data shared by the blocks of one bootstrap run (set in each worker)
+_payload = None
+
+
+def _set_payload(payload):
+    global _payload
+    _payload = payload
+
+
+def add_arguments(parser, clusters=()):
+    """Add the opt-in ``--bootstrap`` options to a stage's parser."""
+    group = parser.add_argument_group('bootstrap confidence intervals')
+    group.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                       help="also report percentile bootstrap CIs from N replicates")
+    if clusters:
+        group.add_argument('--cluster', choices=list(clusters), default=None,
+                           help="resample whole clusters instead of individual cases")
+    group.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                       help=f"bootstrap seed (default {DEFAULT_SEED})")
+    group.add_argument('--jobs', type=int, default=1,
+                       help="worker processes for the bootstrap (0 = all CPUs)")
+
+
+def options(args):
+    """Bootstrap settings from parsed arguments, or None when not requested."""
+    if not args.bootstrap:
+        return None
+    return {
+        'n_boot': args.bootstrap,
+        'cluster': getattr(args, 'cluster', None),
+        'seed': args.seed,
+        'jobs': args.jobs or os.cpu_count(),
+    }
+
+
+def cluster_codes(clusters):
+    """Integer cluster ids; cases with a missing cluster are singletons."""
+    codes = pd.factorize(pd.Series(clusters), use_na_sentinel=True)[0]
+    missing = codes < 0
+    codes[missing] = codes.max() + 1 + np.arange(missing.sum())
+    return codes
+
+
+def _block_sizes(n_boot, cells_per_replicate):
+    size = max(1, BLOCK_CELLS // max(1, cells_per_replicate))
+    return [min(size, n_boot - start) for start in range(0, n_boot, size)]
+
+
+def _run_blocks(worker, payload, n_boot, cells_per_replicate, seed, jobs):
+    """Run ``worker(size, seed_sequence)`` over blocks and stack the results."""
+    sizes = _block_sizes(n_boot, cells_per_replicate)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    
+    if jobs > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sizes)),
+                                 initializer=_set_payload,
+                                 initargs=(payload,)) as pool:
+            blocks = list(pool.map(worker, sizes, seeds))
+    else:
+        _set_payload(payload)
+        try:
+            blocks = [worker(size, s) for size, s in zip(sizes, seeds)]
+        finally:
+            _set_payload(None)
+    
+    return np.concatenate(blocks)
+
+
+def _summarize(replicates, alpha):
+    """SE and percentile interval of each column, ignoring failed replicates."""
+    with np.errstate(invalid='ignore'):
+        low, high = np.nanpercentile(replicates, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    return {
+        'se': np.nanstd(replicates, axis=0, ddof=1),
+        'ci_low': low,
+        'ci_high': high,
+        'n_boot': np.isfinite(replicates).sum(axis=0),
+    }
+
+
+# =============================================================================
+# RATES
+# =============================================================================
+
+def _rate_block(size, seed):
+    """Resampled event rates (size x groups) for one block.
+    
+    Each entry of ``strata`` is resampled on its own: ``(None, events,
+    group)`` holds the cases of one group, ``(n, events, None)`` holds
+    per-cluster case and event counts for every group.
+    """
+    n_groups, strata = _payload
+    rng = np.random.default_rng(seed)
+    
+    N = np.zeros((size, n_groups))
+    E = np.zeros((size, n_groups))
+    for n_units, e_units, group in strata:
+        m = len(e_units)
+        idx = rng.integers(0, m, size=(size, m), dtype=np.int32)
+        if group is None:
+            N += n_units[idx].sum(axis=1)
+            E += e_units[idx].sum(axis=1)
+        else:
+            N[:, group] += m
+            E[:, group] += e_units[idx].sum(axis=1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return E / N
+
+
+def bootstrap_rates(events, groups=None, clusters=None, n_boot=2000,
+                    alpha=0.05, seed=DEFAULT_SEED, jobs=1):
+    """Bootstrap CIs for the rate of a binary event, overall or per group.
+    
+    Without clusters, cases are resampled within each group (group sizes
+    are kept). With clusters, whole clusters are resampled and each group's
+    rate is the ratio of resampled events to resampled cases.
+    
+    Returns a DataFrame indexed by group with ``rate``, ``se``,
+    ``ci_low``, ``ci_high`` (as proportions) and ``n_boot`` (valid
+    replicates).
+    """
+    events = np.asarray(events, dtype=float)
+    if groups is None:
+        codes, labels = np.zeros(len(events), dtype=int), pd.Index(['All'])
+    else:
+        codes, labels = pd.factorize(pd.Series(groups))
+    
+    n_cases = np.bincount(codes, minlength=len(labels))
+    n_events = np.bincount(codes, weights=events, minlength=len(labels))
+    
+    if clusters is None:
+        strata = [(None, events[codes == g], g) for g in range(len(labels))]
+        largest = n_cases.max()
+    else:
+        unit = cluster_codes(clusters)
+        shape = (unit.max() + 1, len(labels))
+        n_units = np.zeros(shape)
+        e_units = np.zeros(shape)
+        np.add.at(n_units, (unit, codes), 1)
+        np.add.at(e_units, (unit, codes), events)
+        strata = [(n_units, e_units, None)]
+        largest = n_units.size
+    
+    replicates = _run_blocks(_rate_block, (len(labels), strata), n_boot,
+                             largest, seed, jobs)
+    
+    out = pd.DataFrame(_summarize(replicates, alpha), index=labels)
+    out.insert(0, 'rate', n_events / n_cases)
+    return out
+
+
+# =============================================================================
+# LOGISTIC REGRESSION
+# =============================================================================
+
+def _multiplicities(idx, n_units):
+    """Times each unit is drawn in every replicate (rows of ``idx``)."""
+    size = len(idx)
+    flat = idx + n_units * np.arange(size)[:, None]
+    return np.bincount(flat.ravel(), minlength=size * n_units).reshape(size, n_units)
+
+
+def _logit_block(size, seed):
+    """Logistic-regression coefficients refitted on one block of replicates.
+    
+    A replicate is the original design with frequency weights (how often
+    each case's cluster was drawn), so the whole block is one batched fit.
+    """
+    X, y, unit = _payload
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, unit.max() + 1, size=(size, unit.max() + 1))
+    weights = _multiplicities(idx, unit.max() + 1)[:, unit]
+    
+    fit = fit_batch(X, y, weights)
+    ok = fit.converged & np.isfinite(fit.bse).all(axis=1)
+    return np.where(ok[:, None], fit.params, np.nan)
+
+
+def bootstrap_logit(X, y, clusters=None, n_boot=2000, alpha=0.05,
+                    seed=DEFAULT_SEED, jobs=1):
+    """Bootstrap CIs for adjusted odds ratios of a logistic regression.
+    
+    ``X`` is the design matrix (with constant) as a DataFrame. Replicates
+    whose fit fails or does not converge (e.g. separation) are dropped;
+    ``n_boot`` counts the ones kept. Returns a DataFrame indexed by column
+    with ``se`` (of the log-OR) and the odds-ratio ``ci_low``/``ci_high``.
+    """
+    names = X.columns
+    X = X.to_numpy(dtype=float)
+    y = np.asarray(y, dtype=float)
+    unit = np.arange(len(y)) if clusters is None else cluster_codes(clusters)
+    
+    replicates = _run_blocks(_logit_block, (X, y, unit), n_boot,
+                             len(y) * X.shape[1] ** 2, seed, jobs)
+    
+    out = _summarize(replicates, alpha)
+    out['ci_low'] = np.exp(out['ci_low'])
+    out['ci_high'] = np.exp(out['ci_high'])
+    return pd.DataFrame(out, index=names)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+buildcache.py
+=============
+Content-hash cache for pipeline stages.
+
+A stage's fingerprint combines the hash of its script, of the shared
+``arbolib`` sources, of every declared input file and of its parameters.
+After a successful run the fingerprint is stored together with the hashes
+of the stage outputs and the stage log. On the next run the stage is
+skipped if its fingerprint is unchanged and its outputs are still the
+files it wrote, make-style; the stored log is replayed instead.
+
+``Manifest`` applies the same rule within a stage, to groups of output
+files keyed on the hash of the data they were drawn from
+(``data_digest``), so e.g. a figure is only redrawn when its numbers or
+styling change.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+
+LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def library_digest():
+    """Combined hash of the arbolib sources used by every stage."""
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(LIB_DIR, '*.py'))):
+        h.update(os.path.basename(path).encode())
+        h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+
+def stage_fingerprint(root, script, inputs, params=None):
+    """Hash of everything a stage's results depend on.
+    
+    ``script`` and ``inputs`` are paths relative to ``root``, so moving the
+    project does not invalidate the cache.
+    """
+    h = hashlib.sha256()
+    h.update(str(file_digest(os.path.join(root, script))).encode())
+    h.update(library_digest().encode())
+    for path in inputs:
+        h.update(path.encode())
+        h.update(str(file_digest(os.path.join(root, path))).encode())
+    h.update(json.dumps(params or {}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _update_digest(h, obj):
+    if isinstance(obj, dict):
+        h.update(b'{')
+        for key, value in obj.items():
+            _update_digest(h, key)
+            _update_digest(h, value)
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for item in obj:
+            _update_digest(h, item)
+        h.update(b']')
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        h.update(f'array:{obj.dtype.str}:{obj.shape};'.encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, np.ndarray):
+        _update_digest(h, obj.tolist())
+    elif isinstance(obj, np.generic):
+        _update_digest(h, obj.item())
+    else:
+        h.update(f'{type(obj).__name__}:{obj!r};'.encode())
+
+
+def data_digest(obj):
+    """SHA-256 of nested dicts, lists and tuples of scalars, strings and
+    arrays (order-sensitive; numpy scalars hash like Python numbers)."""
+    h = hashlib.sha256()
+    _update_digest(h, obj)
+    return h.hexdigest()
+
+
+class BuildCache:
+    """Fingerprints, output hashes and logs of completed stages.
+    
+    State lives in ``cache_dir/state.json`` with one log file per stage.
+    Output paths are relative to ``root``.
+    """
+    
+    def __init__(self, cache_dir, root):
+        self.cache_dir = cache_dir
+        self.root = root
+        self.state_path = os.path.join(cache_dir, 'state.json')
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                self.state = json.load(f)
+    
+    def _log_path(self, stage):
+        return os.path.join(self.cache_dir, f'{stage}.log')
+    
+    def is_fresh(self, stage, fingerprint, outputs):
+        """True if the stage ran with this fingerprint and its outputs are intact."""
+        entry = self.state.get(stage)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        if sorted(entry['outputs']) != sorted(outputs):
+            return False
+        return all(file_digest(os.path.join(self.root, path)) == digest
+                   for path, digest in entry['outputs'].items())
+    
+    def log(self, stage):
+        """Output recorded for the stage's last successful run."""
+        path = self._log_path(stage)
+        if not os.path.exists(path):
+            return ''
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    
+    def record(self, stage, fingerprint, outputs, log=''):
+        """Store a successful run."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._log_path(stage), 'w', encoding='utf-8') as f:
+            f.write(log)
+        self.state[stage] = {
+            'fingerprint': fingerprint,
+            'outputs': {path: file_digest(os.path.join(self.root, path))
+                        for path in outputs},
+        }
+        self._save()
+    
+    def invalidate(self, stage):
+        """Forget a stage, e.g. after it failed."""
+        if self.state.pop(stage, None) is not None:
+            self._save()
+    
+    def _save(self):
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+
+class Manifest:
+    """Data hash and file hashes of each group of generated files.
+    
+    Stored as JSON at ``path``; file names are relative to its directory.
+    A group is fresh if it was written from data with the same hash and its
+    files are still the ones recorded. ``record`` only updates the entries in
+    memory (a batch may record thousands of groups); ``save`` writes them.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.root = os.path.dirname(path)
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+    
+    def is_fresh(self, key, digest, files):
+        entry = self.entries.get(key)
+        if entry is None or entry['hash'] != digest:
+            return False
+        if sorted(entry['files']) != sorted(files):
+            return False
+        return all(file_digest(os.path.join(self.root, name)) == file_hash
+                   for name, file_hash in entry['files'].items())
+    
+    def record(self, key, digest, files):
+        """Store the data hash and current file hashes of a written group."""
+        self.entries[key] = {
+            'hash': digest,
+            'files': {name: file_digest(os.path.join(self.root, name)) for name in files},
+        }
+    
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
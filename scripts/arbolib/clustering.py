@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+clustering.py
+=============
+Symptom clustering that scales with the number of distinct symptom
+patterns instead of the number of patients.
+
+Symptoms are binary, so k symptoms give at most 2^k distinct rows however
+many patients there are. ``ward_clusters`` collapses identical rows into
+weighted points and runs Ward's method on those: identical patients merge
+at height 0 in the full dendrogram, so starting from a cluster per pattern
+(initial distance sqrt(2ab/(a+b)) ||x - y|| between patterns of a and b
+patients) and applying the Lance-Williams update gives the same tree above
+height 0 - and the same ``fcluster`` labels - as
+``linkage(StandardScaler().fit_transform(X), 'ward')``, without its
+O(n^2) memory. (When two merges cost exactly the same, the tie may be broken
+differently from scipy's nearest-neighbour chain; both are Ward solutions.)
+
+``minibatch_clusters`` is the alternative for data with too many distinct
+patterns for agglomerative clustering: mini-batch k-means on the weighted
+patterns.
+
+``ClusterModel`` keeps a fitted clustering - symptoms, scaler, pattern
+linkage, pattern assignments and cluster centroids - as a JSON artifact, so
+later stages reuse it instead of clustering again. ``predict`` gives a
+known pattern its fitted cluster and any other patient the nearest
+centroid, O(k) per patient. Both read the packed symptom signature
+(``arbolib.signatures``) when the data set has one.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import json
+import numpy as np
+from scipy.cluster.hierarchy import fcluster
+from sklearn.cluster import MiniBatchKMeans
+from arbolib import signatures
+
+METHODS = ['ward', 'minibatch']
+
+
+def pattern_codes(X):
+    """One integer per binary row (first column = most significant bit, so
+    codes sort like the rows); None if ``X`` is not binary."""
+    X = np.asarray(X, dtype=float)
+    if X.shape[1] >= 63 or not np.isin(X, (0, 1)).all():
+        return None
+    bits = np.left_shift(1, np.arange(X.shape[1] - 1, -1, -1, dtype=np.int64))
+    return X.astype(np.int64) @ bits
+
+
+def collapse_patterns(X):
+    """Distinct rows of ``X`` (in lexicographic order), their counts and each
+    row's pattern index.
+    
+    Binary rows are packed into one integer each (``pattern_codes``), so
+    only a 1-D unique is needed.
+    """
+    X = np.asarray(X, dtype=float)
+    codes = pattern_codes(X)
+    if codes is not None:
+        bits = np.left_shift(1, np.arange(X.shape[1] - 1, -1, -1, dtype=np.int64))
+        codes, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        patterns = ((codes[:, None] & bits) > 0).astype(float)
+    else:
+        patterns, inverse, counts = np.unique(X, axis=0, return_inverse=True, return_counts=True)
+    return patterns, counts, inverse.ravel()
+
+
+def scaler(patterns, counts):
+    """Mean and SD of the patients behind the patterns (as ``StandardScaler``
+    on the full matrix; constant columns get SD 1)."""
+    weights = counts / counts.sum()
+    mean = weights @ patterns
+    sd = np.sqrt(weights @ (patterns - mean) ** 2)
+    sd[sd == 0] = 1.0
+    return mean, sd
+
+
+def standardize(patterns, counts):
+    """Z-scores of the patterns with the patients' mean and SD."""
+    mean, sd = scaler(patterns, counts)
+    return (patterns - mean) / sd
+
+
+def weighted_ward(points, weights):
+    """Ward linkage of weighted points, in ``scipy.cluster.hierarchy`` format.
+    
+    Each point stands for ``weights`` identical observations. Column 3 of
+    the result counts points (patterns), so the matrix is valid for
+    ``fcluster``/``dendrogram`` with one leaf per pattern.
+    """
+    m = len(points)
+    size = np.asarray(weights, dtype=float).copy()
+    leaves = np.ones(m)
+    node = np.arange(m)
+    
+    sq = (points ** 2).sum(axis=1)
+    dist2 = np.maximum(sq[:, None] + sq[None, :] - 2 * points @ points.T, 0.0)
+    D = np.sqrt(2 * np.outer(size, size) / np.add.outer(size, size) * dist2)
+    np.fill_diagonal(D, np.inf)
+    
+    # Nearest neighbour of every row; Ward is reducible, so a merge can only
+    # invalidate rows whose nearest neighbour took part in it
+    nearest = D.argmin(axis=1)
+    
+    Z = np.zeros((m - 1, 4))
+    for step in range(m - 1):
+        rowmin = D[np.arange(m), nearest]
+        i = int(rowmin.argmin())
+        j = int(nearest[i])
+        i, j = min(i, j), max(i, j)
+        d = D[i, j]
+        
+        Z[step] = [min(node[i], node[j]), max(node[i], node[j]), d, leaves[i] + leaves[j]]
+        
+        # Lance-Williams update: the merged cluster takes slot i
+        with np.errstate(invalid='ignore'):
+            new = np.sqrt(np.maximum(((size[i] + size) * D[i] ** 2 + (size[j] + size) * D[j] ** 2
+                                      - size * d ** 2) / (size[i] + size[j] + size), 0.0))
+        new[[i, j]] = np.inf
+        D[i] = D[:, i] = new
+        D[j] = D[:, j] = np.inf
+        size[i] += size[j]
+        leaves[i] += leaves[j]
+        node[i] = m + step
+        
+        stale = (nearest == i) | (nearest == j)
+        stale[i] = True
+        stale[j] = False
+        nearest[stale] = D[stale].argmin(axis=1)
+        closer = (new < rowmin) | ((new == rowmin) & (i < nearest))
+        closer[[i, j]] = False
+        nearest[closer & ~stale] = i
+    
+    return Z
+
+
+def ward_clusters(X, n_clusters=3):
+    """Ward clusters (1..n_clusters) of the standardized rows of ``X``."""
+    patterns, counts, inverse = collapse_patterns(X)
+    if len(patterns) <= n_clusters:
+        return inverse + 1
+    
+    Z = weighted_ward(standardize(patterns, counts), counts)
+    return fcluster(Z, n_clusters, criterion='maxclust')[inverse]
+
+
+def minibatch_clusters(X, n_clusters=3, batch_size=1024, seed=42):
+    """Mini-batch k-means clusters (1..n_clusters) of the standardized rows of ``X``."""
+    patterns, counts, inverse = collapse_patterns(X)
+    model = MiniBatchKMeans(n_clusters=min(n_clusters, len(patterns)), batch_size=batch_size,
+                            random_state=seed, n_init=3)
+    labels = model.fit_predict(standardize(patterns, counts), sample_weight=counts)
+    return labels[inverse] + 1
+
+
+class ClusterModel:
+    """A fitted symptom clustering that can be saved, loaded and applied."""
+    
+    def __init__(self, symptoms, method, n_clusters, mean, scale, patterns,
+                 counts, pattern_labels, centroids, linkage=None):
+        self.symptoms = list(symptoms)
+        self.method = method
+        self.n_clusters = n_clusters
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.patterns = np.asarray(patterns, dtype=float)
+        self.counts = np.asarray(counts, dtype=int)
+        self.pattern_labels = np.asarray(pattern_labels, dtype=int)
+        self.centroids = np.asarray(centroids, dtype=float)
+        self.linkage = None if linkage is None else np.asarray(linkage, dtype=float)
+        self._codes = pattern_codes(self.patterns)
+    
+    @classmethod
+    def fit(cls, df, symptoms, n_clusters=3, method='ward'):
+        """Cluster the standardized symptom columns of ``df``."""
+        if signatures.SIGNATURE in df.columns:
+            patterns, counts, inverse = signatures.collapse(df[signatures.SIGNATURE], symptoms)
+        else:
+            X = df[symptoms].fillna(0).to_numpy(dtype=float)
+            patterns, counts, inverse = collapse_patterns(X)
+        mean, scale = scaler(patterns, counts)
+        points = (patterns - mean) / scale
+        
+        linkage = None
+        if method == 'minibatch':
+            labels = minibatch_clusters(patterns[inverse], n_clusters)
+            pattern_labels = np.zeros(len(patterns), dtype=int)
+            pattern_labels[inverse] = labels
+        elif len(patterns) <= n_clusters:
+            pattern_labels = np.arange(1, len(patterns) + 1)
+        else:
+            linkage = weighted_ward(points, counts)
+            pattern_labels = fcluster(linkage, n_clusters, criterion='maxclust')
+        
+        # Centroid of each cluster's patients, in standardized units
+        clusters = np.unique(pattern_labels)
+        centroids = np.array([counts[pattern_labels == c] @ points[pattern_labels == c]
+                              / counts[pattern_labels == c].sum() for c in clusters])
+        
+        return cls(symptoms, method, n_clusters, mean, scale, patterns, counts,
+                   pattern_labels, centroids, linkage)
+    
+    def predict(self, df):
+        """Cluster (1..k) of each row of ``df``: the fitted cluster of a known
+        symptom pattern, else the nearest centroid."""
+        packed = signatures.SIGNATURE in df.columns
+        if packed:
+            signature = df[signatures.SIGNATURE].to_numpy()
+            codes = signatures.codes(signature, self.symptoms)
+        else:
+            X = df[self.symptoms].fillna(0).to_numpy(dtype=float)
+            codes = pattern_codes(X)
+        labels = np.zeros(len(df), dtype=int)
+        
+        known = np.zeros(len(df), dtype=bool)
+        if self._codes is not None and codes is not None:
+            pos = np.clip(np.searchsorted(self._codes, codes), 0, len(self._codes) - 1)
+            known = self._codes[pos] == codes
+            labels[known] = self.pattern_labels[pos[known]]
+        
+        if (~known).any():
+            if packed:
+                unknown = signatures.unpack(signature[~known], self.symptoms).to_numpy(dtype=float)
+            else:
+                unknown = X[~known]
+            Z = (unknown - self.mean) / self.scale
+            dist = ((Z[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+            labels[~known] = dist.argmin(axis=1) + 1
+        return labels
+    
+    def to_dict(self):
+        return {
+            'symptoms': self.symptoms,
+            'method': self.method,
+            'n_clusters': self.n_clusters,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'patterns': self.patterns.astype(int).tolist(),
+            'counts': self.counts.tolist(),
+            'pattern_labels': self.pattern_labels.tolist(),
+            'centroids': self.centroids.tolist(),
+            'linkage': None if self.linkage is None else self.linkage.tolist(),
+        }
+    
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+    
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+clusterselect.py
+================
+Choice of the number of symptom clusters: silhouette, gap statistic and
+bootstrap Jaccard stability of Ward clusterings for a range of k.
+
+Everything runs in symptom-pattern space (see ``arbolib.clustering``): one
+Ward tree per sample gives the clusterings for every k, the silhouette is
+computed exactly from pattern-to-pattern distances weighted by pattern
+counts, and resamples are drawn as pattern counts -
+
+- gap statistic (Tibshirani et al., 2001): reference data sets have
+  independent symptoms with the observed prevalences, drawn as multinomial
+  counts over all 2^p patterns;
+- stability (Hennig, 2007): bootstrap samples are multinomial counts over
+  the observed patterns; each is re-standardized and re-clustered, and
+  every original cluster is scored by its best Jaccard match among the
+  resample's clusters (on the resampled cases).
+
+Resamples run in blocks on a process pool. The symptom matrix is placed in
+shared memory once and every worker attaches to it, so pool start-up does
+not copy the data per worker and tasks carry only a block size and seed.
+Each block has its own child of one ``SeedSequence``, so results do not
+depend on the number of workers.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster
+from arbolib.clustering import collapse_patterns, scaler, standardize, weighted_ward
+
+DEFAULT_SEED = 2023
+K_RANGE = range(2, 11)
+
+# Resamples per pool task
+BLOCK_SIZE = 25
+
+# Sample state of the current process (set by ``_attach``)
+_state = None
+
+
+def ward_labels(points, counts, ks):
+    """Pattern labels (len(ks) x m) of the Ward tree cut at each k."""
+    if len(points) < 2:
+        return np.ones((len(ks), len(points)), dtype=int)
+    Z = weighted_ward(points, counts)
+    return np.array([fcluster(Z, k, criterion='maxclust') for k in ks])
+
+
+def silhouette(points, counts, labels):
+    """Mean silhouette width of the cases behind weighted patterns.
+    
+    Equal to ``sklearn.metrics.silhouette_score`` on the expanded matrix;
+    cases alone in their cluster score 0.
+    """
+    diff = points[:, None, :] - points[None, :, :]
+    D = np.sqrt((diff ** 2).sum(axis=-1))
+    codes, labels = np.unique(labels, return_inverse=True)
+    if len(codes) < 2:
+        return np.nan
+    onehot = np.eye(len(codes))[labels]
+    
+    sums = D @ (onehot * counts[:, None])
+    size = counts @ onehot
+    own = size[labels]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = sums[np.arange(len(points)), labels] / (own - 1)
+        others = np.where(onehot > 0, np.inf, sums / size)
+        b = others.min(axis=1)
+        s = np.where(own > 1, (b - a) / np.maximum(a, b), 0.0)
+    return counts @ s / counts.sum()
+
+
+def within_dispersion(points, counts, labels):
+    """Pooled within-cluster sum of squares of the cases."""
+    total = 0.0
+    for c in np.unique(labels):
+        mask = labels == c
+        w = counts[mask]
+        centre = w @ points[mask] / w.sum()
+        total += w @ ((points[mask] - centre) ** 2).sum(axis=1)
+    return total
+
+
+def _all_patterns(p):
+    """Every binary pattern of p symptoms (2^p x p)."""
+    return ((np.arange(2 ** p)[:, None] >> np.arange(p - 1, -1, -1)) & 1).astype(float)
+
+
+def _attach(source, ks):
+    """Set this process's sample state from an array or a shared-memory block."""
+    global _state
+    if isinstance(source, np.ndarray):
+        X = source
+        shm = None
+    else:
+        name, shape, dtype = source
+        shm = shared_memory.SharedMemory(name=name)
+        X = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    
+    patterns, counts, _ = collapse_patterns(X)
+    mean, sd = scaler(patterns, counts)
+    points = (patterns - mean) / sd
+    reference = _all_patterns(patterns.shape[1])
+    
+    _state = {
+        'patterns': patterns,
+        'counts': counts,
+        'points': points,
+        'labels': ward_labels(points, counts, ks),
+        'reference': (reference - mean) / sd,
+        'reference_p': np.prod(np.where(reference > 0, mean, 1 - mean), axis=1),
+        'ks': list(ks),
+    }
+    
+    if shm is not None:
+        del X
+        shm.close()
+
+
+def _gap_block(size, seed):
+    """log W_k of ``size`` reference data sets (size x len(ks))."""
+    state = _state
+    rng = np.random.default_rng(seed)
+    n = state['counts'].sum()
+    out = np.empty((size, len(state['ks'])))
+    for r in range(size):
+        draw = rng.multinomial(n, state['reference_p'])
+        keep = draw > 0
+        points, counts = state['reference'][keep], draw[keep]
+        labels = ward_labels(points, counts, state['ks'])
+        out[r] = [np.log(within_dispersion(points, counts, lab)) for lab in labels]
+    return out
+
+
+def _jaccard_block(size, seed):
+    """Best Jaccard match of every original cluster in ``size`` bootstrap
+    samples (size x len(ks) x max(ks)); NaN where a cluster was not drawn."""
+    state = _state
+    rng = np.random.default_rng(seed)
+    counts = state['counts']
+    ks = state['ks']
+    out = np.full((size, len(ks), max(ks)), np.nan)
+    
+    for r in range(size):
+        draw = rng.multinomial(counts.sum(), counts / counts.sum())
+        keep = draw > 0
+        w = draw[keep]
+        boot = ward_labels(standardize(state['patterns'][keep], w), w, ks)
+        
+        for i, k in enumerate(ks):
+            orig = state['labels'][i][keep] - 1
+            M = np.zeros((k, k))
+            np.add.at(M, (orig, boot[i] - 1), w)
+            union = M.sum(axis=1)[:, None] + M.sum(axis=0)[None, :] - M
+            with np.errstate(invalid='ignore', divide='ignore'):
+                best = (M / union).max(axis=1)
+            drawn = M.sum(axis=1) > 0
+            out[r, i, :k] = np.where(drawn, best, np.nan)
+    return out
+
+
+def _run(kind, size, seed):
+    return (_gap_block if kind == 'gap' else _jaccard_block)(size, seed)
+
+
+def _resample(X, ks, n_references, n_boot, seed, jobs):
+    """Gap reference and bootstrap blocks, on a pool when ``jobs > 1``."""
+    sizes = {kind: [min(BLOCK_SIZE, n - s) for s in range(0, n, BLOCK_SIZE)]
+             for kind, n in [('gap', n_references), ('jaccard', n_boot)]}
+    tasks = [(kind, size) for kind in ['gap', 'jaccard'] for size in sizes[kind]]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    kinds = [kind for kind, _ in tasks]
+    block_sizes = [size for _, size in tasks]
+    
+    if jobs > 1 and len(tasks) > 1:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, X.nbytes))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+            with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), initializer=_attach,
+                                     initargs=((shm.name, X.shape, X.dtype), ks)) as pool:
+                blocks = list(pool.map(_run, kinds, block_sizes, seeds))
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        blocks = [_run(kind, size, s) for kind, size, s in zip(kinds, block_sizes, seeds)]
+    
+    gap = [b for kind, b in zip(kinds, blocks) if kind == 'gap']
+    jac = [b for kind, b in zip(kinds, blocks) if kind == 'jaccard']
+    return (np.concatenate(gap) if gap else np.empty((0, len(ks))),
+            np.concatenate(jac) if jac else np.empty((0, len(ks), max(ks))))
+
+
+def evaluate_k(X, ks=K_RANGE, n_references=100, n_boot=200, seed=DEFAULT_SEED, jobs=1):
+    """Silhouette, gap statistic and bootstrap stability for each k.
+    
+    ``X`` is the binary symptom matrix (cases x symptoms). Returns a
+    DataFrame indexed by k and a dict of timings in seconds.
+    """
+    X = np.ascontiguousarray(np.asarray(X, dtype=np.int8))
+    ks = [k for k in ks if k >= 2]
+    timings = {}
+    
+    start = time.perf_counter()
+    _attach(X, ks)
+    state = _state
+    points = state['points']
+    table = pd.DataFrame(index=pd.Index(ks, name='k'))
+    table['silhouette'] = [silhouette(points, state['counts'], lab) for lab in state['labels']]
+    table['log_w'] = [np.log(within_dispersion(points, state['counts'], lab))
+                      for lab in state['labels']]
+    timings['clustering'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    ref_log_w, jaccard = _resample(X, ks, n_references, n_boot, seed, jobs or os.cpu_count())
+    timings['resampling'] = time.perf_counter() - start
+    
+    with np.errstate(invalid='ignore'):
+        table['gap'] = ref_log_w.mean(axis=0) - table['log_w']
+        table['gap_se'] = ref_log_w.std(axis=0) * np.sqrt(1 + 1 / max(1, len(ref_log_w)))
+        stability = [np.nanmean(jaccard[:, i, :k], axis=0) for i, k in enumerate(ks)]
+    table['jaccard_mean'] = [s.mean() for s in stability]
+    table['jaccard_min'] = [s.min() for s in stability]
+    
+    return table, timings
+
+
+def choose_k(table, stable=0.75):
+    """k chosen by each criterion.
+    
+    - silhouette: largest mean silhouette;
+    - gap: smallest k with Gap(k) >= Gap(k+1) - se(k+1);
+    - stability: largest mean Jaccard;
+    - chosen: best silhouette among the k whose every cluster is stable
+      (mean Jaccard >= ``stable``; Hennig's threshold), else best silhouette.
+    """
+    ks = list(table.index)
+    gap_k = next((k for k, k1 in zip(ks, ks[1:])
+                  if table.at[k, 'gap'] >= table.at[k1, 'gap'] - table.at[k1, 'gap_se']), ks[-1])
+    stable_rows = table[table['jaccard_min'] >= stable]
+    chosen = stable_rows['silhouette'].idxmax() if len(stable_rows) else table['silhouette'].idxmax()
+    return {
+        'silhouette': int(table['silhouette'].idxmax()),
+        'gap': int(gap_k),
+        'stability': int(table['jaccard_mean'].idxmax()),
+        'chosen': int(chosen),
+    }
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+contingency.py
+==============
+Batched contingency analysis: odds ratios, Woolf confidence intervals
+and chi-square tests for many binary exposures against one binary outcome,
+and group x symptom chi-square/Fisher tests over many strata at once.
+
+All tables are built in one pass with matrix products instead of one
+``pd.crosstab`` per factor, and every analysis stage applies the same rules:
+
+- rows with a missing exposure or outcome are left out of that table;
+- a table whose exposure or outcome does not vary is not estimable (NaN);
+- if any cell is zero, 0.5 is added to every cell before computing the OR
+  and its CI (Haldane-Anscombe correction);
+- the chi-square test uses the raw counts with Yates' continuity
+  correction, as ``scipy.stats.chi2_contingency`` does for 2x2 tables.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from arbolib import signatures
+
+
+def two_by_two_counts(outcome, exposures):
+    """Cell counts of every exposure x outcome table.
+    
+    Returns a DataFrame indexed by exposure with columns ``a`` (exposed,
+    outcome), ``b`` (exposed, no outcome), ``c`` (unexposed, outcome) and
+    ``d`` (unexposed, no outcome).
+    """
+    exposures = pd.DataFrame(exposures)
+    X = exposures.to_numpy(dtype=float)
+    y = np.asarray(outcome, dtype=float)
+    
+    valid = ~np.isnan(X) & ~np.isnan(y)[:, None]
+    M = valid.astype(float)
+    Xv = np.where(valid, X, 0.0)
+    y0 = np.nan_to_num(y)
+    
+    a = Xv.T @ y0
+    exposed = Xv.sum(axis=0)
+    with_outcome = M.T @ y0
+    n = M.sum(axis=0)
+    
+    b = exposed - a
+    c = with_outcome - a
+    d = n - a - b - c
+    
+    return pd.DataFrame({'a': a, 'b': b, 'c': c, 'd': d},
+                        index=exposures.columns)
+
+
+def chi2_2x2(a, b, c, d):
+    """Yates-corrected chi-square statistic and p-value for 2x2 tables."""
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+    n = a + b + c + d
+    observed = np.stack([a, b, c, d])
+    rows = np.stack([a + b, a + b, c + d, c + d])
+    cols = np.stack([a + c, b + d, a + c, b + d])
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = rows * cols / n
+        magnitude = np.minimum(0.5, np.abs(expected - observed))
+        observed = observed + magnitude * np.sign(expected - observed)
+        chi2 = ((observed - expected) ** 2 / expected).sum(axis=0)
+    
+    return chi2, stats.chi2.sf(chi2, 1)
+
+
+def fisher_2x2(a, b, c, d):
+    """Two-sided Fisher exact p-values for many 2x2 tables at once.
+    
+    Each table's hypergeometric support is evaluated on a padded grid;
+    tables are bucketed by support length so one large table does not
+    inflate the grid of all the others.
+    """
+    a, b, c, d = (np.asarray(x, dtype=np.int64).ravel() for x in (a, b, c, d))
+    r1, c1, n = a + b, a + c, a + b + c + d
+    lo = np.maximum(0, r1 + c1 - n)
+    hi = np.minimum(r1, c1)
+    width = 2 ** np.ceil(np.log2(hi - lo + 1)).astype(int)
+    
+    p = np.ones(len(a))
+    for w in np.unique(width):
+        idx = np.nonzero(width == w)[0]
+        k = lo[idx, None] + np.arange(w)
+        args = (n[idx, None], r1[idx, None], c1[idx, None])
+        log_pmf = stats.hypergeom.logpmf(k, *args)
+        log_obs = stats.hypergeom.logpmf(a[idx], *(x[:, 0] for x in args))
+        extreme = (k <= hi[idx, None]) & (log_pmf <= log_obs[:, None] + 1e-7)
+        p[idx] = np.minimum(1.0, np.where(extreme, np.exp(log_pmf), 0.0).sum(axis=1))
+    
+    p[n == 0] = 1.0
+    return p
+
+
+def odds_ratios(outcome, exposures, z=1.96):
+    """Odds ratios of a binary outcome for each binary exposure.
+    
+    Parameters
+    ----------
+    outcome : array-like of 0/1 (NaN allowed)
+    exposures : DataFrame of 0/1 columns (NaN allowed), one per factor
+    z : normal quantile for the confidence interval
+    
+    Returns a DataFrame indexed by exposure with the raw cell counts, ``or``,
+    ``ci_low``, ``ci_high``, ``chi2``, ``p`` and ``corrected`` (True when
+    the zero-cell correction was applied). Non-estimable tables have NaN
+    statistics.
+    """
+    table = two_by_two_counts(outcome, exposures)
+    a, b, c, d = (table[k].to_numpy() for k in 'abcd')
+    
+    estimable = (a + b > 0) & (c + d > 0) & (a + c > 0) & (b + d > 0)
+    corrected = estimable & (np.minimum.reduce([a, b, c, d]) == 0)
+    k = np.where(corrected, 0.5, 0.0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_or = np.log((a + k) * (d + k) / ((b + k) * (c + k)))
+        se = np.sqrt(1 / (a + k) + 1 / (b + k) + 1 / (c + k) + 1 / (d + k))
+    chi2, p = chi2_2x2(a, b, c, d)
+    
+    table['or'] = np.where(estimable, np.exp(log_or), np.nan)
+    table['ci_low'] = np.where(estimable, np.exp(log_or - z * se), np.nan)
+    table['ci_high'] = np.where(estimable, np.exp(log_or + z * se), np.nan)
+    table['chi2'] = np.where(estimable, chi2, np.nan)
+    table['p'] = np.where(estimable, p, np.nan)
+    table['corrected'] = corrected
+    
+    return table
+
+
+def group_counts(df, group, symptoms, strata=None):
+    """Symptom-present and non-missing counts per (strata..., group) cell.
+    
+    Both tables come from a single groupby and are indexed by the strata
+    keys followed by ``group``, with one column per symptom. Symptoms are
+    counted from the packed signature when ``df`` has one (missing symptoms
+    then count as absent), else from their columns.
+    """
+    keys = list(strata or []) + [group]
+    if (signatures.SIGNATURE in df.columns and symptoms
+            and all(s in signatures.SYMPTOM_BITS for s in symptoms)):
+        return signatures.group_counts(df, keys, symptoms)
+    agg = df.groupby(keys, observed=True)[symptoms].agg(['sum', 'count'])
+    present = agg.xs('sum', axis=1, level=1)
+    total = agg.xs('count', axis=1, level=1)
+    return present, total
+
+
+def chi2_by_group(df, group, symptoms, strata=None, min_expected=5):
+    """Chi-square test of each symptom's frequency across groups.
+    
+    One groups x symptoms count tensor is built per stratum and every
+    ``group x (present, absent)`` table is tested at once, reproducing
+    ``scipy.stats.chi2_contingency``: empty rows and columns are dropped and
+    Yates' correction is used when the table reduces to 2x2. A 2x2 table
+    whose smallest expected count is below ``min_expected`` falls back to
+    Fisher's exact test (``fisher_2x2``); larger sparse tables keep the
+    chi-square p-value.
+    
+    Returns a DataFrame indexed by the strata keys and ``symptom`` with
+    columns ``chi2``, ``dof``, ``p``, ``min_expected`` and ``test``.
+    """
+    strata = list(strata or [])
+    present, total = group_counts(df, group, symptoms, strata)
+    
+    if strata:
+        present = present.unstack(group, fill_value=0)
+        total = total.unstack(group, fill_value=0)
+        index = present.index
+    else:
+        present = present.T.stack().to_frame().T
+        total = total.T.stack().to_frame().T
+        index = None
+    
+    n_groups = present.columns.get_level_values(-1).nunique()
+    shape = (len(present), len(symptoms), n_groups)
+    O1 = present.to_numpy(dtype=float).reshape(shape)
+    R = total.to_numpy(dtype=float).reshape(shape)
+    O0 = R - O1
+    
+    # Tensor layout: (stratum, symptom, group, present/absent)
+    O = np.stack([O1, O0], axis=-1)
+    C = O.sum(axis=2, keepdims=True)
+    N = R.sum(axis=2)[..., None, None]
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        E = R[..., None] * C / N
+        
+        cells = (R[..., None] > 0) & (C > 0)
+        n_rows = (R > 0).sum(axis=2)
+        n_cols = (C[:, :, 0, :] > 0).sum(axis=-1)
+        dof = np.clip((n_rows - 1) * (n_cols - 1), 0, None)
+        
+        yates = (dof == 1)[..., None, None] & cells
+        diff = E - O
+        O = np.where(yates, O + np.sign(diff) * np.minimum(0.5, np.abs(diff)), O)
+        
+        chi2 = np.where(cells, (O - E) ** 2 / E, 0.0).sum(axis=(2, 3))
+        p = np.where(dof > 0, stats.chi2.sf(chi2, np.maximum(dof, 1)), 1.0)
+        min_exp = np.where(cells, E, np.inf).min(axis=(2, 3))
+    
+    empty = N[..., 0, 0] == 0
+    chi2[empty] = np.nan
+    p[empty] = np.nan
+    min_exp[empty] = np.nan
+    test = np.full(chi2.shape, 'chi2', dtype=object)
+    
+    # Fisher exact fallback for sparse 2x2 tables: the two non-empty
+    # groups are the first and last non-empty rows along the group axis
+    sparse = (dof == 1) & (min_exp < min_expected)
+    if sparse.any():
+        nonempty = R[sparse] > 0
+        first = nonempty.argmax(axis=1)
+        last = nonempty.shape[1] - 1 - nonempty[:, ::-1].argmax(axis=1)
+        rows = np.arange(len(first))
+        o1, o0 = O1[sparse], O0[sparse]
+        p[sparse] = fisher_2x2(o1[rows, first], o0[rows, first],
+                               o1[rows, last], o0[rows, last])
+        test[sparse] = 'fisher'
+    
+    if index is None:
+        out_index = pd.Index(symptoms, name='symptom')
+    else:
+        out_index = pd.MultiIndex.from_tuples(
+            [(*(key if isinstance(key, tuple) else (key,)), s)
+             for key in index for s in symptoms],
+            names=strata + ['symptom'])
+    
+    return pd.DataFrame({
+        'chi2': chi2.ravel(),
+        'dof': dof.ravel(),
+        'p': p.ravel(),
+        'min_expected': min_exp.ravel(),
+        'test': test.ravel(),
+    }, index=out_index)
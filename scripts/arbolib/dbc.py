@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+dbc.py
+======
+Native reader for DATASUS .dbc files, the form in which SINAN and the other
+DATASUS systems are distributed per UF and year.
+
+A .dbc file is a DBF table whose records are compressed with PKWare's Data
+Compression Library ("implode"): the DBF header, a 4-byte CRC, then the
+records as one implode stream. ``iter_blast`` decompresses the stream - a
+port of Mark Adler's blast.c that decodes the Huffman codes through lookup
+tables indexed by the next bits of input, and copies matches as slices -
+and yields the output in blocks.
+
+``iter_dbc`` cuts those blocks into chunks of whole records and decodes
+each chunk with NumPy: the chunk is viewed as a structured array of
+fixed-width byte fields, each field is reduced to its distinct values with
+``np.unique`` and only those are decoded (characters to categories, numbers
+to floats, dates to datetime64), then expanded back to the rows. No
+intermediate DBF or CSV file is written. Plain .dbf files go through the
+same decoder.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# Back-references reach at most 4096 bytes (64-byte units with 6 dictionary bits)
+WINDOW = 4096
+
+# Code lengths of the fixed Huffman codes, run-length coded as in blast.c
+# (high nibble: repeats - 1, low nibble: length)
+LITERAL_LENGTHS = [
+    11, 124, 8, 7, 28, 7, 188, 13, 76, 4, 10, 8, 12, 10, 12, 10, 8, 23, 8,
+    9, 7, 6, 7, 8, 7, 6, 55, 8, 23, 24, 12, 11, 7, 9, 11, 12, 6, 7, 22, 5,
+    7, 24, 6, 11, 9, 6, 7, 22, 7, 11, 38, 7, 9, 8, 25, 11, 8, 11, 9, 12,
+    8, 12, 5, 38, 5, 38, 5, 11, 7, 5, 6, 21, 6, 10, 53, 8, 7, 24, 10, 27,
+    44, 253, 253, 253, 252, 252, 252, 13, 12, 45, 12, 45, 12, 61, 12, 45,
+    44, 173]
+LENGTH_LENGTHS = [2, 35, 36, 53, 38, 23]
+DISTANCE_LENGTHS = [2, 20, 53, 230, 247, 151, 248]
+
+# Copy length of each length symbol: base + extra bits
+LENGTH_BASE = [3, 2, 4, 5, 6, 7, 8, 9, 10, 12, 16, 24, 40, 72, 136, 264]
+LENGTH_EXTRA = [0, 0, 0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 5, 6, 7, 8]
+END_OF_STREAM = 519
+
+DbfField = namedtuple('DbfField', ['name', 'type', 'length', 'decimals', 'offset'])
+
+
+def code_lengths(rep):
+    """Code length of every symbol from the run-length coded table."""
+    lengths = []
+    for byte in rep:
+        lengths += [byte & 15] * ((byte >> 4) + 1)
+    return lengths
+
+
+def canonical_codes(lengths):
+    """Huffman code of every symbol, as (code, length); codes of one length
+    are consecutive, in symbol order."""
+    codes = {}
+    code = 0
+    for length in range(1, max(lengths) + 1):
+        for symbol, n in enumerate(lengths):
+            if n == length:
+                codes[symbol] = (code, length)
+                code += 1
+        code <<= 1
+    return codes
+
+
+def decode_table(rep):
+    """Symbol and code length for every value of the next ``width`` input
+    bits, and ``width``.
+    
+    Input bits come least significant first and carry the code bits
+    inverted, most significant first (PKWare's convention); a code length
+    of 0 marks an invalid code.
+    """
+    codes = canonical_codes(code_lengths(rep))
+    width = max(length for _, length in codes.values())
+    symbols = [0] * (1 << width)
+    lengths = [0] * (1 << width)
+    for symbol, (code, length) in codes.items():
+        # Input bits of the code, first bit lowest
+        bits = 0
+        for i in range(length):
+            bits |= (((code >> (length - 1 - i)) & 1) ^ 1) << i
+        for rest in range(1 << (width - length)):
+            symbols[bits | (rest << length)] = symbol
+            lengths[bits | (rest << length)] = length
+    return symbols, lengths, width
+
+
+_tables = None
+
+
+def _decode_tables():
+    global _tables
+    if _tables is None:
+        _tables = [decode_table(rep) for rep in
+                   (LITERAL_LENGTHS, LENGTH_LENGTHS, DISTANCE_LENGTHS)]
+    return _tables
+
+
+def iter_blast(data, block_size=1 << 20):
+    """Decompress a PKWare DCL implode stream, yielding blocks of about
+    ``block_size`` bytes.
+    
+    ``data`` is the whole compressed stream (bytes-like). Raises
+    ``ValueError`` on a malformed or truncated stream.
+    """
+    data = bytes(data)
+    if len(data) < 2:
+        raise ValueError("implode stream too short")
+    coded, dict_bits = data[0], data[1]
+    if coded > 1:
+        raise ValueError(f"invalid literal flag {coded}")
+    if not 4 <= dict_bits <= 6:
+        raise ValueError(f"invalid dictionary size {dict_bits}")
+    
+    (lit_sym, lit_len, lit_width), (len_sym, len_len, len_width), \
+        (dist_sym, dist_len, dist_width) = _decode_tables()
+    lit_mask = (1 << lit_width) - 1
+    len_mask = (1 << len_width) - 1
+    dist_mask = (1 << dist_width) - 1
+    dict_mask = (1 << dict_bits) - 1
+    
+    pos = 2
+    bitbuf = 0
+    bitcnt = 0
+    out = bytearray()
+    flushed = False
+    
+    while True:
+        # One symbol takes at most 1 + 7 + 8 + 8 + 6 = 30 bits
+        if bitcnt < 32:
+            chunk = data[pos:pos + 4]
+            bitbuf |= int.from_bytes(chunk, 'little') << bitcnt
+            bitcnt += 8 * len(chunk)
+            pos += len(chunk)
+        
+        if bitbuf & 1:
+            # Length/distance pair
+            peek = (bitbuf >> 1) & len_mask
+            symbol = len_sym[peek]
+            n = len_len[peek]
+            extra = LENGTH_EXTRA[symbol]
+            bitbuf >>= 1 + n
+            length = LENGTH_BASE[symbol] + (bitbuf & ((1 << extra) - 1))
+            bitbuf >>= extra
+            bitcnt -= 1 + n + extra
+            if n == 0 or bitcnt < 0:
+                raise ValueError("invalid or truncated implode stream")
+            if length == END_OF_STREAM:
+                break
+            
+            peek = bitbuf & dist_mask
+            n = dist_len[peek]
+            if length == 2:
+                dist = (dist_sym[peek] << 2) + ((bitbuf >> n) & 3) + 1
+                bitbuf >>= n + 2
+                bitcnt -= n + 2
+            else:
+                dist = (dist_sym[peek] << dict_bits) + ((bitbuf >> n) & dict_mask) + 1
+                bitbuf >>= n + dict_bits
+                bitcnt -= n + dict_bits
+            if n == 0 or bitcnt < 0:
+                raise ValueError("invalid or truncated implode stream")
+            
+            start = len(out) - dist
+            if start < 0:
+                raise ValueError("implode distance too far back")
+            if dist >= length:
+                out += out[start:start + length]
+            else:
+                # Overlapping copy: repeat the last ``dist`` bytes
+                out += (out[start:] * (length // dist + 1))[:length]
+        else:
+            # Literal byte
+            if coded:
+                peek = (bitbuf >> 1) & lit_mask
+                n = lit_len[peek]
+                out.append(lit_sym[peek])
+                bitbuf >>= 1 + n
+                bitcnt -= 1 + n
+                if n == 0:
+                    raise ValueError("invalid implode literal code")
+            else:
+                out.append((bitbuf >> 1) & 0xFF)
+                bitbuf >>= 9
+                bitcnt -= 9
+            if bitcnt < 0:
+                raise ValueError("truncated implode stream")
+        
+        if len(out) >= block_size + WINDOW:
+            yield bytes(out[:-WINDOW])
+            del out[:-WINDOW]
+            flushed = True
+    
+    if out or not flushed:
+        yield bytes(out)
+
+
+def blast(data):
+    """Decompress a whole PKWare DCL implode stream."""
+    return b''.join(iter_blast(data))
+
+
+def dbf_fields(header):
+    """Record count, record length and fields of a DBF header."""
+    n_records = int.from_bytes(header[4:8], 'little')
+    record_length = int.from_bytes(header[10:12], 'little')
+    fields = []
+    offset = 1  # deletion flag
+    for start in range(32, len(header) - 31, 32):
+        if header[start] == 0x0D:
+            break
+        descriptor = header[start:start + 32]
+        name = descriptor[:11].split(b'\0')[0].decode('latin-1').strip()
+        fields.append(DbfField(name, chr(descriptor[11]), descriptor[16],
+                               descriptor[17], offset))
+        offset += descriptor[16]
+    return n_records, record_length, fields
+
+
+def decode_field(raw, field, dtype=None, encoding='latin-1'):
+    """Decode one fixed-width field (an ``S<length>`` array) to a Series.
+    
+    Only the distinct raw values are decoded. Character fields become
+    categories, N/F fields float64, D fields datetime64 and L fields
+    boolean; blank values are missing. ``dtype`` (e.g. ``'Int32'``,
+    ``'float32'``, ``'category'``, ``'datetime64'`` for YYYYMMDD text)
+    overrides the type.
+    """
+    uniques, inverse = np.unique(raw, return_inverse=True)
+    inverse = inverse.ravel()
+    text = pd.Index([u.decode(encoding).strip() for u in uniques], dtype=object)
+    blank = text == ''
+    
+    if dtype is None:
+        dtype = {'N': 'float64', 'F': 'float64', 'D': 'datetime64',
+                 'L': 'boolean'}.get(field.type, 'category')
+    
+    if dtype == 'category':
+        codes, categories = pd.factorize(text.where(~blank))
+        return pd.Series(pd.Categorical.from_codes(codes[inverse], categories.astype(str)),
+                         name=field.name)
+    if dtype == 'datetime64':
+        values = pd.to_datetime(text.where(~blank), format='%Y%m%d', errors='coerce')
+        return pd.Series(values.take(inverse), name=field.name)
+    if dtype == 'boolean':
+        values = pd.array(np.where(text.str.upper().isin(['T', 'Y']), True,
+                                   np.where(text.str.upper().isin(['F', 'N']), False, None)),
+                          dtype='boolean')
+    elif dtype in ('str', 'string', object):
+        values = text.where(~blank)
+    else:
+        values = pd.to_numeric(text.where(~blank), errors='coerce')
+    return pd.Series(values.take(inverse), name=field.name).astype(dtype)
+
+
+def decode_records(block, record_length, fields, dtypes=None, encoding='latin-1'):
+    """DataFrame of the whole DBF records in ``block``; deleted records
+    (flag ``*``) are dropped."""
+    record = np.dtype({
+        'names': ['_deleted'] + [f.name for f in fields],
+        'formats': ['S1'] + [f'S{f.length}' for f in fields],
+        'offsets': [0] + [f.offset for f in fields],
+        'itemsize': record_length,
+    })
+    records = np.frombuffer(block, dtype=record, count=len(block) // record_length)
+    records = records[records['_deleted'] != b'*']
+    dtypes = dtypes or {}
+    return pd.DataFrame({f.name: decode_field(records[f.name], f, dtypes.get(f.name), encoding)
+                         for f in fields})
+
+
+def _blocks(path, data_start, compressed, block_size=1 << 20):
+    """Decompressed (or plain) record bytes of a DBC/DBF file, in blocks."""
+    with open(path, 'rb') as f:
+        f.seek(data_start)
+        if compressed:
+            yield from iter_blast(f.read(), block_size)
+        else:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+
+
+def read_header(path):
+    """Header length, record count, record length and fields of a .dbc/.dbf
+    file (both start with the plain DBF header)."""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        header_length = int.from_bytes(head[8:10], 'little')
+        header = head + f.read(header_length - 32)
+    return (header_length,) + dbf_fields(header)
+
+
+def iter_dbc(path, usecols=None, chunksize=100_000, dtypes=None, encoding='latin-1'):
+    """Stream a .dbc (or plain .dbf) file as DataFrames of ``chunksize``
+    records (all records in one frame if ``chunksize`` is None).
+    
+    ``usecols`` selects fields (names missing from the file are ignored);
+    ``dtypes`` maps field names to types (see ``decode_field``). Each chunk
+    has its own categories.
+    """
+    header_length, n_records, record_length, fields = read_header(path)
+    if usecols is not None:
+        fields = [f for f in fields if f.name in set(usecols)]
+    
+    # A .dbc has the CRC of the header between the header and the records
+    compressed = not str(path).lower().endswith('.dbf')
+    data_start = header_length + 4 if compressed else header_length
+    
+    if chunksize is None:
+        chunksize = max(1, n_records)
+    chunk_bytes = chunksize * record_length
+    pending = bytearray()
+    remaining = n_records
+    for block in _blocks(path, data_start, compressed):
+        pending += block
+        while len(pending) >= chunk_bytes and remaining > 0:
+            count = min(chunksize, remaining)
+            yield decode_records(bytes(pending[:count * record_length]), record_length,
+                                 fields, dtypes, encoding)
+            del pending[:count * record_length]
+            remaining -= count
+    
+    # Last partial chunk (a trailing 0x1A end-of-file marker is ignored)
+    count = min(remaining, len(pending) // record_length)
+    if count > 0:
+        yield decode_records(bytes(pending[:count * record_length]), record_length,
+                             fields, dtypes, encoding)
+
+
+def read_dbc(path, usecols=None, dtypes=None, encoding='latin-1'):
+    """Read a whole .dbc (or plain .dbf) file into a DataFrame."""
+    return next(iter_dbc(path, usecols=usecols, chunksize=None, dtypes=dtypes,
+                         encoding=encoding), pd.DataFrame())
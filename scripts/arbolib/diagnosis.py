@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+diagnosis.py
+============
+Categorization of the initial clinical diagnostic hypothesis.
+
+Free-text hypotheses repeat heavily (a few dozen distinct strings cover
+thousands of cases), so the rules are evaluated once per distinct value and
+the result is broadcast back to every row.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import numpy as np
+import pandas as pd
+
+DX_CATEGORIES = ['Dengue only', 'Dengue or Chikungunya', 'Chikungunya only', 'Other']
+
+
+def categorize_diagnoses(hypotheses):
+    """Categorize diagnostic hypotheses (HIPOTESE_DIAGNOSTICA).
+    
+    Rules, applied in order to the upper-cased text:
+    - mentions CHIKUNGUNYA but not DENGUE -> 'Chikungunya only'
+    - mentions DENGUE but not CHIKUNGUNYA -> 'Dengue only'
+    - mentions both -> 'Dengue or Chikungunya'
+    - contains 'DENGUE OU CHIK' -> 'Dengue or Chikungunya'
+    - anything else, including missing values -> 'Other'
+    
+    Returns a categorical Series (categories ``DX_CATEGORIES``) aligned with
+    the input.
+    """
+    hypotheses = pd.Series(hypotheses)
+    codes, uniques = pd.factorize(hypotheses)
+    
+    text = pd.Series(uniques, dtype=object).astype(str).str.upper()
+    chik = text.str.contains('CHIKUNGUNYA', regex=False).to_numpy()
+    dengue = text.str.contains('DENGUE', regex=False).to_numpy()
+    dengue_ou_chik = text.str.contains('DENGUE OU CHIK', regex=False).to_numpy()
+    
+    # Category code (position in DX_CATEGORIES) of each distinct value
+    other = DX_CATEGORIES.index('Other')
+    unique_codes = np.select(
+        [chik & ~dengue, dengue & ~chik, dengue & chik, dengue_ou_chik],
+        [DX_CATEGORIES.index('Chikungunya only'),
+         DX_CATEGORIES.index('Dengue only'),
+         DX_CATEGORIES.index('Dengue or Chikungunya'),
+         DX_CATEGORIES.index('Dengue or Chikungunya')],
+        default=other
+    )
+    
+    # factorize codes missing values as -1, which picks the trailing 'Other'
+    lookup = np.append(unique_codes, other).astype(np.int8)
+    
+    return pd.Series(pd.Categorical.from_codes(lookup[codes], DX_CATEGORIES),
+                     index=hypotheses.index, name='dx_category')
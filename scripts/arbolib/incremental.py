@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+incremental.py
+==============
+Incremental (delta) updates of the processed SINAN store.
+
+SINAN extracts are re-published with revised and newly typed records. A
+delta run still scans the extract, but only the rows past the stored
+watermark are processed: rows typed on or after the last ``DT_DIGITA``
+seen, belonging to a ``NU_LOTE_I`` batch not seen before, or whose key was
+not in the previous scan (new records without a data-entry date or batch).
+The data-entry date of the watermark itself is read again, as more rows
+may have been typed that day; upserting them twice changes nothing.
+
+- ``RecordKeys``: a key per record (``record_key``). With ``NU_NOTIFIC``
+  it is a hash of the fields SINAN identifies a notification by
+  (``NOTIFICATION_KEY``), which revisions do not change; anonymized
+  extracts fall back to a hash of ``ANONYMIZED_KEY`` and of the record's
+  occurrence number among earlier rows with the same fields;
+- ``DeltaScan``: one pass over the extract: keys of every row, the delta
+  rows and the next watermark;
+- ``upsert``: replaces the stored rows of the delta keys by the processed
+  delta and drops rows whose record left the extract, keeping the order of
+  the extract, so the result equals a full run;
+- ``stratum_counts``/``update_counts``: cases, hospitalizations and
+  symptom counts per stratum and SINAN group, updated by subtracting the
+  replaced rows and adding the delta.
+
+The watermark and a log of every delta are kept in a JSON file next to the
+store, and the keys of every scanned row in the ``sinan_keys`` dataset.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from arbolib import signatures
+from arbolib.strata import STRATA_KEYS
+
+KEY = 'record_key'
+
+# SINAN's identification of a notification, fixed once it is notified
+NOTIFICATION_KEY = ['NU_NOTIFIC', 'ID_AGRAVO', 'ID_MUNICIP', 'DT_NOTIFIC']
+
+# Extracts anonymized without NU_NOTIFIC: the fields that best tell records apart
+ANONYMIZED_KEY = ['ID_AGRAVO', 'DT_NOTIFIC', 'ID_MUNICIP', 'ID_UNIDADE',
+                  'DT_SIN_PRI', 'NU_IDADE_N', 'CS_SEXO']
+
+COUNT_KEYS = STRATA_KEYS + ['sinan_group']
+
+WATERMARK_FILE = 'sinan_watermark.json'
+
+
+def _hash_fields(df, columns):
+    """Row hashes of ``columns`` (those present), with dates as day numbers
+    and numbers as Int64, so the parser's dtypes do not change them."""
+    fields = pd.DataFrame(index=df.index)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Day number, whatever the datetime unit
+            values = (values - pd.Timestamp('1970-01-01')) // pd.Timedelta(days=1)
+        elif pd.api.types.is_numeric_dtype(values):
+            values = values.astype('Int64')
+        fields[col] = values
+    return pd.util.hash_pandas_object(fields, index=False).to_numpy()
+
+
+class RecordKeys:
+    """``record_key`` of the rows of an extract, chunk by chunk.
+    
+    With ``NU_NOTIFIC`` the key hashes ``NOTIFICATION_KEY`` only, so it
+    survives revisions of any other field and reordering of the extract.
+    
+    Without it the key also hashes clinical fields, and a revision of one
+    of those shows as the record removed and a new one inserted. Calls must
+    then follow the order of the extract: the occurrence number of a row
+    counts the earlier rows (in this and previous chunks) with the same
+    fields, so the key is only stable while the extract keeps its order - a
+    new record inserted before an old one with identical fields takes the
+    old record's key, and the old record comes back as a new one.
+    """
+    
+    def __init__(self):
+        self.seen = {}
+    
+    def __call__(self, df):
+        if 'NU_NOTIFIC' in df.columns:
+            return _hash_fields(df, NOTIFICATION_KEY)
+        base = _hash_fields(df, ANONYMIZED_KEY)
+        
+        earlier = pd.Series(base).map(self.seen).fillna(0).to_numpy(dtype=np.int64)
+        occurrence = pd.Series(base).groupby(base).cumcount().to_numpy() + earlier
+        counts = pd.Series(base).value_counts()
+        for key, n in zip(counts.index.tolist(), counts.tolist()):
+            self.seen[key] = self.seen.get(key, 0) + n
+        
+        return pd.util.hash_pandas_object(
+            pd.DataFrame({'fields': base, 'occurrence': occurrence}), index=False
+        ).to_numpy()
+
+
+def load_watermark(data_dir):
+    """Stored watermark (``DT_DIGITA``, ``NU_LOTE_I`` batches, delta log),
+    or None before the first run."""
+    path = os.path.join(data_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_watermark(state, data_dir):
+    with open(os.path.join(data_dir, WATERMARK_FILE), 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+
+
+class DeltaScan:
+    """One pass over an extract against ``watermark`` (None: every row is
+    new, as in a full run).
+    
+    With ``known_keys`` (the keys of every row of the previous scan, not
+    only the stored cases) rows whose key is not known are part of the
+    delta too, whatever their ``DT_DIGITA``/``NU_LOTE_I``.
+    
+    Calling the scan on each raw chunk, in order, adds its ``record_key``
+    column and returns the mask of the delta rows. Afterwards ``keys`` holds
+    the keys of the whole extract, ``delta_keys`` those of the delta rows
+    and ``watermark()`` the state for the next run.
+    """
+    
+    def __init__(self, watermark=None, known_keys=None):
+        self.previous = watermark
+        self.known = pd.Index(known_keys) if known_keys is not None else None
+        self.record_keys = RecordKeys()
+        self._keys = []
+        self._delta_keys = []
+        self.rows = 0
+        self.delta_rows = 0
+        self.last_entry = pd.Timestamp(watermark['DT_DIGITA']) \
+            if watermark and watermark.get('DT_DIGITA') else None
+        self.batches = set(watermark.get('NU_LOTE_I', [])) if watermark else set()
+    
+    def __call__(self, chunk):
+        chunk[KEY] = self.record_keys(chunk)
+        if self.previous is None:
+            delta = pd.Series(True, index=chunk.index)
+        else:
+            delta = pd.Series(False, index=chunk.index)
+            if self.previous.get('DT_DIGITA') and 'DT_DIGITA' in chunk.columns:
+                delta |= (chunk['DT_DIGITA'] >= pd.Timestamp(self.previous['DT_DIGITA'])).fillna(False)
+            if 'NU_LOTE_I' in chunk.columns:
+                batch = chunk['NU_LOTE_I']
+                delta |= (batch.notna() & ~batch.isin(self.previous.get('NU_LOTE_I', []))).fillna(False)
+            if self.known is not None:
+                delta |= ~chunk[KEY].isin(self.known)
+        delta = delta.to_numpy(dtype=bool)
+        
+        if 'DT_DIGITA' in chunk.columns:
+            last = chunk['DT_DIGITA'].max()
+            if pd.notna(last) and (self.last_entry is None or last > self.last_entry):
+                self.last_entry = last
+        if 'NU_LOTE_I' in chunk.columns:
+            self.batches.update(int(b) for b in chunk['NU_LOTE_I'].dropna().unique())
+        
+        self._keys.append(chunk[KEY].to_numpy())
+        self._delta_keys.append(chunk[KEY].to_numpy()[delta])
+        self.rows += len(chunk)
+        self.delta_rows += int(delta.sum())
+        return delta
+    
+    @property
+    def keys(self):
+        return np.concatenate(self._keys) if self._keys else np.array([], dtype=np.uint64)
+    
+    @property
+    def delta_keys(self):
+        return np.concatenate(self._delta_keys) if self._delta_keys else np.array([], dtype=np.uint64)
+    
+    def watermark(self, log=None):
+        """State for the next run; ``log`` (a dict) is appended to the
+        delta log."""
+        deltas = list(self.previous.get('deltas', [])) if self.previous else []
+        if log is not None:
+            deltas.append(log)
+        return {
+            'DT_DIGITA': self.last_entry.strftime('%Y-%m-%d') if self.last_entry is not None else None,
+            'NU_LOTE_I': sorted(self.batches),
+            'deltas': deltas,
+        }
+
+
+def _row_hashes(df, columns):
+    """Hash of the values of each row in ``columns``, indexed by key; plain
+    values, so category lists and nullable dtypes do not change it."""
+    values = df[columns].astype(object).where(df[columns].notna(), None)
+    return pd.Series(pd.util.hash_pandas_object(values, index=False).to_numpy(),
+                     index=df[KEY].to_numpy())
+
+
+def upsert(store, delta, scan):
+    """Merge the processed ``delta`` rows into ``store``.
+    
+    Stored rows whose key is among the scan's delta keys are replaced (a
+    revised record that no longer passes the case filter simply goes), rows
+    whose key is not in the extract any more are dropped, and the result
+    follows the order of the extract. Returns the new table, the removed
+    stored rows and a dict of counts (inserted, updated, removed); delta
+    rows equal to the stored ones (re-read from the watermark's day) count
+    as neither inserted nor updated.
+    """
+    keys = scan.keys
+    replaced = store[KEY].isin(scan.delta_keys) | ~store[KEY].isin(keys)
+    kept = store[~replaced]
+    existing = delta[KEY].isin(store[KEY]).to_numpy()
+    columns = [c for c in store.columns if c in delta.columns and c != KEY]
+    stored = _row_hashes(store, columns)
+    stored = stored[~stored.index.duplicated()]
+    changed = existing & (_row_hashes(delta, columns).to_numpy()
+                          != stored.reindex(delta[KEY]).to_numpy())
+    
+    merged = pd.concat([kept, delta], ignore_index=True)
+    # Chunks have their own categories; concat falls back to plain values
+    for col in store.columns:
+        if isinstance(store[col].dtype, pd.CategoricalDtype) and \
+                not isinstance(merged[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].astype('category')
+    # Duplicated notifications share a key; they sort at its first row
+    position = pd.Index(pd.unique(keys)).get_indexer(merged[KEY])
+    merged = merged.iloc[np.argsort(position, kind='stable')].reset_index(drop=True)
+    stats = {'inserted': int((~existing).sum()), 'updated': int(changed.sum()),
+             'removed': int(replaced.sum()) - int(existing.sum())}
+    return merged, store[replaced], stats
+
+
+def stratum_counts(df, symptoms):
+    """Cases, hospitalized cases and cases with each symptom per stratum and
+    SINAN group, indexed by ``COUNT_KEYS`` (rows with a missing stratum key
+    are left out)."""
+    symptoms = [s for s in symptoms if s in signatures.SYMPTOM_BITS]
+    present, total = signatures.group_counts(df, COUNT_KEYS, symptoms)
+    counts = present.copy()
+    counts.insert(0, 'cases', df.groupby(COUNT_KEYS, observed=True).size())
+    counts.insert(1, 'hospitalized',
+                  df.groupby(COUNT_KEYS, observed=True)['hospitalized'].sum().astype(np.int64))
+    return counts
+
+
+def update_counts(counts, removed, added, symptoms):
+    """``counts`` (as stored: one column per stratum key) less the counts of
+    the ``removed`` rows plus those of the ``added`` rows; strata left
+    without cases are dropped."""
+    result = counts.set_index(COUNT_KEYS)
+    for frame, sign in [(removed, -1), (added, 1)]:
+        if len(frame):
+            result = result.add(sign * stratum_counts(frame, symptoms), fill_value=0)
+    result = result[result['cases'] > 0].astype(np.int64)
+    return result.sort_index().reset_index()
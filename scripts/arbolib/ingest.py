@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+ingest.py
+=========
+Ingestion of many raw SINAN files - one per UF, year and disease, as
+DATASUS distributes them - into one partitioned dataset.
+
+Each file is read with the typed SINAN schema (``arbolib.sinan.read_sinan``:
+CSV, .dbc or .dbf) and its rows are written under
+``NU_ANO=<year>/SG_UF_NOT=<UF>/ID_AGRAVO=<ICD-10>/`` by
+``arbolib.store.write_partitions``. Files are parsed concurrently, one per
+worker process; every file writes its own Parquet files (named after the
+raw file), so workers never touch the same file and re-ingesting a raw file
+replaces only what it wrote before.
+
+Analyses then read only the partitions they need, e.g.
+``read_sinan(DATA_PARTITIONED, filters={'ID_AGRAVO': 'A92.0', 'NU_ANO': 2023})``.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from arbolib.sinan import read_sinan
+from arbolib.store import DATA_PROCESSED, remove_partition_files, write_partitions
+
+DATA_PARTITIONED = os.path.join(DATA_PROCESSED, 'sinan_partitioned')
+
+PARTITION_COLS = ['NU_ANO', 'SG_UF_NOT', 'ID_AGRAVO']
+
+# ICD-10 codes of the arboviruses notified in SINAN
+AGRAVOS = {
+    'A92.0': 'Chikungunya',
+    'A90': 'Dengue',
+    'A92.8': 'Zika',
+}
+
+
+def ingest_file(path, root=DATA_PARTITIONED, usecols=None, chunksize=None):
+    """Read one raw SINAN file into the partitioned dataset at ``root``.
+    
+    With ``chunksize`` the file is read and written in chunks of that many
+    rows. Rows without a partition key go to the ``__HIVE_DEFAULT_PARTITION__``
+    directory of that key. Returns a dict with the file name, rows written,
+    the set of partitions (key tuples) and elapsed seconds.
+    """
+    start = time.perf_counter()
+    basename = os.path.basename(path)
+    remove_partition_files(root, basename)
+    
+    chunks = read_sinan(path, usecols=usecols, chunksize=chunksize)
+    if chunksize is None:
+        chunks = [chunks]
+    
+    rows = 0
+    partitions = set()
+    for i, chunk in enumerate(chunks):
+        missing = [c for c in PARTITION_COLS if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"{basename}: no partition column {', '.join(missing)}")
+        write_partitions(chunk, root, PARTITION_COLS, f'{basename}-{i}')
+        rows += len(chunk)
+        partitions.update(chunk[PARTITION_COLS].drop_duplicates()
+                          .itertuples(index=False, name=None))
+    
+    return {'file': basename, 'rows': rows, 'partitions': partitions,
+            'bytes': os.path.getsize(path), 'seconds': time.perf_counter() - start}
+
+
+def ingest(paths, root=DATA_PARTITIONED, usecols=None, chunksize=None, jobs=0):
+    """Ingest raw files concurrently, yielding each file's stats as it
+    finishes (see ``ingest_file``).
+    
+    ``jobs`` is the number of worker processes (0 = all CPUs); with one job
+    the files are read in this process.
+    """
+    paths = list(paths)
+    jobs = min(jobs or os.cpu_count(), max(1, len(paths)))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(ingest_file, path, root, usecols, chunksize)
+                       for path in paths]
+            for future in as_completed(futures):
+                yield future.result()
+    else:
+        for path in paths:
+            yield ingest_file(path, root, usecols, chunksize)
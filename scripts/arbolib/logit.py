@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+logit.py
+========
+Batched logistic regression: many small models fitted at once with
+Newton-Raphson over stacked design matrices.
+
+``fit_batch`` follows statsmodels' ``Logit.fit(method='newton')`` step for
+step (zero start, 1e-10 ridge on the Hessian, stop when every coefficient
+moves less than ``tol``, at most 35 iterations), so coefficients, standard
+errors and Wald intervals agree with statsmodels to numerical precision.
+Models are either
+
+- one shared design ``X`` (n x p) with per-model weights (B x n), e.g.
+  bootstrap multiplicities - the Hessian is then one (B x n) @ (n x p^2)
+  product; or
+- stacked designs ``X`` (B x n x p), e.g. one model per stratum, padded to a
+  common n with zero weights (see ``stack_designs``).
+
+A column ``mask`` per model fits sub-models of one shared design (e.g. every
+candidate drop of a stepwise step) in the same batch.
+
+``Logit`` wraps a single fit with the statsmodels interface used by the
+analysis stages (``Logit(y, X).fit(disp=0)``).
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.special import expit
+
+RIDGE = 1e-10
+
+
+class BatchResults:
+    """Coefficients and fit statistics of B logistic models (arrays)."""
+    
+    def __init__(self, params, cov, llf, llnull, nobs, converged, iterations):
+        self.params = params
+        self.cov = cov
+        self.llf = llf
+        self.llnull = llnull
+        self.nobs = nobs
+        self.converged = converged
+        self.iterations = iterations
+        with np.errstate(invalid='ignore'):
+            self.bse = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    
+    @property
+    def pvalues(self):
+        return 2 * stats.norm.sf(np.abs(self.params / self.bse))
+    
+    def conf_int(self, alpha=0.05):
+        """(B x p x 2) Wald intervals."""
+        q = stats.norm.ppf(1 - alpha / 2)
+        return np.stack([self.params - q * self.bse, self.params + q * self.bse], axis=-1)
+
+
+def stack_designs(designs):
+    """Pad a list of (X, y) pairs to (B x n x p) designs with zero weights."""
+    n = max(len(y) for _, y in designs)
+    p = np.asarray(designs[0][0]).shape[1]
+    X = np.zeros((len(designs), n, p))
+    Y = np.zeros((len(designs), n))
+    W = np.zeros((len(designs), n))
+    for b, (x, y) in enumerate(designs):
+        X[b, :len(y)] = np.asarray(x, dtype=float)
+        Y[b, :len(y)] = np.asarray(y, dtype=float)
+        W[b, :len(y)] = 1.0
+    return X, Y, W
+
+
+def _solve(H, g):
+    """Batched solve; models whose Hessian is singular get NaN."""
+    try:
+        return np.linalg.solve(H, g[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        out = np.full(g.shape, np.nan)
+        for b in range(len(g)):
+            try:
+                out[b] = np.linalg.solve(H[b], g[b])
+            except np.linalg.LinAlgError:
+                pass
+        return out
+
+
+def _inv(H):
+    """Batched inverse; singular (or non-finite) matrices give NaN."""
+    try:
+        return np.linalg.inv(H)
+    except np.linalg.LinAlgError:
+        out = np.full(H.shape, np.nan)
+        for b in range(len(H)):
+            try:
+                out[b] = np.linalg.inv(H[b])
+            except np.linalg.LinAlgError:
+                pass
+        return out
+
+
+def fit_batch(X, y, weights=None, mask=None, start=None, maxiter=35, tol=1e-8):
+    """Fit B logistic models by Newton-Raphson.
+    
+    Parameters
+    ----------
+    X : (n x p) shared design or (B x n x p) stacked designs
+    y : (n,) or (B x n) binary outcomes
+    weights : (B x n) frequency weights (None = all ones, one model)
+    mask : (B x p) bool, columns of X in each model (None = all); excluded
+        coefficients are held at 0, so sub-models of one design share it
+    start : (B x p) starting coefficients (None = zeros)
+    
+    Models whose Hessian is singular at the solution get NaN standard
+    errors; models still moving after ``maxiter`` steps are flagged in
+    ``converged``.
+    """
+    X = np.asarray(X, dtype=float)
+    shared = X.ndim == 2
+    n, p = X.shape[-2:]
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    w = np.ones((1, n)) if weights is None else np.atleast_2d(np.asarray(weights, dtype=float))
+    B = max(len(y), len(w), 1 if shared else len(X), 1 if mask is None else len(mask))
+    y = np.broadcast_to(y, (B, n))
+    w = np.broadcast_to(w, (B, n))
+    mask = np.ones((B, p), dtype=bool) if mask is None else np.broadcast_to(mask, (B, p))
+    
+    def restrict(H, g, idx):
+        # Excluded coefficients: zero score, identity Hessian (no step)
+        out = ~mask[idx]
+        H[out[:, :, None] | out[:, None, :]] = 0.0
+        H[:, np.arange(p), np.arange(p)] += out
+        return H, np.where(out, 0.0, g)
+    
+    if shared:
+        outer = (X[:, :, None] * X[:, None, :]).reshape(n, p * p)
+    
+    def rows(idx):
+        return X if len(idx) == B else X[idx]
+    
+    def eta_of(beta, idx):
+        if shared:
+            return beta @ X.T
+        return np.matmul(rows(idx), beta[:, :, None])[..., 0]
+    
+    def hessian(v, idx):
+        if shared:
+            return (v @ outer).reshape(-1, p, p)
+        Xi = rows(idx)
+        return np.matmul(Xi.transpose(0, 2, 1), Xi * v[..., None])
+    
+    def score(r, idx):
+        if shared:
+            return r @ X
+        return np.matmul(r[:, None, :], rows(idx))[:, 0]
+    
+    beta = np.zeros((B, p)) if start is None else np.where(mask, start, 0.0)
+    active = np.ones(B, dtype=bool)
+    iterations = np.zeros(B, dtype=int)
+    
+    for _ in range(maxiter):
+        idx = np.nonzero(active)[0]
+        if len(idx) == 0:
+            break
+        mu = expit(eta_of(beta[idx], idx))
+        H = hessian(w[idx] * mu * (1 - mu), idx)
+        H[:, np.arange(p), np.arange(p)] += RIDGE
+        step = _solve(*restrict(H, score(w[idx] * (y[idx] - mu), idx), idx))
+        
+        beta[idx] += step
+        iterations[idx] += 1
+        active[idx] = np.isfinite(step).all(axis=1) & (np.abs(step) > tol).any(axis=1)
+    
+    converged = ~active & (iterations < maxiter) & np.isfinite(beta).all(axis=1)
+    
+    idx = np.arange(B)
+    eta = eta_of(beta, idx)
+    mu = expit(eta)
+    H, _ = restrict(hessian(w * mu * (1 - mu), idx), np.zeros((B, p)), idx)
+    cov = _inv(H)
+    cov[~mask[:, :, None] | ~mask[:, None, :]] = np.nan
+    llf = (w * (y * eta - np.logaddexp(0, eta))).sum(axis=1)
+    
+    nobs = w.sum(axis=1)
+    p0 = (w * y).sum(axis=1) / nobs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llnull = nobs * (p0 * np.log(p0) + (1 - p0) * np.log1p(-p0))
+    llnull = np.where((p0 == 0) | (p0 == 1), 0.0, llnull)
+    
+    return BatchResults(beta, cov, llf, llnull, nobs, converged, iterations)
+
+
+class LogitResults:
+    """Single-model results with the statsmodels attributes the stages use."""
+    
+    def __init__(self, batch, names):
+        self._names = names
+        self.params = pd.Series(batch.params[0], index=names)
+        self.bse = pd.Series(batch.bse[0], index=names)
+        self.pvalues = pd.Series(batch.pvalues[0], index=names)
+        self.llf = batch.llf[0]
+        self.llnull = batch.llnull[0]
+        self.nobs = batch.nobs[0]
+        self.df_model = len(names) - 1
+        self.mle_retvals = {'converged': bool(batch.converged[0]),
+                            'iterations': int(batch.iterations[0])}
+    
+    @property
+    def prsquared(self):
+        return 1 - self.llf / self.llnull
+    
+    @property
+    def aic(self):
+        return -2 * self.llf + 2 * len(self._names)
+    
+    @property
+    def bic(self):
+        return -2 * self.llf + np.log(self.nobs) * len(self._names)
+    
+    def conf_int(self, alpha=0.05):
+        q = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - q * self.bse, 1: self.params + q * self.bse})
+    
+    def predict(self, exog):
+        values = expit(np.asarray(exog, dtype=float) @ self.params.to_numpy())
+        if isinstance(exog, pd.DataFrame):
+            return pd.Series(values, index=exog.index)
+        return values
+
+
+class Logit:
+    """Logistic regression with the ``sm.Logit(endog, exog).fit()`` interface."""
+    
+    def __init__(self, endog, exog):
+        self.endog = endog
+        self.exog = exog
+    
+    def fit(self, disp=0, maxiter=35, tol=1e-8):
+        if isinstance(self.exog, pd.DataFrame):
+            names = list(self.exog.columns)
+        else:
+            names = [f'x{i}' for i in range(np.asarray(self.exog).shape[1])]
+        
+        batch = fit_batch(self.exog, self.endog, maxiter=maxiter, tol=tol)
+        if not np.isfinite(batch.bse).all():
+            raise np.linalg.LinAlgError('Singular matrix')
+        return LogitResults(batch, names)
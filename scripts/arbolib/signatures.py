@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+signatures.py
+=============
+Bit-packed symptom signatures: every patient's binary symptoms as one
+uint16, with the operations the analysis stages need done on that integer
+array instead of a float DataFrame.
+
+Each symptom has a fixed bit (``SYMPTOM_BITS``), the same in both data
+sets; the RT-PCR and SINAN names of one symptom (CONJUNTIVITE/CONJUNTVIT,
+DOR_RETRO_ORBITAL/DOR_RETRO) share a bit, so merged signatures compare
+across sources. A missing symptom counts as absent.
+
+- ``popcount``: number of symptoms (``symptom_count``);
+- ``codes``/``collapse``: pattern codes of a symptom subset, with the first
+  symptom as the most significant bit (as ``arbolib.clustering.pattern_codes``),
+  and the distinct patterns with their counts;
+- ``group_counts``/``pattern_table``: symptom and pattern frequency tables;
+- ``hamming``/``jaccard``: distances between signatures via XOR/AND/OR.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import numpy as np
+import pandas as pd
+
+# Column holding the packed signature in the processed datasets
+SIGNATURE = 'symptom_signature'
+
+SYMPTOM_BITS = {
+    'FEBRE': 0,
+    'MIALGIA': 1,
+    'CEFALEIA': 2,
+    'ARTRALGIA': 3,
+    'EXANTEMA': 4,
+    'NAUSEA': 5,
+    'VOMITO': 6,
+    'ARTRITE': 7,
+    'CONJUNTIVITE': 8,
+    'CONJUNTVIT': 8,
+    'DOR_RETRO_ORBITAL': 9,
+    'DOR_RETRO': 9,
+    'EDEMA': 10,
+    'ASTENIA': 11,
+    'DOR_COSTAS': 12,
+    'PETEQUIA_N': 13,
+}
+
+DTYPE = np.uint16
+
+# Set bits of every 16-bit value (numpy < 2.0 has no bitwise_count)
+_POPCOUNT = sum((np.arange(1 << 16) >> bit) & 1 for bit in range(16)).astype(np.uint8)
+
+
+def mask(symptoms):
+    """Bit mask of ``symptoms``."""
+    out = 0
+    for s in symptoms:
+        out |= 1 << SYMPTOM_BITS[s]
+    return out
+
+
+def pack(df, symptoms=None):
+    """Signature of each row of ``df`` from its 0/1 symptom columns.
+    
+    By default every column of ``df`` with a bit is packed; missing values
+    count as absent.
+    """
+    if symptoms is None:
+        symptoms = [s for s in SYMPTOM_BITS if s in df.columns]
+    out = np.zeros(len(df), dtype=DTYPE)
+    for s in symptoms:
+        present = df[s].fillna(0).to_numpy() > 0
+        out |= present.astype(DTYPE) << DTYPE(SYMPTOM_BITS[s])
+    return out
+
+
+def unpack(signature, symptoms):
+    """0/1 (int8) columns of ``symptoms``."""
+    signature = np.asarray(signature, dtype=DTYPE)
+    return pd.DataFrame({s: ((signature >> SYMPTOM_BITS[s]) & 1).astype(np.int8)
+                         for s in symptoms})
+
+
+def available(df, symptoms):
+    """The ``symptoms`` held by ``df``, as columns or in its signature."""
+    packed = SIGNATURE in df.columns
+    return [s for s in symptoms if s in df.columns or (packed and s in SYMPTOM_BITS)]
+
+
+def popcount(signature):
+    """Number of symptoms of each signature."""
+    return _POPCOUNT[np.asarray(signature, dtype=DTYPE)]
+
+
+def codes(signature, symptoms):
+    """Pattern code of ``symptoms`` per signature, first symptom as the most
+    significant bit (so codes sort like the 0/1 rows)."""
+    signature = np.asarray(signature, dtype=np.int64)
+    out = np.zeros(len(signature), dtype=np.int64)
+    for s in symptoms:
+        out = (out << 1) | ((signature >> SYMPTOM_BITS[s]) & 1)
+    return out
+
+
+def collapse(signature, symptoms):
+    """Distinct patterns of ``symptoms`` (0/1 float rows, lexicographic
+    order), their counts and each signature's pattern index - the output of
+    ``arbolib.clustering.collapse_patterns`` on the symptom matrix."""
+    unique, inverse, counts = np.unique(codes(signature, symptoms),
+                                        return_inverse=True, return_counts=True)
+    shifts = np.arange(len(symptoms) - 1, -1, -1)
+    patterns = ((unique[:, None] >> shifts) & 1).astype(float)
+    return patterns, counts, inverse.ravel()
+
+
+def group_counts(df, keys, symptoms):
+    """Symptom-present counts and group sizes per ``keys`` cell.
+    
+    One groupby labels the cells; each symptom is then a ``bincount`` of
+    its bit over the cell labels. Returns two tables indexed by ``keys``
+    with one column per symptom, as ``arbolib.contingency.group_counts``.
+    """
+    grouped = df.groupby(list(keys), observed=True)
+    size = grouped.size()
+    # Rows with a missing key have no cell (NaN)
+    cell = grouped.ngroup().to_numpy(dtype=float)
+    keep = ~np.isnan(cell)
+    cell = cell[keep].astype(np.int64)
+    signature = df[SIGNATURE].to_numpy()[keep]
+    
+    present = pd.DataFrame({s: np.bincount(cell, weights=(signature >> SYMPTOM_BITS[s]) & 1,
+                                           minlength=len(size)).astype(np.int64)
+                            for s in symptoms}, index=size.index)
+    total = pd.DataFrame({s: size.to_numpy() for s in symptoms}, index=size.index)
+    return present, total
+
+
+def pattern_table(signature, symptoms):
+    """Frequency of each distinct pattern of ``symptoms``, most common
+    first: one 0/1 column per symptom plus ``n_symptoms``, ``count`` and
+    ``pct``."""
+    patterns, counts, _ = collapse(signature, symptoms)
+    table = pd.DataFrame(patterns.astype(np.int8), columns=list(symptoms))
+    table['n_symptoms'] = patterns.sum(axis=1).astype(int)
+    table['count'] = counts
+    table['pct'] = counts / counts.sum() * 100
+    return table.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def hamming(a, b):
+    """Number of symptoms that differ between signatures (broadcasting)."""
+    return popcount(np.bitwise_xor(np.asarray(a, dtype=DTYPE), np.asarray(b, dtype=DTYPE)))
+
+
+def jaccard(a, b):
+    """Jaccard distance 1 - |a & b| / |a | b| between signatures
+    (broadcasting); 0 for two signatures without symptoms."""
+    a = np.asarray(a, dtype=DTYPE)
+    b = np.asarray(b, dtype=DTYPE)
+    union = popcount(a | b).astype(float)
+    shared = popcount(a & b)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(union > 0, 1 - shared / union, 0.0)
+
+
+def pairwise(signature, metric='hamming'):
+    """Square matrix of ``hamming`` or ``jaccard`` distances."""
+    signature = np.asarray(signature, dtype=DTYPE)
+    distance = hamming if metric == 'hamming' else jaccard
+    return distance(signature[:, None], signature[None, :])
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+sinan.py
+========
+Decoding helpers and the typed schema for SINAN/DATASUS notification
+fields.
+
+``read_sinan_csv`` applies the schema while parsing: yes/no fields
+(symptoms, comorbidities, alarm and severity signs, hospitalization) become
+int8 0/1 flags, geographic and epidemiological-week codes nullable
+int32/int16, ``DT_*`` fields datetime64, and all other text (sex, race,
+state and municipality names, classification, ...) ``category``. The 136
+column extract in data/raw drops from 1,390 to 329 bytes per row in memory
+(4.2x), short of the 10x targeted: the 16 datetime64 fields alone take
+128 bytes per row and the 57 flags one byte each.
+
+``read_sinan_dbc`` reads the DATASUS .dbc files directly
+(``arbolib.dbc``) into the same schema. Those hold DATASUS codes where the
+CSV export has labels, so the categorical fields used by the pipeline are
+relabelled (``SINAN_LABELS``) to give the same categories as the CSV.
+``read_sinan`` picks the reader from the file extension; a directory is
+read as the partitioned dataset written by ``arbolib.ingest``.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from arbolib.dbc import iter_dbc, read_header
+from arbolib.store import iter_partitions, load_partitions
+
+# Yes/no fields: exported either as labels (Sim/Não/Ignorado) or as DATASUS
+# codes (1 = yes, 2 = no, 9 = unknown); only "yes" decodes to 1
+FLAG_YES = ['Sim', '1', '1.0']
+SYMPTOM_FLAGS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO', 'NAUSEA',
+                 'DOR_COSTAS', 'CONJUNTVIT', 'ARTRITE', 'ARTRALGIA', 'PETEQUIA_N',
+                 'LEUCOPENIA', 'LACO', 'DOR_RETRO']
+COMORBIDITY_FLAGS = ['DIABETES', 'HEMATOLOG', 'HEPATOPAT', 'RENAL', 'HIPERTENSA',
+                     'ACIDO_PEPT', 'AUTO_IMUNE']
+ALARM_FLAGS = ['ALRM_HIPOT', 'ALRM_PLAQ', 'ALRM_VOM', 'ALRM_SANG', 'ALRM_HEMAT',
+               'ALRM_ABDOM', 'ALRM_LETAR', 'ALRM_HEPAT', 'ALRM_LIQ']
+SEVERITY_FLAGS = ['GRAV_PULSO', 'GRAV_CONV', 'GRAV_ENCH', 'GRAV_INSUF', 'GRAV_TAQUI',
+                  'GRAV_EXTRE', 'GRAV_HIPOT', 'GRAV_HEMAT', 'GRAV_MELEN', 'GRAV_METRO',
+                  'GRAV_SANG', 'GRAV_AST', 'GRAV_MIOC', 'GRAV_CONSC', 'GRAV_ORGAO',
+                  'MANI_HEMOR', 'EPISTAXE', 'GENGIVO', 'METRO', 'PETEQUIAS',
+                  'HEMATURA', 'SANGRAM', 'LACO_N', 'PLASMATICO', 'EVIDENCIA',
+                  'PLAQ_MENOR']
+FLAG_COLUMNS = (SYMPTOM_FLAGS + COMORBIDITY_FLAGS + ALARM_FLAGS + SEVERITY_FLAGS
+                + ['HOSPITALIZ'])
+
+# Numeric codes (nullable, as any of them may be blank)
+CODE_DTYPES = {
+    'ID_MUNICIP': 'Int32', 'ID_REGIONA': 'Int32', 'ID_UNIDADE': 'Int32',
+    'ID_MN_RESI': 'Int32', 'ID_RG_RESI': 'Int32', 'MUNICIPIO': 'Int32',
+    'COMUNINF': 'Int32', 'SEM_NOT': 'Int32', 'SEM_PRI': 'Int32', 'NU_LOTE_I': 'Int32',
+    'NU_ANO': 'Int16', 'ANO_NASC': 'Int16', 'NU_IDADE_N': 'Int16', 'ID_PAIS': 'Int16',
+    'COPAISINF': 'Int16',
+}
+
+# Measurements
+FLOAT_COLUMNS = ['munResLat', 'munResLon', 'munResAlt', 'munResArea', 'IDADEminutos',
+                 'IDADEhoras', 'IDADEdias', 'IDADEmeses', 'IDADEanos']
+
+# Labels of DATASUS codes, as in the CSV export; other fields keep their codes
+UF_NAMES = {
+    '11': 'Rondônia', '12': 'Acre', '13': 'Amazonas', '14': 'Roraima', '15': 'Pará',
+    '16': 'Amapá', '17': 'Tocantins', '21': 'Maranhão', '22': 'Piauí', '23': 'Ceará',
+    '24': 'Rio Grande do Norte', '25': 'Paraíba', '26': 'Pernambuco', '27': 'Alagoas',
+    '28': 'Sergipe', '29': 'Bahia', '31': 'Minas Gerais', '32': 'Espírito Santo',
+    '33': 'Rio de Janeiro', '35': 'São Paulo', '41': 'Paraná', '42': 'Santa Catarina',
+    '43': 'Rio Grande do Sul', '50': 'Mato Grosso do Sul', '51': 'Mato Grosso',
+    '52': 'Goiás', '53': 'Distrito Federal',
+}
+SINAN_LABELS = {
+    'TP_NOT': {'1': 'Negativa', '2': 'Individual', '3': 'Surto', '4': 'Agregado'},
+    'ID_AGRAVO': {'A920': 'A92.0', 'A928': 'A92.8'},
+    'SG_UF_NOT': UF_NAMES,
+    'SG_UF': UF_NAMES,
+    'UF': UF_NAMES,
+    'COUFINF': UF_NAMES,
+    'CS_SEXO': {'M': 'Masculino', 'F': 'Feminino', 'I': 'Ignorado'},
+    'CS_GESTANT': {'1': '1o trimestre', '2': '2o trimestre', '3': '3o trimestre',
+                   '4': 'Idade gestacional ignorada', '5': 'Não', '6': 'Não se aplica',
+                   '9': 'Ignorado'},
+    'CS_RACA': {'1': 'Branca', '2': 'Preta', '3': 'Amarela', '4': 'Parda',
+                '5': 'Indígena', '9': 'Ignorado'},
+    'CLASSI_FIN': {'5': 'Descartado', '8': 'Inconclusivo', '13': 'Chikungunya'},
+    'CRITERIO': {'1': 'Laboratório', '2': 'Clínico epidemiológico',
+                 '3': 'Em investigação'},
+    'EVOLUCAO': {'1': 'Cura', '2': 'Óbito por dengue', '3': 'Óbito por outras causas',
+                 '4': 'Óbito em investigação', '9': 'Ignorado'},
+}
+
+# Years per unit of the NU_IDADE_N prefix: 1XXX hours, 2XXX days,
+# 3XXX months, 4XXX years. Prefix 0 (plain numbers) is taken as years.
+AGE_UNIT_YEARS = np.array([1.0, 1 / (24 * 365.25), 1 / 365.25, 1 / 12, 1.0])
+
+
+def decode_age(nu_idade):
+    """Convert SINAN coded ages (NU_IDADE_N) to fractional years.
+    
+    The thousands digit gives the unit and the remainder the amount, e.g.
+    4045 -> 45 years, 3006 -> 0.5 years, 2015 -> 15 days. Missing values
+    and unknown unit prefixes decode to NaN.
+    
+    Works on whole columns at once; returns a Series aligned with the input
+    when given a Series, otherwise a float array.
+    """
+    values = pd.to_numeric(pd.Series(nu_idade), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    
+    unit = np.floor(values / 1000)
+    amount = values - unit * 1000
+    valid = (unit >= 0) & (unit < len(AGE_UNIT_YEARS))
+    
+    scale = AGE_UNIT_YEARS[np.where(valid, unit, 0).astype(int)]
+    years = np.where(valid, amount * scale, np.nan)
+    
+    if isinstance(nu_idade, pd.Series):
+        return pd.Series(years, index=nu_idade.index, name=nu_idade.name)
+    return years
+
+
+def sinan_dtypes(columns):
+    """``read_csv`` dtypes of SINAN columns.
+    
+    Codes and measurements get their numeric type; everything else
+    (including flags and dates, decoded by ``apply_schema``) is read as
+    ``category``, which stores each distinct value once.
+    """
+    return {col: CODE_DTYPES.get(col, 'float32' if col in FLOAT_COLUMNS else 'category')
+            for col in columns}
+
+
+def decode_flag(values):
+    """int8 1 where a yes/no field says yes, else 0 (no, unknown, blank)."""
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Decode each category once and look the rows up by code
+        yes = np.append(values.cat.categories.astype(str).isin(FLAG_YES), False)
+        flags = yes[values.cat.codes.to_numpy()]
+    elif pd.api.types.is_numeric_dtype(values):
+        flags = values.to_numpy(dtype=float, na_value=np.nan) == 1
+    else:
+        flags = values.astype(str).isin(FLAG_YES).to_numpy()
+    return pd.Series(flags.astype(np.int8), index=values.index, name=values.name)
+
+
+def apply_schema(df):
+    """Decode the flag and date columns of a frame read with ``sinan_dtypes``."""
+    for col in df.columns:
+        if col in FLAG_COLUMNS:
+            df[col] = decode_flag(df[col])
+        elif col.startswith('DT_') and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col].astype(object), format='%Y-%m-%d', errors='coerce')
+    return df
+
+
+def label_codes(df):
+    """Replace the DATASUS codes of ``SINAN_LABELS`` fields by their labels."""
+    for col, labels in SINAN_LABELS.items():
+        if col in df.columns:
+            categories = df[col].cat.categories
+            df[col] = df[col].cat.rename_categories(
+                {code: label for code, label in labels.items() if code in categories})
+    return df
+
+
+def read_sinan_csv(path, usecols=None, chunksize=None, sep=';'):
+    """Read a SINAN CSV extract with the typed schema.
+    
+    ``usecols`` is a list of wanted columns (those missing from the extract
+    are ignored). Returns a DataFrame, or an iterator of typed chunks when
+    ``chunksize`` is given.
+    """
+    header = pd.read_csv(path, sep=sep, nrows=0).columns
+    columns = [c for c in header if usecols is None or c in set(usecols)]
+    reader = pd.read_csv(path, sep=sep, usecols=columns, dtype=sinan_dtypes(columns),
+                         chunksize=chunksize)
+    if chunksize is None:
+        return apply_schema(reader)
+    return (apply_schema(chunk) for chunk in reader)
+
+
+def read_sinan_dbc(path, usecols=None, chunksize=None):
+    """Read a DATASUS .dbc (or .dbf) SINAN file with the typed schema.
+    
+    Same arguments and result as ``read_sinan_csv``; codes are decoded
+    straight from the fixed-width records and ``DT_*`` fields from their
+    YYYYMMDD text.
+    """
+    columns = [f.name for f in read_header(path)[3]
+               if usecols is None or f.name in set(usecols)]
+    dtypes = {col: 'datetime64' if col.startswith('DT_') else dtype
+              for col, dtype in sinan_dtypes(columns).items()}
+    chunks = (apply_schema(label_codes(chunk))
+              for chunk in iter_dbc(path, usecols=columns, chunksize=chunksize,
+                                    dtypes=dtypes))
+    if chunksize is None:
+        return next(chunks, pd.DataFrame())
+    return chunks
+
+
+def read_sinan_partitions(root, usecols=None, chunksize=None, filters=None):
+    """Read a partitioned SINAN dataset (``arbolib.ingest``), only the
+    partitions matching ``filters`` (e.g. ``{'ID_AGRAVO': 'A92.0'}``).
+    
+    Integer codes with missing values come back from Parquet as float and
+    are cast to their nullable type again; flags absent from some files
+    are 0 in their rows, as blank flags.
+    """
+    def typed(df):
+        for col in FLAG_COLUMNS:
+            if col in df.columns and df[col].dtype != np.int8:
+                df[col] = df[col].fillna(0).astype(np.int8)
+        return df.astype({col: dtype for col, dtype in CODE_DTYPES.items() if col in df.columns})
+    
+    if chunksize is None:
+        return typed(load_partitions(root, columns=usecols, filters=filters))
+    return (typed(chunk) for chunk in iter_partitions(root, columns=usecols, filters=filters,
+                                                      chunksize=chunksize))
+
+
+def read_sinan(path, usecols=None, chunksize=None, filters=None):
+    """Read a SINAN extract: semicolon CSV, DATASUS .dbc/.dbf, or a
+    partitioned dataset directory (where ``filters`` selects partitions)."""
+    if os.path.isdir(path):
+        return read_sinan_partitions(path, usecols=usecols, chunksize=chunksize,
+                                     filters=filters)
+    if str(path).lower().endswith(('.dbc', '.dbf')):
+        return read_sinan_dbc(path, usecols=usecols, chunksize=chunksize)
+    return read_sinan_csv(path, usecols=usecols, chunksize=chunksize)
+
+
+def bytes_per_row(df):
+    """In-memory size of a frame per row (deep, i.e. including strings)."""
+    return df.memory_usage(deep=True, index=False).sum() / max(1, len(df))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+stepwise.py
+===========
+Backward stepwise selection for logistic regression, as prescribed by the
+analysis plan (variables kept at p < 0.10).
+
+Starting from every candidate, each step fits all models with one variable
+dropped and removes the variable whose likelihood-ratio test has the largest
+p-value, until every remaining variable has p < ``threshold``.
+
+Sub-models are never refitted: fits are memoized by predictor subset, so the
+model chosen at one step is the current model of the next, and selections
+repeated on the same data (other thresholds, forced variables) reuse them.
+All candidate drops of a step are fitted at once - one batched
+``fit_batch`` call over the shared design with a column mask per model -
+each warm-started from its parent's coefficients.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from arbolib.logit import fit_batch
+
+
+class SubsetFits:
+    """Memoized logistic fits of column subsets of one design matrix."""
+    
+    def __init__(self, X, y):
+        self.names = list(X.columns)
+        self.X = X.to_numpy(dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.cache = {}
+        self.fitted = 0
+        self.hits = 0
+    
+    def fit(self, subsets, parent=None):
+        """Fit records (``params``, ``bse``, ``llf``, ``converged``) per subset.
+        
+        Subsets not seen before are fitted in one batch, warm-started from
+        the ``parent`` subset's coefficients when it has been fitted.
+        """
+        subsets = [frozenset(s) for s in subsets]
+        missing = list(dict.fromkeys(s for s in subsets if s not in self.cache))
+        self.hits += len(subsets) - len(missing)
+        
+        if missing:
+            mask = np.array([[name in s for name in self.names] for s in missing])
+            start = self.cache[parent]['params'] if parent in self.cache else None
+            batch = fit_batch(self.X, self.y, mask=mask, start=start)
+            for b, s in enumerate(missing):
+                self.cache[s] = {
+                    'params': batch.params[b],
+                    'bse': batch.bse[b],
+                    'llf': batch.llf[b],
+                    'converged': bool(batch.converged[b]),
+                }
+            self.fitted += len(missing)
+        
+        return [self.cache[s] for s in subsets]
+
+
+class StepwiseResult:
+    """Selected variables and the elimination log of a stepwise run."""
+    
+    def __init__(self, selected, steps, fits):
+        self.selected = selected
+        self.steps = steps
+        self.fits = fits
+    
+    def __repr__(self):
+        return f"StepwiseResult(selected={self.selected}, steps={len(self.steps)})"
+
+
+def backward_stepwise(X, y, candidates=None, threshold=0.10, keep=('const',), fits=None):
+    """Backward elimination by likelihood-ratio test.
+    
+    Parameters
+    ----------
+    X : DataFrame design matrix (with constant)
+    y : binary outcome
+    candidates : columns eligible for removal (default: all but ``keep``)
+    threshold : variables with LR p-value >= threshold are removed
+    keep : columns always in the model
+    fits : a ``SubsetFits`` on the same data to reuse (default: new one)
+    
+    ``steps`` has one row per step with the variable removed (or None at
+    the final step), its LR p-value and the number of models fitted and
+    found in the cache at that step.
+    """
+    fits = fits if fits is not None else SubsetFits(X, y)
+    keep = [c for c in keep if c in X.columns]
+    candidates = [c for c in (candidates or X.columns) if c in X.columns and c not in keep]
+    
+    current = frozenset(keep + candidates)
+    steps = []
+    while True:
+        fitted, hits = fits.fitted, fits.hits
+        order = [c for c in candidates if c in current]
+        full, *drops = fits.fit([current] + [current - {c} for c in order], parent=current)
+        
+        if not order:
+            steps.append({'removed': None, 'p': np.nan, 'llf': full['llf'],
+                          'fitted': fits.fitted - fitted, 'cached': fits.hits - hits})
+            break
+        
+        lr = np.maximum(2 * (full['llf'] - np.array([d['llf'] for d in drops])), 0.0)
+        pvalues = stats.chi2.sf(lr, 1)
+        worst = int(np.argmax(pvalues))
+        removed = order[worst] if pvalues[worst] >= threshold else None
+        steps.append({'removed': removed, 'p': pvalues[worst], 'llf': full['llf'],
+                      'fitted': fits.fitted - fitted, 'cached': fits.hits - hits})
+        
+        if removed is None:
+            break
+        current = current - {removed}
+    
+    selected = [c for c in candidates if c in current]
+    return StepwiseResult(selected, pd.DataFrame(steps), fits)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+store.py
+========
+Typed columnar store for processed datasets.
+
+Processed tables are written as Parquet files in ``data/processed/`` so
+categorical, date and integer dtypes survive between stages, and readers
+can load only the columns they need. CSV export is kept as an option for
+sharing the data outside the pipeline.
+
+Tables built from many raw files (``arbolib.ingest``) are stored as
+hive-partitioned Parquet directories (``write_partitions``), e.g.
+``NU_ANO=2023/SG_UF_NOT=Paraná/ID_AGRAVO=A92.0/``; ``load_partitions``
+and ``iter_partitions`` filter on the partition keys so only the matching
+directories are read.
+
+When several stages run in one interpreter (``run_all.py --mode
+inprocess``) the store can keep loaded tables in memory with
+``enable_cache()``, so each file is parsed once per pipeline run.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import glob
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATA_PROCESSED = '../data/processed/'
+
+# Dataset name -> file stem in the processed directory
+DATASETS = {
+    'rtpcr': 'rtpcr_processed',
+    'sinan': 'sinan_processed',
+    'sinan_counts': 'sinan_counts',
+    'sinan_keys': 'sinan_scanned_keys',
+    'merged': 'merged_analysis_dataset',
+    'rtpcr_clusters': 'rtpcr_with_clusters',
+    'descriptive_strata': 'descriptive_by_stratum',
+    'comparative_strata': 'comparative_by_stratum',
+    'hospitalization_strata': 'hospitalization_by_stratum',
+    'propensity_balance': 'propensity_balance',
+    'cluster_selection': 'cluster_selection',
+    'cluster_model': 'cluster_model',
+}
+
+# Loaded tables keyed by absolute path; None while caching is disabled
+_cache = None
+
+
+def enable_cache():
+    """Keep loaded datasets in memory for the rest of the process."""
+    global _cache
+    if _cache is None:
+        _cache = {}
+
+
+def disable_cache():
+    """Drop the in-memory datasets and stop caching."""
+    global _cache
+    _cache = None
+
+
+def dataset_path(name, fmt='parquet', data_dir=DATA_PROCESSED):
+    """Return the file path of a processed dataset."""
+    return os.path.join(data_dir, f'{DATASETS.get(name, name)}.{fmt}')
+
+
+def write_dataset(df, name, data_dir=DATA_PROCESSED, csv=False):
+    """Write a processed dataset to the store (and optionally to CSV)."""
+    path = dataset_path(name, 'parquet', data_dir)
+    df.to_parquet(path, index=False)
+    if _cache is not None:
+        _cache[os.path.abspath(path)] = df.reset_index(drop=True).copy()
+    if csv:
+        df.to_csv(dataset_path(name, 'csv', data_dir), index=False)
+
+
+def load_dataset(name, columns=None, data_dir=DATA_PROCESSED):
+    """Load a processed dataset, reading only ``columns`` if given.
+    
+    Requested columns absent from the dataset are skipped, matching the
+    ``if col in df.columns`` checks in the analysis scripts. Falls back to
+    the CSV export when no Parquet file exists.
+    
+    With the cache enabled, callers get a copy of the cached table, so
+    stages can add columns without affecting each other.
+    """
+    path = dataset_path(name, 'parquet', data_dir)
+    
+    if _cache is not None and os.path.exists(path):
+        key = os.path.abspath(path)
+        if key not in _cache:
+            _cache[key] = pd.read_parquet(path)
+        df = _cache[key]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.copy()
+    
+    if os.path.exists(path):
+        if columns is not None:
+            names = set(pq.read_schema(path).names)
+            columns = [c for c in columns if c in names]
+        return pd.read_parquet(path, columns=columns)
+    
+    path = dataset_path(name, 'csv', data_dir)
+    usecols = (lambda c: c in columns) if columns is not None else None
+    return pd.read_csv(path, usecols=usecols)
+
+
+def _uniform_schema(table):
+    """Schema of ``table`` with 32-bit dictionary indices, string
+    dictionaries for all-missing categorical columns (which pandas types as
+    double) and microsecond timestamps (an all-missing date column parses
+    as seconds), so tables written separately share one schema."""
+    fields = []
+    for f in table.schema:
+        if pa.types.is_timestamp(f.type):
+            f = pa.field(f.name, pa.timestamp('us', f.type.tz))
+        elif pa.types.is_dictionary(f.type):
+            values = f.type.value_type
+            if table.column(f.name).null_count == len(table):
+                values = pa.string()
+            f = pa.field(f.name, pa.dictionary(pa.int32(), values, f.type.ordered))
+        fields.append(f)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def write_partitions(df, root, partition_cols, basename):
+    """Write ``df`` into the hive-partitioned dataset at ``root``.
+    
+    Files are named ``<basename>-<i>.parquet`` in each partition directory;
+    existing files of that name are replaced, other files are left alone,
+    so several writers with distinct ``basename`` can fill one dataset.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.cast(_uniform_schema(table))
+    # Partition values are directory names: plain values, not dictionaries
+    keys = pa.schema([pa.field(c, table.schema.field(c).type.value_type)
+                      if pa.types.is_dictionary(table.schema.field(c).type)
+                      else table.schema.field(c) for c in partition_cols])
+    for key in keys:
+        table = table.set_column(table.schema.get_field_index(key.name), key,
+                                 table.column(key.name).cast(key.type))
+    ds.write_dataset(table, root, format='parquet',
+                     partitioning=ds.partitioning(keys, flavor='hive'),
+                     basename_template=f'{basename}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+
+
+def remove_partition_files(root, basename):
+    """Delete the files ``write_partitions`` wrote under ``basename``."""
+    for path in glob.glob(os.path.join(glob.escape(root), '**', f'{glob.escape(basename)}-*.parquet'),
+                          recursive=True):
+        os.remove(path)
+
+
+def _partitioned_dataset(root):
+    """The dataset at ``root`` with the union of its files' columns."""
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    dataset = ds.dataset(root, format='parquet', partitioning=partitioning)
+    schemas = [pq.read_schema(path).remove_metadata() for path in dataset.files]
+    if not schemas:
+        return dataset
+    schema = pa.unify_schemas(schemas + [dataset.partitioning.schema])
+    return ds.dataset(root, schema=schema, format='parquet', partitioning=partitioning)
+
+
+def _partition_filter(filters):
+    """Dataset expression of ``{column: value or list of values}``."""
+    expression = None
+    for column, values in (filters or {}).items():
+        if not isinstance(values, (list, tuple, set)):
+            values = [values]
+        term = pc.field(column).isin(list(values))
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def load_partitions(root, columns=None, filters=None):
+    """Load a partitioned dataset, reading only the partitions that match
+    ``filters`` (``{column: value or list}``) and only ``columns``.
+    
+    As ``load_dataset``, requested columns absent from the dataset are
+    skipped; a column missing from some files is null in their rows.
+    """
+    dataset = _partitioned_dataset(root)
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    return dataset.to_table(columns=columns, filter=_partition_filter(filters)).to_pandas()
+
+
+def iter_partitions(root, columns=None, filters=None, chunksize=100_000):
+    """Stream a partitioned dataset as DataFrames of at most ``chunksize``
+    rows (see ``load_partitions``)."""
+    dataset = _partitioned_dataset(root)
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, filter=_partition_filter(filters),
+                                    batch_size=chunksize):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+class DatasetWriter:
+    """Append DataFrame chunks to a processed dataset.
+    
+    The first chunk fixes the schema; later chunks are cast to it so that a
+    column that happens to be all-missing in one chunk keeps its type.
+    Categorical columns get 32-bit dictionary indices, so a later chunk may
+    hold more categories than the first.
+    
+    Usage:
+        with DatasetWriter('sinan') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+    
+    def __init__(self, name, data_dir=DATA_PROCESSED, csv=False):
+        self.path = dataset_path(name, 'parquet', data_dir)
+        self.csv_path = dataset_path(name, 'csv', data_dir) if csv else None
+        self.schema = None
+        self._writer = None
+        self.rows = 0
+    
+    def write(self, df):
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.schema = _uniform_schema(table)
+            table = table.cast(self.schema)
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema,
+                                         preserve_index=False)
+        self._writer.write_table(table)
+        
+        if self.csv_path:
+            df.to_csv(self.csv_path, mode='w' if self.rows == 0 else 'a',
+                      header=self.rows == 0, index=False)
+        self.rows += len(df)
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if _cache is not None:
+            _cache.pop(os.path.abspath(self.path), None)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+        return False
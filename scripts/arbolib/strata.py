@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+strata.py
+=========
+Stratified group-by engines for the descriptive, comparative and
+hospitalization stages.
+
+Each engine takes the merged analysis dataset and a list of strata keys
+(any of the SINAN geography/time fields in ``STRATA_KEYS``) and returns a
+tidy table with one row per stratum x subgroup (x symptom), computed in
+one pass with groupby aggregations and the batched tests of
+``arbolib.contingency`` - there is no Python-level loop over strata, so the
+same code runs for one city or for every municipality x epi-week.
+
+Rows whose strata keys are missing (e.g. RT-PCR cases, which carry no
+SINAN geography) are left out of stratified tables.
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import pandas as pd
+from statsmodels.stats.proportion import proportion_confint
+from arbolib.contingency import chi2_by_group, group_counts
+from arbolib.signatures import available
+
+# SINAN fields usable as strata
+STRATA_KEYS = ['ID_REGIONA', 'ID_MUNICIP', 'NU_ANO', 'SEM_PRI']
+
+
+def parse_strata(value):
+    """argparse type for ``--strata``: comma-separated STRATA_KEYS."""
+    keys = [k.strip() for k in value.split(',') if k.strip()]
+    unknown = [k for k in keys if k not in STRATA_KEYS]
+    if not keys or unknown:
+        raise argparse.ArgumentTypeError(
+            f"strata must be a comma-separated subset of {', '.join(STRATA_KEYS)}")
+    return keys
+
+
+def _merge_on(left, right, keys):
+    """Merge on ``keys``, or broadcast ``right`` when there are none."""
+    if keys:
+        return left.merge(right, on=keys, how='left')
+    return left.merge(right, how='cross')
+
+
+def descriptive_by_stratum(df, strata, group='subgroup', symptoms=()):
+    """Sample size, age, sex, age-group and symptom summaries per stratum.
+    
+    Returns one row per (strata..., group) with ``n``, age mean/SD/median/
+    quartiles, ``female_pct``, ``hospitalized_pct``, one ``<symptom>_pct``
+    column per symptom and one ``age_<group>_pct`` column per age group.
+    """
+    keys = list(strata) + [group]
+    symptoms = available(df, symptoms)
+    frame = df[keys + ['idade', 'hospitalized']].assign(
+        female=(df['sexo'] == 'F').astype(int))
+    grouped = frame.groupby(keys, observed=True)
+    
+    out = grouped['idade'].agg(['size', 'mean', 'std', 'median'])
+    out.columns = ['n', 'age_mean', 'age_std', 'age_median']
+    quartiles = grouped['idade'].quantile([0.25, 0.75]).unstack()
+    out['age_q1'] = quartiles[0.25]
+    out['age_q3'] = quartiles[0.75]
+    
+    pct = grouped[['female', 'hospitalized']].mean() * 100
+    if symptoms:
+        present, total = group_counts(df, group, symptoms, strata)
+        pct = pct.join(present / total * 100)
+    out = out.join(pct.add_suffix('_pct'))
+    
+    if 'age_group' in df.columns:
+        categories = df['age_group'].astype('category').cat.categories
+        counts = (df.groupby(keys + ['age_group'], observed=True).size()
+                  .unstack(fill_value=0).reindex(columns=categories, fill_value=0))
+        counts.columns = [f'age_{c}_pct' for c in categories]
+        out = out.join(counts.div(out['n'], axis=0) * 100)
+    
+    return out.reset_index()
+
+
+def rates_by_stratum(df, strata, group='subgroup', outcome='hospitalized'):
+    """Outcome rates with Wilson CIs per stratum and subgroup.
+    
+    Each row also carries the chi-square (or Fisher) test of the outcome
+    across the subgroups of its stratum.
+    """
+    strata = list(strata)
+    events, n = group_counts(df, group, [outcome], strata)
+    
+    out = pd.DataFrame({'n': n[outcome], 'events': events[outcome]})
+    out['rate'] = out['events'] / out['n'] * 100
+    ci_low, ci_high = proportion_confint(out['events'], out['n'], method='wilson')
+    out['ci_low'] = ci_low * 100
+    out['ci_high'] = ci_high * 100
+    
+    tests = chi2_by_group(df, group, [outcome], strata).reset_index()
+    tests = tests.drop(columns='symptom')
+    
+    return _merge_on(out.reset_index(), tests, strata)
+
+
+def symptoms_by_stratum(df, strata, symptoms, group='subgroup'):
+    """Symptom frequencies per stratum and subgroup, with tests.
+    
+    Long format: one row per (strata..., group, symptom) with ``n``,
+    ``count`` and ``pct``, plus the stratum's chi-square (or Fisher) test of
+    that symptom across subgroups.
+    """
+    strata = list(strata)
+    symptoms = available(df, symptoms)
+    present, total = group_counts(df, group, symptoms, strata)
+    present.columns.name = total.columns.name = 'symptom'
+    
+    out = pd.DataFrame({'n': total.stack(), 'count': present.stack()})
+    out['pct'] = out['count'] / out['n'] * 100
+    
+    tests = chi2_by_group(df, group, symptoms, strata).reset_index()
+    
+    return out.reset_index().merge(tests, on=strata + ['symptom'], how='left')
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_chi2.py
+=============
+Benchmark the batched group x symptom chi-square routine against the
+per-stratum, per-symptom crosstab + chi2_contingency loop it replaced.
+
+The synthetic frame has three notification subgroups and seven symptoms
+spread over municipality x epidemiological-week strata, so most strata hold
+only a few dozen notifications.
+
+Usage:
+    python bench_chi2.py [--rows 50000] [--strata 500]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib.contingency import chi2_by_group
+
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'EXANTEMA', 'NAUSEA', 'VOMITO']
+GROUPS = ['RT-PCR Confirmed', 'SINAN Laboratory', 'SINAN Clinical-Epidemiological']
+
+
+def synthetic_frame(n_rows, n_strata, seed=42):
+    """Random subgroups, symptoms and municipality x week strata."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'stratum': rng.integers(0, n_strata, n_rows),
+        'subgroup': rng.choice(GROUPS, n_rows, p=[0.05, 0.25, 0.70]),
+    })
+    for i, symptom in enumerate(SYMPTOMS):
+        df[symptom] = (rng.random(n_rows) < 0.1 + 0.1 * i).astype(int)
+    return df
+
+
+def loop_tests(df):
+    """Previous per-table implementation (reference)."""
+    rows = []
+    for stratum, data in df.groupby('stratum'):
+        for symptom in SYMPTOMS:
+            table = pd.crosstab(data['subgroup'], data[symptom])
+            chi2, p, dof, expected = stats.chi2_contingency(table)
+            if dof == 1 and expected.min() < 5:
+                p = stats.fisher_exact(table)[1]
+            rows.append(p)
+    return np.array(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--strata', type=int, default=500)
+    args = parser.parse_args()
+    
+    df = synthetic_frame(args.rows, args.strata)
+    print(f"Rows: {args.rows:,}, strata: {args.strata:,}, tables: {args.strata * len(SYMPTOMS):,}")
+    
+    start = time.perf_counter()
+    expected = loop_tests(df)
+    t_loop = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    result = chi2_by_group(df, 'subgroup', SYMPTOMS, strata=['stratum'])
+    t_batch = time.perf_counter() - start
+    
+    assert np.allclose(result['p'].to_numpy(), expected), "p-values differ"
+    
+    print(f"  crosstab loop:   {t_loop:8.3f}s")
+    print(f"  chi2_by_group:   {t_batch:8.3f}s")
+    print(f"  Speed-up:        {t_loop / t_batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
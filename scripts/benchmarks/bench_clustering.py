@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_clustering.py
+===================
+Benchmark Ward clustering over collapsed symptom patterns against scipy's
+linkage on the full standardized matrix.
+
+The full linkage needs O(n^2) memory, so it is timed on a sample; the
+collapsed version is timed on the same sample and then at full scale.
+
+Usage:
+    python bench_clustering.py [--rows 1000000] [--sample 10000]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, linkage
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib.clustering import minibatch_clusters, ward_clusters
+
+# Prevalences of FEBRE, MIALGIA, CEFALEIA, ARTRALGIA, EXANTEMA, NAUSEA, VOMITO
+PREVALENCE = [0.85, 0.62, 0.58, 0.71, 0.12, 0.27, 0.18]
+
+
+def synthetic_symptoms(n_rows, seed=42):
+    """Independent binary symptoms with realistic prevalences."""
+    rng = np.random.default_rng(seed)
+    return (rng.random((n_rows, len(PREVALENCE))) < PREVALENCE).astype(np.int8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sample', type=int, default=10_000)
+    args = parser.parse_args()
+    
+    X = synthetic_symptoms(args.sample)
+    print(f"Sample: {args.sample:,} cases")
+    
+    start = time.perf_counter()
+    expected = fcluster(linkage(StandardScaler().fit_transform(X), 'ward'), 3, 'maxclust')
+    t_full = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    labels = ward_clusters(X, 3)
+    t_collapsed = time.perf_counter() - start
+    
+    assert (labels == expected).all(), "cluster labels differ"
+    
+    print(f"  scipy linkage:   {t_full:8.3f}s")
+    print(f"  ward_clusters:   {t_collapsed:8.3f}s")
+    print(f"  Speed-up:        {t_full / t_collapsed:8.1f}x")
+    
+    X = synthetic_symptoms(args.rows)
+    print(f"\nFull scale: {args.rows:,} cases")
+    
+    for name, func in [('ward_clusters', ward_clusters), ('minibatch_clusters', minibatch_clusters)]:
+        start = time.perf_counter()
+        labels = func(X, 3)
+        elapsed = time.perf_counter() - start
+        print(f"  {name + ':':<20} {elapsed:6.3f}s  (cluster sizes {np.bincount(labels)[1:].tolist()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_dbc.py
+============
+Benchmark reading a SINAN extract from a DATASUS .dbc file against reading
+the same records from the semicolon CSV export.
+
+A synthetic SINAN-like table (DATASUS codes, YYYYMMDD dates, 1/2 flags)
+is written as a .dbc file - DBF records compressed with a small implode
+encoder that copies each byte run repeated from the previous record - as
+the uncompressed .dbf, and as the labelled CSV that microdatasus would
+export. The three are read with the typed SINAN schema and must give the
+same frame.
+
+Usage:
+    python bench_dbc.py [--rows 200000] [--keep DIR]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib import dbc
+from arbolib.sinan import FLAG_COLUMNS, SINAN_LABELS, read_sinan_csv, read_sinan_dbc
+
+# (name, width) of the character fields; DT_* fields are DBF dates
+FIELDS = [('TP_NOT', 1), ('ID_AGRAVO', 4), ('DT_NOTIFIC', 8), ('SEM_NOT', 6),
+          ('NU_ANO', 4), ('SG_UF_NOT', 2), ('ID_MUNICIP', 6), ('ID_REGIONA', 4),
+          ('ID_UNIDADE', 7), ('DT_SIN_PRI', 8), ('SEM_PRI', 6), ('NU_IDADE_N', 4),
+          ('CS_SEXO', 1), ('CS_GESTANT', 1), ('CS_RACA', 1), ('FEBRE', 1),
+          ('MIALGIA', 1), ('CEFALEIA', 1), ('EXANTEMA', 1), ('VOMITO', 1),
+          ('NAUSEA', 1), ('ARTRALGIA', 1), ('HOSPITALIZ', 1), ('CLASSI_FIN', 2),
+          ('CRITERIO', 1), ('EVOLUCAO', 1), ('DT_ENCERRA', 8)]
+FLAGS = {'1': 'Sim', '2': 'Não', '9': 'Ignorado'}
+
+
+def synthetic_codes(n_rows, seed=42):
+    """SINAN-like records as DATASUS code strings, with the fields used
+    by ``01_data_preprocessing.py``."""
+    rng = np.random.default_rng(seed)
+    notified = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), 'D')
+    onset = notified - pd.to_timedelta(rng.integers(0, 10, n_rows), 'D')
+    closed = notified + pd.to_timedelta(rng.integers(0, 60, n_rows), 'D')
+    closed = pd.Series(closed.strftime('%Y%m%d')).where(rng.random(n_rows) < 0.9, '')
+    df = pd.DataFrame({
+        'TP_NOT': '2',
+        'ID_AGRAVO': 'A920',
+        'DT_NOTIFIC': notified.strftime('%Y%m%d'),
+        'SEM_NOT': (2023 * 100 + notified.isocalendar().week.to_numpy()).astype(str),
+        'NU_ANO': '2023',
+        'SG_UF_NOT': rng.choice(['41', '35', '31', '29'], n_rows),
+        'ID_MUNICIP': rng.choice(['410830', '355030', '310620', '292740'], n_rows),
+        'ID_REGIONA': rng.choice(['1363', '1331', '1450', '1386'], n_rows),
+        'ID_UNIDADE': rng.integers(2_000_000, 2_000_400, n_rows).astype(str),
+        'DT_SIN_PRI': onset.strftime('%Y%m%d'),
+        'SEM_PRI': (2023 * 100 + onset.isocalendar().week.to_numpy()).astype(str),
+        'NU_IDADE_N': (4000 + rng.integers(0, 90, n_rows)).astype(str),
+        'CS_SEXO': rng.choice(['M', 'F', 'I'], n_rows, p=[0.45, 0.54, 0.01]),
+        'CS_GESTANT': rng.choice(['5', '6', '9'], n_rows),
+        'CS_RACA': rng.choice(['1', '2', '4', '9'], n_rows),
+        'HOSPITALIZ': rng.choice(['1', '2', ''], n_rows, p=[0.05, 0.8, 0.15]),
+        'CLASSI_FIN': rng.choice(['13', '5', '8'], n_rows, p=[0.6, 0.35, 0.05]),
+        'CRITERIO': rng.choice(['1', '2', '3'], n_rows),
+        'EVOLUCAO': rng.choice(['1', '9', ''], n_rows, p=[0.8, 0.1, 0.1]),
+        'DT_ENCERRA': closed,
+    })
+    for name in ['FEBRE', 'MIALGIA', 'CEFALEIA', 'EXANTEMA', 'VOMITO', 'NAUSEA', 'ARTRALGIA']:
+        df[name] = rng.choice(['1', '2'], n_rows, p=[0.6, 0.4])
+    return df[[name for name, _ in FIELDS]]
+
+
+def labelled(codes):
+    """The CSV export of ``codes``: labels, ISO dates and Sim/Não flags."""
+    df = codes.copy()
+    for name in df.columns:
+        if name.startswith('DT_'):
+            df[name] = pd.to_datetime(df[name], format='%Y%m%d',
+                                      errors='coerce').dt.strftime('%Y-%m-%d')
+        elif name in SINAN_LABELS:
+            df[name] = df[name].map(lambda c, labels=SINAN_LABELS[name]: labels.get(c, c))
+        elif name in FLAG_COLUMNS:
+            df[name] = df[name].map(lambda c: FLAGS.get(c, c))
+    return df.replace('', np.nan)
+
+
+def dbf_bytes(codes):
+    """DBF header and record bytes of ``codes`` (no end-of-file marker)."""
+    record_length = 1 + sum(width for _, width in FIELDS)
+    header_length = 32 * (len(FIELDS) + 1) + 1
+    header = bytearray(32)
+    header[0] = 0x03
+    header[4:8] = len(codes).to_bytes(4, 'little')
+    header[8:10] = header_length.to_bytes(2, 'little')
+    header[10:12] = record_length.to_bytes(2, 'little')
+    for name, width in FIELDS:
+        descriptor = bytearray(32)
+        descriptor[:len(name)] = name.encode('ascii')
+        descriptor[11] = ord('D' if name.startswith('DT_') else 'C')
+        descriptor[16] = width
+        header += descriptor
+    header.append(0x0D)
+    
+    columns = [np.char.ljust(codes[name].to_numpy(dtype=str), width).astype(f'S{width}')
+               for name, width in FIELDS]
+    records = np.rec.fromarrays([np.full(len(codes), b' ', dtype='S1')] + columns)
+    return bytes(header), records.tobytes()
+
+
+class BitWriter:
+    """Bits packed least significant first, as an implode stream reads them."""
+    
+    def __init__(self):
+        self.out = bytearray()
+        self.buf = 0
+        self.count = 0
+    
+    def write(self, value, nbits):
+        self.buf |= value << self.count
+        self.count += nbits
+        while self.count >= 8:
+            self.out.append(self.buf & 0xFF)
+            self.buf >>= 8
+            self.count -= 8
+    
+    def code(self, code, length):
+        """A Huffman code: inverted, most significant bit first."""
+        for i in range(length - 1, -1, -1):
+            self.write(((code >> i) & 1) ^ 1, 1)
+    
+    def getvalue(self):
+        return bytes(self.out) + (bytes([self.buf]) if self.count else b'')
+
+
+def implode(data, distance):
+    """Implode ``data`` (binary literals, 4 kB dictionary), copying every
+    run of at least 3 bytes equal to the bytes ``distance`` back."""
+    length_codes = dbc.canonical_codes(dbc.code_lengths(dbc.LENGTH_LENGTHS))
+    dist_codes = dbc.canonical_codes(dbc.code_lengths(dbc.DISTANCE_LENGTHS))
+    dict_bits = 6
+    
+    def copy(length):
+        symbol = next(s for s in range(15, -1, -1)
+                      if dbc.LENGTH_BASE[s] <= length and s != 1)
+        writer.write(1, 1)
+        writer.code(*length_codes[symbol])
+        writer.write(length - dbc.LENGTH_BASE[symbol], dbc.LENGTH_EXTRA[symbol])
+    
+    writer = BitWriter()
+    writer.write(0, 8)
+    writer.write(dict_bits, 8)
+    
+    buf = np.frombuffer(data, dtype=np.uint8)
+    same = np.zeros(len(buf), dtype=bool)
+    same[distance:] = buf[distance:] == buf[:-distance]
+    # Runs of bytes equal (or not) to the previous record
+    edges = np.flatnonzero(np.diff(same.astype(np.int8))) + 1
+    starts = np.concatenate([[0], edges])
+    ends = np.concatenate([edges, [len(buf)]])
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if same[start] and end - start >= 3:
+            while start < end:
+                n = min(end - start, 518)
+                if end - start - n in (1, 2):
+                    n -= 3
+                copy(n)
+                writer.code(*dist_codes[(distance - 1) >> dict_bits])
+                writer.write((distance - 1) & ((1 << dict_bits) - 1), dict_bits)
+                start += n
+        else:
+            for byte in data[start:end]:
+                writer.write(byte << 1, 9)
+    copy(dbc.END_OF_STREAM)
+    return writer.getvalue()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def comparable(df):
+    """``df`` with categories as plain values (category order is reader-specific)."""
+    return df.apply(lambda c: c.astype(object) if isinstance(c.dtype, pd.CategoricalDtype) else c)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--keep', default=None,
+                        help="write the test files to this directory and keep them")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = args.keep or tmp
+        os.makedirs(out_dir, exist_ok=True)
+        codes = synthetic_codes(args.rows)
+        header, records = dbf_bytes(codes)
+        stream = implode(records, 1 + sum(width for _, width in FIELDS))
+        paths = {ext: os.path.join(out_dir, f'CHIKBR23.{ext}') for ext in ('dbc', 'dbf', 'csv')}
+        with open(paths['dbc'], 'wb') as f:
+            f.write(header + bytes(4) + stream)
+        with open(paths['dbf'], 'wb') as f:
+            f.write(header + records + b'\x1a')
+        labelled(codes).to_csv(paths['csv'], sep=';', index=False)
+        sizes = {ext: os.path.getsize(path) / 1e6 for ext, path in paths.items()}
+        print(f"Rows: {args.rows:,}, fields: {len(FIELDS)}")
+        print(f"  Files: csv {sizes['csv']:.1f} MB, dbf {sizes['dbf']:.1f} MB, "
+              f"dbc {sizes['dbc']:.1f} MB")
+        
+        csv_df, t_csv = timed(read_sinan_csv, paths['csv'])
+        dbf_df, t_dbf = timed(read_sinan_dbc, paths['dbf'])
+        dbc_df, t_dbc = timed(read_sinan_dbc, paths['dbc'])
+        _, t_blast = timed(dbc.blast, stream)
+        assert comparable(dbc_df).equals(comparable(csv_df)), "dbc and csv frames differ"
+        assert comparable(dbf_df).equals(comparable(csv_df)), "dbf and csv frames differ"
+        
+        print(f"  {'csv:':<6} {t_csv:8.3f}s")
+        print(f"  {'dbf:':<6} {t_dbf:8.3f}s ({t_csv / t_dbf:6.1f}x)")
+        print(f"  {'dbc:':<6} {t_dbc:8.3f}s ({t_csv / t_dbc:6.1f}x), "
+              f"decompression {len(records) / 1e6 / t_blast:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_diagnosis.py
+==================
+Benchmark the vectorized diagnosis categorizer against the row-wise apply
+it replaced, on a synthetic HIPOTESE_DIAGNOSTICA column.
+
+The synthetic column resamples the hypotheses observed in the RT-PCR
+dataset (plus missing values), so the distribution of distinct strings is
+realistic.
+
+Usage:
+    python bench_diagnosis.py [--rows 1000000]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib.diagnosis import categorize_diagnoses
+
+DATA_RAW = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'raw')
+
+
+def categorize_diagnosis(dx):
+    """Previous per-row implementation (reference)."""
+    if pd.isna(dx):
+        return 'Other'
+    dx = str(dx).upper()
+    if 'CHIKUNGUNYA' in dx and 'DENGUE' not in dx:
+        return 'Chikungunya only'
+    elif 'DENGUE' in dx and 'CHIKUNGUNYA' not in dx:
+        return 'Dengue only'
+    elif 'DENGUE' in dx and 'CHIKUNGUNYA' in dx:
+        return 'Dengue or Chikungunya'
+    elif 'DENGUE OU CHIK' in dx:
+        return 'Dengue or Chikungunya'
+    else:
+        return 'Other'
+
+
+def synthetic_hypotheses(n_rows, seed=42):
+    """Resample observed hypotheses (with 1% missing) to n_rows."""
+    observed = pd.read_csv(os.path.join(DATA_RAW, 'RTPCR_chikungunya_anonymized.csv'),
+                           sep=';')['HIPOTESE_DIAGNOSTICA']
+    pool = np.append(observed.to_numpy(dtype=object), [np.nan, 'dengue ou chik'])
+    rng = np.random.default_rng(seed)
+    values = pool[rng.integers(0, len(pool), n_rows)]
+    values[rng.random(n_rows) < 0.01] = np.nan
+    return pd.Series(values, name='HIPOTESE_DIAGNOSTICA')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    
+    hypotheses = synthetic_hypotheses(args.rows)
+    print(f"Rows: {args.rows:,} ({hypotheses.nunique()} distinct hypotheses)")
+    
+    start = time.perf_counter()
+    expected = hypotheses.apply(categorize_diagnosis)
+    t_apply = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    result = categorize_diagnoses(hypotheses)
+    t_vector = time.perf_counter() - start
+    
+    assert (result.astype(str) == expected).all(), "categories differ"
+    
+    print(f"  Series.apply:          {t_apply:8.3f}s")
+    print(f"  categorize_diagnoses:  {t_vector:8.3f}s")
+    print(f"  Speed-up:              {t_apply / t_vector:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_matching.py
+=================
+Benchmark KD-tree propensity-score matching against naive all-pairs matching.
+
+Naive matching compares every treated case with every control (O(n^2)), so
+it is timed on a subsample; the KD-tree is timed on the same subsample and
+then at full scale (by default 500k tested against 1M untested records).
+
+Usage:
+    python bench_matching.py [--treated 500000] [--controls 1000000] [--naive 5000]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.special import expit, logit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib.propensity import CALIPER_SD, match_nearest
+
+
+def synthetic_scores(n_treated, n_controls, seed=42):
+    """Propensity scores with the treated shifted towards higher values."""
+    rng = np.random.default_rng(seed)
+    score = expit(np.concatenate([rng.normal(0.3, 1.0, n_treated),
+                                  rng.normal(-0.3, 1.0, n_controls)]))
+    treated = np.arange(n_treated + n_controls) < n_treated
+    return score, treated
+
+
+def naive_match(score, treated):
+    """Nearest control of every treated case by full distance matrix (reference)."""
+    points = logit(score)
+    radius = CALIPER_SD * points.std()
+    dist = np.abs(points[treated][:, None] - points[~treated][None, :])
+    nearest = dist.min(axis=1)
+    return nearest[nearest <= radius]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--treated', type=int, default=500_000)
+    parser.add_argument('--controls', type=int, default=1_000_000)
+    parser.add_argument('--naive', type=int, default=5_000,
+                        help="treated cases in the naive subsample (2x as many controls)")
+    args = parser.parse_args()
+    
+    score, treated = synthetic_scores(args.naive, 2 * args.naive)
+    print(f"Subsample: {args.naive:,} treated x {2 * args.naive:,} controls")
+    
+    start = time.perf_counter()
+    expected = naive_match(score, treated)
+    t_naive = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    pairs = match_nearest(score, treated)
+    t_tree = time.perf_counter() - start
+    
+    assert len(pairs) == len(expected), "matched counts differ"
+    assert np.allclose(pairs['distance'].to_numpy(), expected, atol=1e-5), "distances differ"
+    
+    print(f"  all-pairs:       {t_naive:8.3f}s")
+    print(f"  match_nearest:   {t_tree:8.3f}s")
+    print(f"  Speed-up:        {t_naive / t_tree:8.1f}x")
+    
+    score, treated = synthetic_scores(args.treated, args.controls)
+    print(f"\nFull scale: {args.treated:,} treated x {args.controls:,} controls")
+    
+    for k in (1, 3):
+        start = time.perf_counter()
+        pairs = match_nearest(score, treated, k=k)
+        elapsed = time.perf_counter() - start
+        print(f"  1:{k} match_nearest: {elapsed:6.3f}s  ({pairs['treated'].nunique():,} matched)")
+
+
+if __name__ == "__main__":
+    main()
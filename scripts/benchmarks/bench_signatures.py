@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_signatures.py
+===================
+Benchmark symptom tables computed from the packed uint16 signature against
+the same tables computed from the 0/1 symptom columns.
+
+Three operations on a synthetic SINAN-sized frame of seven symptoms over
+municipality x epidemiological-week strata: symptom counts per
+stratum x subgroup, distinct-pattern collapse (the first step of
+clustering) and symptom counts per patient.
+
+Usage:
+    python bench_signatures.py [--rows 1000000] [--strata 5000]
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from arbolib import signatures
+from arbolib.clustering import collapse_patterns
+from arbolib.contingency import group_counts
+
+SYMPTOMS = ['FEBRE', 'MIALGIA', 'CEFALEIA', 'ARTRALGIA', 'EXANTEMA', 'NAUSEA', 'VOMITO']
+GROUPS = ['RT-PCR Confirmed', 'SINAN Laboratory', 'SINAN Clinical-Epidemiological']
+
+
+def synthetic_frame(n_rows, n_strata, seed=42):
+    """Random subgroups, symptoms and municipality x week strata."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'stratum': rng.integers(0, n_strata, n_rows),
+        'subgroup': rng.choice(GROUPS, n_rows, p=[0.05, 0.25, 0.70]),
+    })
+    for i, symptom in enumerate(SYMPTOMS):
+        df[symptom] = (rng.random(n_rows) < 0.1 + 0.1 * i).astype(int)
+    return df
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[3])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--strata', type=int, default=5_000)
+    args = parser.parse_args()
+    
+    df = synthetic_frame(args.rows, args.strata)
+    packed = df[['stratum', 'subgroup']].assign(
+        **{signatures.SIGNATURE: signatures.pack(df, SYMPTOMS)})
+    print(f"Rows: {args.rows:,}, strata: {args.strata:,}, symptoms: {len(SYMPTOMS)}")
+    print(f"  Memory: {df[SYMPTOMS].memory_usage(index=False).sum() / args.rows:.0f} bytes/row "
+          f"as columns, {packed[signatures.SIGNATURE].nbytes / args.rows:.0f} as signature")
+    
+    (p1, n1), t_cols = timed(group_counts, df, 'subgroup', SYMPTOMS, ['stratum'])
+    (p2, n2), t_sig = timed(group_counts, packed, 'subgroup', SYMPTOMS, ['stratum'])
+    assert p1.equals(p2) and n1.equals(n2), "group counts differ"
+    
+    X = df[SYMPTOMS].to_numpy(dtype=float)
+    expected, t_collapse = timed(collapse_patterns, X)
+    result, t_collapse_sig = timed(signatures.collapse, packed[signatures.SIGNATURE], SYMPTOMS)
+    assert all(np.array_equal(a, b) for a, b in zip(expected, result)), "patterns differ"
+    
+    counts, t_sum = timed(lambda: df[SYMPTOMS].sum(axis=1).to_numpy())
+    popcount, t_pop = timed(signatures.popcount, packed[signatures.SIGNATURE])
+    assert np.array_equal(counts, popcount), "symptom counts differ"
+    
+    for name, t_ref, t_new in [('group counts', t_cols, t_sig),
+                               ('pattern collapse', t_collapse, t_collapse_sig),
+                               ('symptom count', t_sum, t_pop)]:
+        print(f"  {name + ':':<18} columns {t_ref:8.3f}s, signature {t_new:8.3f}s "
+              f"({t_ref / t_new:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
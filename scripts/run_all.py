@@ -15,15 +15,42 @@ This script runs all analysis scripts in sequence:
 7. Selection bias analysis
 8. Generate figures
 9. Validate results
+10. Cluster-count selection
+
+Stages run either as separate interpreters (``--mode subprocess``, the
+default, for isolation) or as functions in this interpreter (``--mode
+inprocess``), where the analysis libraries are imported once and the
+processed datasets are loaded once and shared through the store cache.
+``--compare`` runs both modes and reports the time saved.
+
+Each stage declares the files it reads and writes (``STAGES``); the
+dependency graph follows from those declarations. With ``--jobs N`` stages
+whose inputs are ready run concurrently on a pool of N worker processes,
+and their output is printed as each one finishes. ``--on-error`` chooses
+between stopping at the first failure (``fail-fast``) and running every
+stage whose dependencies succeeded (``continue``, the default).
+
+Stages are skipped when nothing they depend on has changed since their last
+successful run: raw/processed input hashes, script and ``arbolib`` source
+hashes and stage arguments are compared with the fingerprint stored in
+``data/processed/.pipeline_cache/``, and the recorded output is replayed.
+``--force`` reruns everything.
 
 Author: Welisson G.N. Costa
 Date: January 2025
 """
 
+import argparse
+import contextlib
+import importlib
+import io
 import subprocess
 import sys
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
+from arbolib.buildcache import BuildCache, stage_fingerprint
 
 # Script execution order
 SCRIPTS = [
@@ -35,15 +62,71 @@ SCRIPTS = [
     '06_cluster_analysis.py',
     '07_selection_bias_analysis.py',
     '08_generate_figures.py',
-    '09_validate_results.py'
+    '09_validate_results.py',
+    '10_cluster_selection.py'
 ]
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'processed', '.pipeline_cache')
+
+RAW = ['data/raw/RTPCR_chikungunya_anonymized.csv',
+       'data/raw/SINAN_chikungunya_2023.csv']
+RTPCR = 'data/processed/rtpcr_processed.parquet'
+SINAN = 'data/processed/sinan_processed.parquet'
+SINAN_COUNTS = 'data/processed/sinan_counts.parquet'
+SINAN_WATERMARK = 'data/processed/sinan_watermark.json'
+SINAN_KEYS = 'data/processed/sinan_scanned_keys.parquet'
+MERGED = 'data/processed/merged_analysis_dataset.parquet'
+CLUSTERS = 'data/processed/rtpcr_with_clusters.parquet'
+CLUSTER_MODEL = 'data/processed/cluster_model.json'
+BALANCE = 'data/processed/propensity_balance.csv'
+SELECTION = 'data/processed/cluster_selection.csv'
+FIGURES = [f'figures/{name}.{ext}'
+           for name in ['Figura1_Hipoteses_Diagnosticas',
+                        'Figura2_ForestPlot_Acuracia',
+                        'Figura3_Comparacao_Sintomas',
+                        'Figura4_Hospitalizacao',
+                        'Figura5_Fatores_Risco_Hospitalizacao',
+                        'Figura6_Clusters_Sintomaticos',
+                        'Figura7_Vies_Selecao']
+           for ext in ['png', 'pdf']]
+FIGURE_MANIFEST = 'figures/manifest.json'
+
+# Files read and written by each stage (relative to the project root);
+# an optional 'args' list is passed on the stage's command line
+STAGES = {
+    '01_data_preprocessing.py': {'inputs': RAW,
+                                 'outputs': [RTPCR, SINAN, MERGED, SINAN_COUNTS,
+                                             SINAN_WATERMARK, SINAN_KEYS]},
+    '02_descriptive_analysis.py': {'inputs': [RTPCR, SINAN], 'outputs': []},
+    '03_diagnostic_accuracy.py': {'inputs': [RTPCR], 'outputs': []},
+    '04_comparative_analysis.py': {'inputs': [MERGED], 'outputs': []},
+    '05_hospitalization_analysis.py': {'inputs': [MERGED, RTPCR], 'outputs': []},
+    '06_cluster_analysis.py': {'inputs': [RTPCR], 'outputs': [CLUSTERS, CLUSTER_MODEL]},
+    '07_selection_bias_analysis.py': {'inputs': [SINAN], 'outputs': [BALANCE]},
+    '08_generate_figures.py': {'inputs': [RTPCR, SINAN, MERGED, CLUSTERS, CLUSTER_MODEL],
+                               'outputs': FIGURES + [FIGURE_MANIFEST]},
+    '09_validate_results.py': {'inputs': [RTPCR, SINAN, MERGED], 'outputs': []},
+    '10_cluster_selection.py': {'inputs': [RTPCR], 'outputs': [SELECTION]},
+}
 
 
-def run_script(script_name):
-    """Run a single analysis script."""
+def stage_dependencies():
+    """Map each stage to the stages producing its inputs."""
+    producer = {out: script for script in SCRIPTS
+                for out in STAGES[script]['outputs']}
+    return {script: sorted({producer[f] for f in STAGES[script]['inputs']
+                            if f in producer})
+            for script in SCRIPTS}
+
+
+def run_script(script_name, args=()):
+    """Run a single analysis script in a separate interpreter.
+    
+    The child's output is relayed line by line through ``print`` so it can
+    be captured along with the rest of the stage log.
+    """
     script_path = os.path.join(SCRIPT_DIR, script_name)
     
     if not os.path.exists(script_path):
@@ -56,48 +139,295 @@ def run_script(script_name):
     
     try:
         # Change to script directory to ensure relative paths work
-        result = subprocess.run(
-            [sys.executable, script_path],
+        proc = subprocess.Popen(
+            [sys.executable, script_path, *args],
             cwd=SCRIPT_DIR,
-            capture_output=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            check=True
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'}
         )
+        for line in proc.stdout:
+            print(line, end='')
+        returncode = proc.wait()
+        if returncode:
+            print(f"\n✗ ERROR: {script_name} failed with exit code {returncode}")
+            return False
         print(f"\n✓ {script_name} completed successfully")
         return True
-    except subprocess.CalledProcessError as e:
-        print(f"\n✗ ERROR: {script_name} failed with exit code {e.returncode}")
+    except Exception as e:
+        print(f"\n✗ ERROR: Unexpected error running {script_name}: {e}")
+        return False
+
+
+def run_stage(script_name, args=()):
+    """Run a single analysis script's main() in this interpreter.
+    
+    The stage sees the same working directory and argv as when launched
+    as a script. Processed datasets come from the shared store cache.
+    """
+    script_path = os.path.join(SCRIPT_DIR, script_name)
+    
+    if not os.path.exists(script_path):
+        print(f"✗ ERROR: Script not found: {script_path}")
         return False
+    
+    print(f"\n{'='*70}")
+    print(f"Running: {script_name}")
+    print(f"{'='*70}")
+    
+    saved_argv, saved_cwd = sys.argv, os.getcwd()
+    sys.argv = [script_path, *args]
+    try:
+        os.chdir(SCRIPT_DIR)
+        module = importlib.import_module(os.path.splitext(script_name)[0])
+        exit_code = module.main()
+        if exit_code:
+            print(f"\n✗ ERROR: {script_name} failed with exit code {exit_code}")
+            return False
+        print(f"\n✓ {script_name} completed successfully")
+        return True
+    except SystemExit as e:
+        if e.code:
+            print(f"\n✗ ERROR: {script_name} failed with exit code {e.code}")
+            return False
+        print(f"\n✓ {script_name} completed successfully")
+        return True
     except Exception as e:
+        import traceback
+        traceback.print_exc()
         print(f"\n✗ ERROR: Unexpected error running {script_name}: {e}")
         return False
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+
+
+class _Tee(io.TextIOBase):
+    """Write to a stream while keeping a copy of the text."""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = io.StringIO()
+    
+    def write(self, text):
+        self.stream.write(text)
+        return self.buffer.write(text)
+    
+    def flush(self):
+        self.stream.flush()
+
+
+def execute(script, mode):
+    """Run one stage with its configured arguments; return success."""
+    args = STAGES[script].get('args', [])
+    if mode == 'inprocess':
+        return run_stage(script, args)
+    return run_script(script, args)
+
+
+def _init_worker(mode):
+    """Pool initializer: share loaded datasets between a worker's stages."""
+    if mode == 'inprocess':
+        from arbolib import store
+        store.enable_cache()
+
+
+def _run_captured(script, mode):
+    """Run one stage in a pool worker; return (success, seconds, log)."""
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        success = execute(script, mode)
+    return success, time.perf_counter() - start, log.getvalue()
+
+
+def _run_live(script, mode):
+    """Run one stage with live output; return (success, seconds, log)."""
+    tee_out, tee_err = _Tee(sys.stdout), _Tee(sys.stderr)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(tee_out), contextlib.redirect_stderr(tee_err):
+        success = execute(script, mode)
+    return (success, time.perf_counter() - start,
+            tee_out.buffer.getvalue() + tee_err.buffer.getvalue())
+
+
+def run_pipeline(mode, jobs=1, on_error='continue', cache=None):
+    """Run the stage graph.
+    
+    A stage starts once every stage producing its inputs has succeeded.
+    Stages whose dependencies failed are skipped (success is None), and
+    with ``on_error='fail-fast'`` nothing new starts after a failure.
+    With ``jobs`` > 1 ready stages run concurrently in worker processes.
+    
+    With a ``BuildCache``, a stage whose fingerprint and outputs are
+    unchanged since its last successful run is not executed; its recorded
+    log is replayed instead.
+    
+    Returns ({script: (success, seconds)}, wall time, set of cache hits).
+    """
+    deps = stage_dependencies()
+    pending = list(SCRIPTS)
+    results = {}
+    running = {}
+    fingerprints = {}
+    hits = set()
+    stop = False
+    
+    def take_ready(limit=None):
+        ready = []
+        for script in list(pending):
+            if any(d not in results for d in deps[script]):
+                continue
+            if limit is not None and len(ready) >= limit:
+                break
+            pending.remove(script)
+            if stop:
+                results[script] = (None, 0.0)
+            elif not all(results[d][0] for d in deps[script]):
+                print(f"\n⚠ SKIPPED: {script} (dependency failed)")
+                results[script] = (None, 0.0)
+            elif cache is not None and cache_hit(script):
+                continue
+            else:
+                ready.append(script)
+        return ready
+    
+    def cache_hit(script):
+        stage = STAGES[script]
+        fingerprints[script] = stage_fingerprint(
+            PROJECT_ROOT, os.path.join('scripts', script), stage['inputs'],
+            {'args': stage.get('args', [])})
+        if not cache.is_fresh(script, fingerprints[script], stage['outputs']):
+            return False
+        print(f"\n✓ {script}: inputs unchanged, replaying cached output")
+        print(cache.log(script), end='')
+        results[script] = (True, 0.0)
+        hits.add(script)
+        return True
+    
+    def record(script, success, seconds, log):
+        nonlocal stop
+        results[script] = (success, seconds)
+        if cache is not None:
+            if success:
+                cache.record(script, fingerprints[script],
+                             STAGES[script]['outputs'], log)
+            else:
+                cache.invalidate(script)
+        if not success:
+            if on_error == 'fail-fast':
+                stop = True
+                print(f"\n✗ {script} failed. Stopping (fail-fast).")
+            else:
+                print(f"\n⚠ WARNING: {script} failed. Continuing with remaining scripts...")
+    
+    start = time.perf_counter()
+    
+    if jobs <= 1:
+        if mode == 'inprocess':
+            from arbolib import store
+            store.enable_cache()
+        try:
+            while pending:
+                # One at a time, so stages keep the SCRIPTS order
+                for script in take_ready(limit=1):
+                    print(f"\n[{SCRIPTS.index(script) + 1}/{len(SCRIPTS)}] Processing: {script}")
+                    record(script, *_run_live(script, mode))
+        finally:
+            if mode == 'inprocess':
+                store.disable_cache()
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(mode,)) as pool:
+            while pending or running:
+                for script in take_ready():
+                    print(f"\n▶ Started: {script}")
+                    running[pool.submit(_run_captured, script, mode)] = script
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    script = running.pop(future)
+                    try:
+                        success, seconds, log = future.result()
+                    except Exception as e:
+                        success, seconds, log = False, 0.0, f"\n✗ ERROR: worker crashed: {e}\n"
+                    print(log, end='')
+                    record(script, success, seconds, log)
+    
+    for script in SCRIPTS:
+        results.setdefault(script, (None, 0.0))
+    
+    return ({script: results[script] for script in SCRIPTS},
+            time.perf_counter() - start, hits)
+
+
+def print_timings(timings, wall_times, hits=()):
+    """Print per-stage wall time for one or more runner modes."""
+    modes = list(timings)
+    print(f"\n{'Stage':<36}" + ''.join(f" {m:>12}" for m in modes))
+    print("-" * (36 + 13 * len(modes)))
+    for script in SCRIPTS:
+        row = ''.join(f" {'cached':>12}" if script in hits and m == modes[-1]
+                      else f" {timings[m][script][1]:>11.2f}s"
+                      if timings[m][script][0] is not None else f" {'skipped':>12}"
+                      for m in modes)
+        print(f"{script:<36}{row}")
+    totals = [sum(t for _, t in timings[m].values()) for m in modes]
+    print("-" * (36 + 13 * len(modes)))
+    print(f"{'Total (sum of stages)':<36}" + ''.join(f" {t:>11.2f}s" for t in totals))
+    print(f"{'Wall time':<36}" + ''.join(f" {wall_times[m]:>11.2f}s" for m in modes))
+    
+    if len(modes) == 2:
+        walls = [wall_times[m] for m in modes]
+        saved = walls[0] - walls[1]
+        pct = saved / walls[0] * 100 if walls[0] else 0
+        print(f"\nTime saved by {modes[1]} mode: {saved:.2f}s ({pct:.1f}%)")
 
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Run the complete analysis pipeline.")
+    parser.add_argument('--mode', choices=['subprocess', 'inprocess'],
+                        default='subprocess',
+                        help="run each stage in its own interpreter (default) "
+                             "or all stages in this one")
+    parser.add_argument('--compare', action='store_true',
+                        help="run both modes and report the time saved")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="number of stages to run concurrently (default: 1)")
+    parser.add_argument('--force', action='store_true',
+                        help="rerun every stage even if its inputs are unchanged")
+    parser.add_argument('--on-error', choices=['continue', 'fail-fast'],
+                        default='continue',
+                        help="keep running independent stages after a failure "
+                             "(default) or stop at the first one")
+    args = parser.parse_args()
+    
     print("=" * 70)
     print("CHIKUNGUNYA SURVEILLANCE STUDY - COMPLETE ANALYSIS PIPELINE")
     print("=" * 70)
     print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Python version: {sys.version}")
     print(f"Working directory: {PROJECT_ROOT}")
+    print(f"Mode: {'subprocess + inprocess' if args.compare else args.mode}"
+          f" (jobs={args.jobs}, on error: {args.on_error})")
     print("=" * 70)
     
     # Track execution results
-    results = {}
-    failed_scripts = []
-    
-    # Run each script in sequence
-    for i, script in enumerate(SCRIPTS, 1):
-        print(f"\n[{i}/{len(SCRIPTS)}] Processing: {script}")
-        
-        success = run_script(script)
-        results[script] = success
-        
-        if not success:
-            failed_scripts.append(script)
-            print(f"\n⚠ WARNING: {script} failed. Continuing with remaining scripts...")
-            # Continue automatically (non-interactive mode)
+    modes = ['subprocess', 'inprocess'] if args.compare else [args.mode]
+    # Timing comparisons always execute every stage
+    cache = None if args.compare else BuildCache(CACHE_DIR, PROJECT_ROOT)
+    if cache is not None and args.force:
+        cache.state.clear()
+    
+    timings, wall_times = {}, {}
+    for mode in modes:
+        timings[mode], wall_times[mode], hits = run_pipeline(
+            mode, args.jobs, args.on_error, cache)
+    results = {script: success for script, (success, _) in timings[modes[-1]].items()}
+    failed_scripts = [script for script, success in results.items() if success is False]
     
     # Summary
     print("\n" + "=" * 70)
@@ -107,9 +437,15 @@ def main():
     print()
     
     for script, success in results.items():
-        status = "✓ PASS" if success else "✗ FAIL"
+        status = "✓ PASS" if success else "- SKIP" if success is None else "✗ FAIL"
         print(f"{status} - {script}")
     
+    print_timings(timings, wall_times, hits)
+    if hits:
+        print(f"\nCache hits ({len(hits)}/{len(SCRIPTS)}): "
+              + ", ".join(s for s in SCRIPTS if s in hits))
+    else:
+        print("\nCache hits: none")
     print()
     
     if not failed_scripts:
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+test_incremental.py
+===================
+An incremental update of the SINAN store must give the same cases and
+stratum counts as a full run on the whole extract.
+
+Run from scripts/:
+    python -m pytest -q tests
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import importlib
+import os
+import sys
+import pandas as pd
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, SCRIPTS)
+from arbolib.incremental import KEY, DeltaScan, stratum_counts, update_counts, upsert
+
+preprocessing = importlib.import_module('01_data_preprocessing')
+
+RAW = os.path.join(SCRIPTS, '..', 'data', 'raw', 'SINAN_chikungunya_2023.csv')
+SYMPTOMS = preprocessing.SINAN_SYMPTOM_COLS
+
+
+def load(path, scan, usecols=preprocessing.SINAN_USECOLS):
+    chunks = preprocessing.iter_sinan_chunks(path, chunksize=500, usecols=usecols, scan=scan)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def update(first, second):
+    """Full run on the ``first`` extract, then a delta run on ``second``:
+    the updated store, its counts, the upsert stats and the delta scan."""
+    scan = DeltaScan()
+    store = load(first, scan)
+    counts = stratum_counts(store, SYMPTOMS).reset_index()
+    
+    scan = DeltaScan(scan.watermark(), known_keys=scan.keys)
+    delta = load(second, scan, usecols=list(store.columns))
+    updated, removed, stats = upsert(store, delta, scan)
+    return updated, update_counts(counts, removed, delta, SYMPTOMS), stats, scan
+
+
+def assert_full_run(path, updated, counts):
+    expected = load(path, DeltaScan())
+    assert updated[KEY].tolist() == expected[KEY].tolist()
+    assert updated['idade'].tolist() == expected['idade'].tolist()
+    assert updated['symptom_count'].tolist() == expected['symptom_count'].tolist()
+    pd.testing.assert_frame_equal(counts, stratum_counts(expected, SYMPTOMS).reset_index(),
+                                  check_dtype=False)
+
+
+def test_incremental_matches_full_run(tmp_path):
+    raw = pd.read_csv(RAW, sep=';', dtype=str, keep_default_na=False)
+    # First extract: rows typed before June; the rows without DT_DIGITA
+    # (and no NU_LOTE_I batch) only appear in the second one
+    first = tmp_path / 'first.csv'
+    raw[(raw['DT_DIGITA'] != '') & (raw['DT_DIGITA'] < '2023-06-01')].to_csv(
+        first, sep=';', index=False)
+    full = tmp_path / 'full.csv'
+    raw.to_csv(full, sep=';', index=False)
+    
+    updated, counts, stats, _ = update(first, full)
+    assert len(updated) == (raw['CLASSI_FIN'] == 'Chikungunya').sum()
+    assert stats['updated'] == stats['removed'] == 0
+    assert_full_run(full, updated, counts)
+
+
+def test_revised_record_is_updated(tmp_path):
+    raw = pd.read_csv(RAW, sep=';', dtype=str, keep_default_na=False)
+    raw.insert(0, 'NU_NOTIFIC', [f'{i:07d}' for i in range(1, len(raw) + 1)])
+    first = tmp_path / 'first.csv'
+    raw.to_csv(first, sep=';', index=False)
+    
+    # One confirmed case gets a new age in a new batch; the extract is
+    # re-published in another order
+    revised = raw.copy()
+    row = revised.index[(revised['CLASSI_FIN'] == 'Chikungunya')
+                        & (revised['DT_DIGITA'] < revised['DT_DIGITA'].max())][0]
+    revised.loc[row, 'NU_IDADE_N'] = '4077'
+    revised.loc[row, 'NU_LOTE_I'] = '1'
+    second = tmp_path / 'second.csv'
+    revised.iloc[::-1].to_csv(second, sep=';', index=False)
+    
+    updated, counts, stats, scan = update(first, second)
+    assert stats == {'inserted': 0, 'updated': 1, 'removed': 0}
+    # The revised row and the rows typed on the watermark's day
+    assert scan.delta_rows == 1 + (raw['DT_DIGITA'] == raw['DT_DIGITA'].max()).sum()
+    cases = revised[revised['CLASSI_FIN'] == 'Chikungunya']
+    assert (updated['idade'] == 77).sum() == (cases['NU_IDADE_N'] == '4077').sum()
+    assert_full_run(second, updated, counts)
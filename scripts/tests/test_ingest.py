@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+test_ingest.py
+==============
+Raw SINAN files ingested into one partitioned dataset must read back as
+one typed frame, whatever the columns left blank in each file.
+
+Run from scripts/:
+    python -m pytest -q tests
+
+Author: Welisson G.N. Costa
+Date: October 2026
+"""
+
+import os
+import sys
+import pandas as pd
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, SCRIPTS)
+from arbolib.ingest import ingest
+from arbolib.sinan import read_sinan
+
+RAW = os.path.join(SCRIPTS, '..', 'data', 'raw', 'SINAN_chikungunya_2023.csv')
+
+
+def test_read_back_files_with_empty_date_column(tmp_path):
+    raw = pd.read_csv(RAW, sep=';', dtype=str, keep_default_na=False)
+    half = len(raw) // 2
+    first, second = raw.iloc[:half].copy(), raw.iloc[half:].copy()
+    # Parsed as datetime64[s] when blank, [us] otherwise
+    first['DT_CHIK_S2'] = ''
+    paths = [tmp_path / 'CHIKPR23a.csv', tmp_path / 'CHIKPR23b.csv']
+    first.to_csv(paths[0], sep=';', index=False)
+    second.to_csv(paths[1], sep=';', index=False)
+    
+    root = tmp_path / 'sinan_partitioned'
+    stats = list(ingest(paths, root, chunksize=300, jobs=1))
+    assert sum(s['rows'] for s in stats) == len(raw)
+    
+    df = read_sinan(root)
+    assert len(df) == len(raw)
+    assert pd.api.types.is_datetime64_any_dtype(df['DT_CHIK_S2'])
+    assert df['DT_CHIK_S2'].notna().sum() == (second['DT_CHIK_S2'] != '').sum()
+    chunks = read_sinan(root, chunksize=500, filters={'NU_ANO': 2023})
+    assert sum(len(chunk) for chunk in chunks) == len(raw)